@@ -0,0 +1,101 @@
+import os
+import gzip
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+# Content-addressed store for task outputs, shared by all API workers
+BLOB_DIR = Path(os.getenv("BLOB_DIR", "/shared/blobs"))
+CHUNK_SIZE = 64 * 1024
+
+def blob_path(digest: str) -> Path:
+    """Location of a blob, fanned out by the first two hex digits of its hash."""
+    return BLOB_DIR / digest[:2] / f"{digest}.gz"
+
+def blob_exists(digest: str) -> bool:
+    return blob_path(digest).exists()
+
+class BlobWriter:
+    """
+    Compress data into the store while hashing it.
+
+    The blob is addressed by the SHA-256 of its uncompressed content. Identical
+    content is stored once: if the blob already exists, the new copy is dropped.
+    Closing only finishes the data; publish() puts it in the store, so the caller
+    can record the blob first.
+    """
+
+    def __init__(self):
+        BLOB_DIR.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=BLOB_DIR, prefix=".incoming-")
+        self.raw = os.fdopen(fd, "wb")
+        self.gzip = gzip.GzipFile(fileobj=self.raw, mode="wb", mtime=0)
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.hash.update(data)
+        self.gzip.write(data)
+        self.size += len(data)
+
+    def close(self) -> Tuple[str, int, int]:
+        """
+        Finish the blob.
+
+        Returns:
+            Tuple of (digest, uncompressed size, compressed size)
+        """
+        self.gzip.close()
+        self.raw.close()
+        self.digest = self.hash.hexdigest()
+        return self.digest, self.size, os.path.getsize(self.tmp_path)
+
+    def publish(self) -> None:
+        """Move the closed blob into the store, unless a copy is already there."""
+        final_path = blob_path(self.digest)
+        if final_path.exists():
+            os.unlink(self.tmp_path)
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.tmp_path, final_path)
+
+    def abort(self) -> None:
+        self.gzip.close()
+        self.raw.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+def iter_blob(digest: str, offset: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Stream a byte range of a blob's uncompressed content without loading it whole.
+
+    Args:
+        digest: Hash of the blob
+        offset: First uncompressed byte to return
+        length: Maximum number of bytes to return, or None for the rest of the blob
+    """
+    remaining = length
+    with gzip.open(blob_path(digest), "rb") as f:
+        if offset:
+            f.seek(offset)
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+def read_blob(digest: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+    return b"".join(iter_blob(digest, offset, length))
+
+def delete_blob(digest: str) -> int:
+    """Remove a blob and return the number of bytes reclaimed."""
+    path = blob_path(digest)
+    try:
+        size = path.stat().st_size
+        path.unlink()
+        return size
+    except FileNotFoundError:
+        return 0
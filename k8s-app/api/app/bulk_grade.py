@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compare_outputs import MODES
+from convert_to_json import parse_output
+from regrade_batch import append_section, comparison_report
+from seeding import parse_spec, draw, vars_text
+
+# POSIX character classes in brackets, for the ASCII range grep matches them in under C.UTF-8
+CHARACTER_CLASSES = {
+    "alpha": "a-zA-Z", "digit": "0-9", "alnum": "a-zA-Z0-9", "upper": "A-Z", "lower": "a-z",
+    "space": " \\t\\n\\r\\f\\v", "blank": " \\t", "xdigit": "0-9A-Fa-f",
+    "punct": re.escape("!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~")
+}
+
+def _bracket(pattern: str, i: int) -> Tuple[Optional[str], int]:
+    """Translate the bracket expression starting at pattern[i]; returns (regex, index after it)."""
+    j = i + 1
+    out = "["
+    if j < len(pattern) and pattern[j] == "^":
+        out += "^"
+        j += 1
+    first = True
+    while j < len(pattern):
+        c = pattern[j]
+        if c == "]" and not first:
+            return out + "]", j + 1
+        if c == "[" and j + 1 < len(pattern) and pattern[j + 1] in ":=.":
+            end = pattern.find(pattern[j + 1] + "]", j + 2)
+            if end < 0 or pattern[j + 1] != ":" or pattern[j + 2:end] not in CHARACTER_CLASSES:
+                return None, j
+            out += CHARACTER_CLASSES[pattern[j + 2:end]]
+            j = end + 2
+        else:
+            # Backslash is an ordinary character inside POSIX brackets
+            out += "\\" + c if c in "\\[]^" else c
+            j += 1
+        first = False
+    return None, j
+
+def bre_to_regex(pattern: str) -> Optional[re.Pattern]:
+    """
+    Compile a grep basic regular expression to an equivalent Python regex.
+
+    Covers the BRE grammar with GNU's \\+, \\? and \\| and POSIX character
+    classes. Returns None for anything else, such as GNU's \\w or \\<, which
+    is then left to grep itself.
+    """
+    out = []
+    i = 0
+    # Where * is literal and ^ is an anchor: at the start of the pattern, a group or an alternative
+    at_start = True
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if i + 1 >= len(pattern):
+                return None
+            d = pattern[i + 1]
+            i += 2
+            if d == "(":
+                out.append("(")
+                at_start = True
+                continue
+            if d == "|":
+                out.append("|")
+                at_start = True
+                continue
+            if d == ")":
+                out.append(")")
+            elif d in "+?":
+                out.append("\\" + d if at_start else d)
+            elif d == "{":
+                end = pattern.find("\\}", i)
+                if at_start or end < 0 or not re.fullmatch(r"\d+(,\d*)?|,\d+", pattern[i:end]):
+                    return None
+                out.append("{" + pattern[i:end] + "}")
+                i = end + 2
+            elif d.isdigit() and d != "0":
+                out.append(f"(?:\\{d})")
+            elif d.isalnum() or d in "<>`'":
+                return None
+            else:
+                out.append(re.escape(d))
+            at_start = False
+            continue
+        if c == "[":
+            translated, i = _bracket(pattern, i)
+            if translated is None:
+                return None
+            out.append(translated)
+            at_start = False
+            continue
+        if c == "*" and at_start:
+            out.append("\\*")
+        elif c == "^" and at_start:
+            out.append("^")
+            i += 1
+            continue
+        elif c == "$" and (i + 1 == len(pattern) or pattern[i + 1:i + 3] in ("\\)", "\\|")):
+            out.append("$")
+        elif c in "*.":
+            out.append(c)
+        else:
+            out.append(re.escape(c))
+        at_start = False
+        i += 1
+    try:
+        return re.compile("".join(out))
+    except re.error:
+        return None
+
+def count_matching_lines(pattern: str, path: str) -> int:
+    """What `grep -c "$pattern" FILE` prints, in process where the pattern allows it."""
+    regex = bre_to_regex(pattern) if not pattern.startswith("-") else None
+    if regex is None:
+        result = subprocess.run(["grep", "-c", pattern, path], stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        try:
+            return int(result.stdout.strip() or 0)
+        except ValueError:
+            return 0
+    with open(path, "rb") as f:
+        text = f.read().decode("utf-8", errors="surrogateescape")
+    lines = text.split("\n")
+    # A final newline ends the last line rather than starting an empty one
+    if lines and lines[-1] == "":
+        lines.pop()
+    return sum(1 for line in lines if regex.search(line))
+
+def pattern_report(patterns: List[str], script_path: str) -> str:
+    lines = ["", "PATTERN SEARCH:"]
+    for pattern in patterns:
+        count = count_matching_lines(pattern, script_path)
+        if count > 0:
+            lines.append(f'  Pattern: "{pattern}" - FOUND ({count} occurrences)')
+        else:
+            lines.append(f'  Pattern: "{pattern}" - NOT FOUND')
+    return "\n".join(lines) + "\n"
+
+def read_patterns(find_path: str) -> List[str]:
+    if not os.path.exists(find_path):
+        return []
+    with open(find_path, "r", errors="surrogateescape") as f:
+        # Like `while read`, a last line without a newline is not a pattern
+        return f.read().split("\n")[:-1]
+
+def run_script(python: str, script: str, stdin_path: Optional[str], output_path: str, timeout: float) -> Optional[str]:
+    """Run a script with stderr merged into stdout; returns an error message if it timed out."""
+    with open(output_path, "wb") as out:
+        stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+        try:
+            subprocess.run(
+                [python, script], stdin=stdin, stdout=out, stderr=subprocess.STDOUT,
+                cwd=os.path.dirname(output_path), timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return f"ERROR: {os.path.basename(script)} timed out after {timeout:g} seconds\n"
+        finally:
+            if stdin_path:
+                stdin.close()
+    return None
+
+def run_teacher(job: Dict) -> Tuple[str, Optional[str]]:
+    """Run the teacher's script for one distinct vars.txt."""
+    error = run_script(job["python"], job["teacher_script"], job["vars_path"], job["output_path"], job["timeout"])
+    return job["key"], error
+
+def grade(job: Dict) -> Dict:
+    """Grade one student script into the task pod's report and structure it like convert_to_json.py."""
+    started = time.monotonic()
+    work_dir = tempfile.mkdtemp(prefix="grade-", dir=job["work_dir"])
+    student_path = os.path.join(work_dir, "student_output.txt")
+    report_path = os.path.join(work_dir, "output.txt")
+    try:
+        error = job["teacher_error"] or run_script(
+            job["python"], job["script"], job["vars_path"], student_path, job["timeout"]
+        )
+        if not os.path.exists(student_path):
+            open(student_path, "wb").close()
+        with open(report_path, "wb") as report:
+            report.write(b"TEACHER OUTPUT:\n")
+            append_section(report, job["teacher_output"])
+            report.write(b"\nSTUDENT OUTPUT:\n")
+            append_section(report, student_path)
+            report.write(b"\n")
+            report.write((error or comparison_report(
+                job["teacher_output"], student_path, job["mode"], job["abs_tol"], job["rel_tol"]
+            )).encode())
+            if job["patterns"]:
+                report.write(pattern_report(job["patterns"], job["script"]).encode())
+        with open(report_path, "r", errors="replace") as f:
+            result = parse_output(f.read())
+    except Exception as e:
+        result = {"error": f"Error grading script: {str(e)}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return dict(
+        {"task_name": job["task_name"], "student_name": job["student_name"], "script": job["script"]},
+        **result,
+        vars=job["vars"],
+        duration_seconds=round(time.monotonic() - started, 3)
+    )
+
+def bulk_grade(task_dir: str, submissions_dir: str, output, jobs: int, mode: str, abs_tol: float, rel_tol: float,
+               timeout: float, seed: str, python: str) -> Dict[str, int]:
+    """
+    Grade every *.py file in a directory against a task directory like app/test_task.
+
+    Each student gets vars.txt values drawn from a generator seeded with the
+    seed and their name, so a rerun grades against the same inputs. The
+    teacher's script runs once per distinct set of values, then all student
+    scripts are graded in a pool of `jobs` processes.
+    """
+    task_dir = os.path.abspath(task_dir)
+    task_name = os.path.basename(task_dir.rstrip("/"))
+    teacher_script = os.path.join(task_dir, "teacher_script.py")
+    if not os.path.exists(teacher_script):
+        raise FileNotFoundError(f"{teacher_script} not found")
+    patterns = read_patterns(os.path.join(task_dir, "find.txt"))
+    spec_path = os.path.join(task_dir, "vars.txt")
+    ranges = ()
+    if os.path.exists(spec_path):
+        with open(spec_path, "r") as f:
+            ranges = parse_spec(f.read())
+    scripts = sorted(
+        os.path.join(submissions_dir, name) for name in os.listdir(submissions_dir)
+        if name.endswith(".py") and os.path.isfile(os.path.join(submissions_dir, name))
+    )
+    counts: Dict[str, int] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bulk-grade-") as work_dir, ProcessPoolExecutor(max_workers=jobs) as pool:
+        # One vars.txt per distinct set of values, shared by the students that drew it
+        students = []
+        inputs: Dict[str, Dict] = {}
+        for script in scripts:
+            student_name = os.path.splitext(os.path.basename(script))[0]
+            values = draw(ranges, f"{seed}:{student_name}")
+            text = vars_text(values)
+            key = hashlib.sha256(text.encode()).hexdigest()
+            if key not in inputs:
+                vars_path = os.path.join(work_dir, f"vars-{len(inputs)}.txt") if values else None
+                if vars_path:
+                    with open(vars_path, "w") as f:
+                        f.write(text)
+                inputs[key] = {
+                    "key": key,
+                    "python": python,
+                    "teacher_script": teacher_script,
+                    "vars_path": vars_path,
+                    "output_path": os.path.join(work_dir, f"teacher-{len(inputs)}.txt"),
+                    "timeout": timeout
+                }
+            students.append((script, student_name, values, key))
+
+        teacher_errors = dict(pool.map(run_teacher, inputs.values()))
+
+        grade_jobs = (
+            {
+                "task_name": task_name,
+                "student_name": student_name,
+                "script": os.path.abspath(script),
+                "vars": values,
+                "vars_path": inputs[key]["vars_path"],
+                "teacher_output": inputs[key]["output_path"],
+                "teacher_error": teacher_errors[key],
+                "patterns": patterns,
+                "mode": mode,
+                "abs_tol": abs_tol,
+                "rel_tol": rel_tol,
+                "timeout": timeout,
+                "python": python,
+                "work_dir": work_dir
+            }
+            for script, student_name, values, key in students
+        )
+        # Results come back in input order, a few jobs per round trip
+        chunksize = max(1, min(16, len(students) // (jobs * 4) or 1))
+        for result in pool.map(grade, grade_jobs, chunksize=chunksize):
+            output.write(json.dumps(result) + "\n")
+            status = result.get("comparison_result", {}).get("status", "ERROR")
+            counts[status] = counts.get(status, 0) + 1
+
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade a directory of student scripts locally, without pods")
+    parser.add_argument("task_dir", help="Directory with teacher_script.py and optional vars.txt and find.txt")
+    parser.add_argument("submissions_dir", help="Directory of student scripts; each NAME.py is graded as student NAME")
+    parser.add_argument("-o", "--output", help="JSON lines file to write (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Parallel workers (default: all cores)")
+    parser.add_argument("--mode", choices=MODES, default="exact")
+    parser.add_argument("--abs-tol", type=float, default=0.0)
+    parser.add_argument("--rel-tol", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds each script may run")
+    parser.add_argument("--seed", default="", help="Seed of the vars.txt values drawn for each student")
+    parser.add_argument("--python", default="python3", help="Interpreter the scripts run with")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        counts = bulk_grade(
+            args.task_dir, args.submissions_dir, output, max(args.jobs, 1), args.mode,
+            args.abs_tol, args.rel_tol, args.timeout, args.seed, args.python
+        )
+    finally:
+        if args.output:
+            output.close()
+    total = sum(counts.values())
+    elapsed = time.monotonic() - started
+    print(f"Graded {total} scripts in {elapsed:.1f}s: {json.dumps(counts)}", file=sys.stderr)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+import sys
+import math
+import argparse
+from itertools import zip_longest
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MODES = ("exact", "whitespace", "token", "numeric")
+CHUNK_SIZE = 1024 * 1024
+
+SUCCESS_MESSAGE = "SUCCESS: Outputs match!"
+FAIL_MESSAGE = "FAIL: Outputs do not match"
+
+def _read_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def _strip_trailing_newlines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Drop trailing newlines, the way the shell's $(...) did for the old comparison."""
+    pending = b""
+    for chunk in chunks:
+        body = chunk.rstrip(b"\n")
+        if body:
+            yield pending + body
+            pending = chunk[len(body):]
+        else:
+            pending += chunk
+
+def _token_batches(path: str) -> Iterator[List[bytes]]:
+    """Yield whitespace-separated tokens in chunk-sized batches, never splitting a token."""
+    carry = b""
+    for chunk in _read_chunks(path):
+        data = carry + chunk
+        # Keep a possibly incomplete last token for the next chunk
+        cut = max(data.rfind(b" "), data.rfind(b"\n"), data.rfind(b"\t"), data.rfind(b"\r"))
+        if cut < 0:
+            carry = data
+            continue
+        carry = data[cut + 1:]
+        tokens = data[:cut].split()
+        if tokens:
+            yield tokens
+    if carry.split():
+        yield carry.split()
+
+def _aligned(expected: Iterator[List], actual: Iterator[List]) -> Iterator[Tuple[int, List, List]]:
+    """
+    Re-batch two streams of token lists so both sides of each batch have the same length.
+
+    Yields (offset, expected_batch, actual_batch). A final pair of unequal length
+    signals that one output has more tokens than the other.
+    """
+    expected_batch, actual_batch = [], []
+    expected_index = actual_index = 0
+    offset = 0
+    while True:
+        if expected_index == len(expected_batch):
+            expected_batch, expected_index = next(expected, []), 0
+        if actual_index == len(actual_batch):
+            actual_batch, actual_index = next(actual, []), 0
+        if not expected_batch or not actual_batch:
+            # One side is exhausted; tokens left on the other side are a length mismatch
+            if expected_batch or actual_batch:
+                yield offset, expected_batch[expected_index:], actual_batch[actual_index:]
+            return
+
+        size = min(len(expected_batch) - expected_index, len(actual_batch) - actual_index)
+        yield (
+            offset,
+            expected_batch[expected_index:expected_index + size],
+            actual_batch[actual_index:actual_index + size]
+        )
+        expected_index += size
+        actual_index += size
+        offset += size
+
+def _numbers_match(x: float, y: float, abs_tol: float, rel_tol: float) -> bool:
+    """Whether a student's value is within the tolerance of the teacher's."""
+    # The tolerance test is never false for NaN or infinite values, so these only match themselves
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return (math.isnan(x) and math.isnan(y)) or x == y
+    return abs(y - x) <= abs_tol + rel_tol * abs(x)
+
+def _first_numeric_mismatch(expected: List[bytes], actual: List[bytes], abs_tol: float, rel_tol: float) -> Optional[int]:
+    """Index of the first token pair that differs beyond the tolerance, or None."""
+    for i, (x, y) in enumerate(zip(expected, actual)):
+        if x == y:
+            continue
+        try:
+            fx, fy = float(x), float(y)
+        except ValueError:
+            return i
+        if not _numbers_match(fx, fy, abs_tol, rel_tol):
+            return i
+    return None
+
+def _first_token_mismatch(expected: List[bytes], actual: List[bytes]) -> Optional[int]:
+    if expected == actual:
+        return None
+    for i, (x, y) in enumerate(zip(expected, actual)):
+        if x != y:
+            return i
+    return None
+
+def _describe(token: Optional[bytes]) -> str:
+    if token is None:
+        return "end of output"
+    text = token.decode("utf-8", errors="replace")
+    return repr(text if len(text) <= 40 else text[:37] + "...")
+
+def compare_exact(teacher_path: str, student_path: str) -> Tuple[bool, str]:
+    expected = _strip_trailing_newlines(_read_chunks(teacher_path))
+    actual = _strip_trailing_newlines(_read_chunks(student_path))
+    x = y = b""
+    position = 0
+    while True:
+        if not x:
+            x = next(expected, b"")
+        if not y:
+            y = next(actual, b"")
+        if not x or not y:
+            if x or y:
+                return False, f"outputs differ in length after byte {position}"
+            return True, ""
+
+        size = min(len(x), len(y))
+        if x[:size] != y[:size]:
+            index = next(i for i in range(size) if x[i] != y[i])
+            return False, f"first difference at byte {position + index}"
+        x = x[size:]
+        y = y[size:]
+        position += size
+
+def compare_whitespace(teacher_path: str, student_path: str) -> Tuple[bool, str]:
+    def normalized_lines(path):
+        blank = 0
+        with open(path, "rb") as f:
+            for line in f:
+                line = b" ".join(line.split())
+                if not line:
+                    blank += 1
+                    continue
+                # Blank lines only matter when something follows them
+                for _ in range(blank):
+                    yield b""
+                blank = 0
+                yield line
+
+    for number, (x, y) in enumerate(zip_longest(normalized_lines(teacher_path), normalized_lines(student_path)), 1):
+        if x != y:
+            return False, f"line {number}: expected {_describe(x)}, got {_describe(y)}"
+    return True, ""
+
+def compare_tokens(teacher_path: str, student_path: str, numeric: bool = False, abs_tol: float = 0.0, rel_tol: float = 0.0) -> Tuple[bool, str]:
+    for offset, expected, actual in _aligned(_token_batches(teacher_path), _token_batches(student_path)):
+        size = min(len(expected), len(actual))
+        if numeric:
+            index = _first_numeric_mismatch(expected[:size], actual[:size], abs_tol, rel_tol)
+        else:
+            index = _first_token_mismatch(expected[:size], actual[:size])
+        if index is None and len(expected) != len(actual):
+            index = size
+        if index is not None:
+            x = expected[index] if index < len(expected) else None
+            y = actual[index] if index < len(actual) else None
+            return False, f"token {offset + index + 1}: expected {_describe(x)}, got {_describe(y)}"
+    return True, ""
+
+def compare_files(teacher_path: str, student_path: str, mode: str = "exact", abs_tol: float = 0.0, rel_tol: float = 0.0) -> Tuple[bool, str]:
+    """
+    Compare a teacher and a student output file.
+
+    Args:
+        teacher_path: File with the reference output
+        student_path: File with the student's output
+        mode: One of MODES
+        abs_tol: Absolute tolerance for numeric mode
+        rel_tol: Tolerance relative to the teacher's value for numeric mode
+
+    Returns:
+        Tuple of (match, detail) where detail describes the first difference
+    """
+    if mode == "exact":
+        return compare_exact(teacher_path, student_path)
+    if mode == "whitespace":
+        return compare_whitespace(teacher_path, student_path)
+    if mode == "token":
+        return compare_tokens(teacher_path, student_path)
+    if mode == "numeric":
+        return compare_tokens(teacher_path, student_path, numeric=True, abs_tol=abs_tol, rel_tol=rel_tol)
+    raise ValueError(f"Unknown comparison mode: {mode}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare teacher and student outputs")
+    parser.add_argument("teacher_output")
+    parser.add_argument("student_output")
+    parser.add_argument("--mode", default="exact", choices=MODES)
+    parser.add_argument("--abs-tol", type=float, default=0.0)
+    parser.add_argument("--rel-tol", type=float, default=0.0)
+    args = parser.parse_args()
+
+    try:
+        match, detail = compare_files(args.teacher_output, args.student_output, args.mode, args.abs_tol, args.rel_tol)
+    except Exception as e:
+        print(f"ERROR: Comparison failed: {str(e)}")
+        sys.exit(2)
+
+    if match:
+        print(SUCCESS_MESSAGE)
+        sys.exit(0)
+    print(FAIL_MESSAGE)
+    print(f"  {detail}")
+    sys.exit(1)
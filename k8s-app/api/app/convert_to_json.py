@@ -2,11 +2,141 @@
 import sys
 import json
 import os
+import blobstore
+
+def parse_output(content):
+    """
+    Structure the text of an output.txt.
+    
+    Args:
+        content: Text written by the task pod's runner
+    
+    Returns:
+        Dictionary with the outputs, the comparison result and the pattern search
+    """
+    # Parse the content
+    sections = {}
+    current_section = None
+    current_content = []
+    
+    for line in content.split('\n'):
+        if line == "TEACHER OUTPUT:":
+            current_section = "teacher_output"
+            current_content = []
+        elif line == "STUDENT OUTPUT:":
+            if current_section:
+                sections[current_section] = '\n'.join(current_content)
+            current_section = "student_output"
+            current_content = []
+        elif line == "DIFF:":
+            if current_section:
+                sections[current_section] = '\n'.join(current_content)
+            current_section = "diff"
+            current_content = []
+        elif line == "PATTERN SEARCH:":
+            if current_section:
+                sections[current_section] = '\n'.join(current_content)
+            current_section = "pattern_search"
+            current_content = []
+        elif line.startswith("SUCCESS:") or line.startswith("FAIL:") or line.startswith("ERROR:"):
+            if current_section:
+                sections[current_section] = '\n'.join(current_content)
+            current_section = "comparison_result"
+            current_content = [line]
+        elif line.startswith("  Pattern:"):
+            if current_section == "pattern_search":
+                current_content.append(line)
+        elif current_section:
+            current_content.append(line)
+    
+    # Add the last section
+    if current_section:
+        sections[current_section] = '\n'.join(current_content)
+    
+    # Extract comparison result
+    comparison_result = "UNKNOWN"
+    if "comparison_result" in sections:
+        result_text = sections["comparison_result"]
+        if "SUCCESS" in result_text:
+            comparison_result = "SUCCESS"
+        elif "FAIL" in result_text:
+            comparison_result = "FAIL"
+        elif "ERROR" in result_text:
+            comparison_result = "ERROR"
+    
+    # Parse pattern search results
+    patterns = []
+    if "pattern_search" in sections:
+        pattern_lines = sections["pattern_search"].split('\n')
+        for line in pattern_lines:
+            if line.startswith("  Pattern:"):
+                parts = line.split(" - ")
+                if len(parts) == 2:
+                    pattern = parts[0].replace("  Pattern: ", "").strip('"')
+                    result = parts[1]
+                    found = "FOUND" in result
+                    count = 0
+                    if found and "(" in result and ")" in result:
+                        try:
+                            count_str = result.split("(")[1].split(" ")[0]
+                            count = int(count_str)
+                        except (IndexError, ValueError):
+                            # If parsing fails, just use 0
+                            pass
+                    patterns.append({
+                        "pattern": pattern,
+                        "found": found,
+                        "count": count
+                    })
+    
+    # Create the JSON structure
+    return {
+        "teacher_output": sections.get("teacher_output", ""),
+        "student_output": sections.get("student_output", ""),
+        "comparison_result": {
+            "status": comparison_result,
+            "message": sections.get("comparison_result", ""),
+            "diff": sections.get("diff", "")
+        },
+        "pattern_search": {
+            "patterns": patterns
+        }
+    }
+
+def find_output_hash(task_name, student_name):
+    """
+    Look up the stored output of a student's current attempt.
+    
+    Args:
+        task_name: Name of the task
+        student_name: Name of the student
+    
+    Returns:
+        Blob store hash of the output, or None if it has not been collected
+    """
+    # Only needed here, so parse_output stays usable without a database driver
+    from sqlalchemy import create_engine, text
+    
+    engine = create_engine(os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/school_db"))
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("""
+                SELECT r.output_hash FROM latest_results l
+                JOIN task_results r ON r.id = l.attempt_id
+                JOIN tasks t ON t.id = l.task_id
+                JOIN students s ON s.id = l.student_id
+                WHERE t.name = :task_name AND s.name = :student_name
+            """), {"task_name": task_name, "student_name": student_name}).scalar()
+    finally:
+        engine.dispose()
 
 def convert_output_to_json(task_name, student_name):
     """
     Convert the plain text output to JSON format.
     
+    The output is read from the blob store once the API has collected it,
+    and from the shared output directory before that.
+    
     Args:
         task_name: Name of the task
         student_name: Name of the student
@@ -15,108 +145,24 @@ def convert_output_to_json(task_name, student_name):
         JSON string containing the structured output
     """
     output_path = f"/shared/output/{task_name}/{student_name}/output.txt"
-    status_path = f"/shared/output/{task_name}/{student_name}/status.txt"
-    
-    if not os.path.exists(output_path):
-        return json.dumps({
-            "error": "Output file not found"
-        })
     
     try:
-        with open(output_path, 'r') as f:
-            content = f.read()
-        
-        # Parse the content
-        sections = {}
-        current_section = None
-        current_content = []
-        
-        for line in content.split('\n'):
-            if line == "TEACHER OUTPUT:":
-                current_section = "teacher_output"
-                current_content = []
-            elif line == "STUDENT OUTPUT:":
-                if current_section:
-                    sections[current_section] = '\n'.join(current_content)
-                current_section = "student_output"
-                current_content = []
-            elif line == "DIFF:":
-                if current_section:
-                    sections[current_section] = '\n'.join(current_content)
-                current_section = "diff"
-                current_content = []
-            elif line == "PATTERN SEARCH:":
-                if current_section:
-                    sections[current_section] = '\n'.join(current_content)
-                current_section = "pattern_search"
-                current_content = []
-            elif line.startswith("SUCCESS:") or line.startswith("FAIL:") or line.startswith("ERROR:"):
-                if current_section:
-                    sections[current_section] = '\n'.join(current_content)
-                current_section = "comparison_result"
-                current_content = [line]
-            elif line.startswith("  Pattern:"):
-                if current_section == "pattern_search":
-                    current_content.append(line)
-            elif current_section:
-                current_content.append(line)
+        digest = find_output_hash(task_name, student_name)
+        if digest and blobstore.blob_exists(digest):
+            content = blobstore.read_blob(digest).decode("utf-8", errors="replace")
+        elif os.path.exists(output_path):
+            with open(output_path, 'r') as f:
+                content = f.read()
+        else:
+            return json.dumps({
+                "error": "Output file not found"
+            })
         
-        # Add the last section
-        if current_section:
-            sections[current_section] = '\n'.join(current_content)
-        
-        # Extract comparison result
-        comparison_result = "UNKNOWN"
-        if "comparison_result" in sections:
-            result_text = sections["comparison_result"]
-            if "SUCCESS" in result_text:
-                comparison_result = "SUCCESS"
-            elif "FAIL" in result_text:
-                comparison_result = "FAIL"
-            elif "ERROR" in result_text:
-                comparison_result = "ERROR"
-        
-        # Parse pattern search results
-        patterns = []
-        if "pattern_search" in sections:
-            pattern_lines = sections["pattern_search"].split('\n')
-            for line in pattern_lines:
-                if line.startswith("  Pattern:"):
-                    parts = line.split(" - ")
-                    if len(parts) == 2:
-                        pattern = parts[0].replace("  Pattern: ", "").strip('"')
-                        result = parts[1]
-                        found = "FOUND" in result
-                        count = 0
-                        if found and "(" in result and ")" in result:
-                            try:
-                                count_str = result.split("(")[1].split(" ")[0]
-                                count = int(count_str)
-                            except (IndexError, ValueError):
-                                # If parsing fails, just use 0
-                                pass
-                        patterns.append({
-                            "pattern": pattern,
-                            "found": found,
-                            "count": count
-                        })
-        
-        # Create the JSON structure
-        result = {
-            "teacher_output": sections.get("teacher_output", ""),
-            "student_output": sections.get("student_output", ""),
-            "comparison_result": {
-                "status": comparison_result,
-                "message": sections.get("comparison_result", ""),
-                "diff": sections.get("diff", "")
-            },
-            "pattern_search": {
-                "patterns": patterns
-            }
-        }
+        result = parse_output(content)
         
         # Write the JSON to a file
         json_path = f"/shared/output/{task_name}/{student_name}/output.json"
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
         with open(json_path, 'w') as f:
             json.dump(result, f, indent=2)
         
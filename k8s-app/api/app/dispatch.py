@@ -0,0 +1,292 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+
+from kube import Informer, RateLimitedApi, TokenBucket, K8S_QPS, K8S_BURST, K8S_INFORMERS
+
+# Where task pods may run: comma-separated "[context/]namespace[=max_pods]" entries.
+# An entry without a context uses the in-cluster configuration or the current kubeconfig context.
+DISPATCH_TARGETS = os.getenv("DISPATCH_TARGETS", "default")
+DISPATCH_MAX_PODS = int(os.getenv("DISPATCH_MAX_PODS", "50"))
+DISPATCH_REFRESH_SECONDS = float(os.getenv("DISPATCH_REFRESH_SECONDS", "5"))
+DISPATCH_COOLDOWN_SECONDS = float(os.getenv("DISPATCH_COOLDOWN_SECONDS", "30"))
+
+# Smoothing of the pod start latency estimate and its value before the first measurement
+LATENCY_EWMA_ALPHA = 0.3
+INITIAL_START_LATENCY = 5.0
+
+# Recent start latencies kept per target for percentiles, and how many a percentile needs
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+# API errors that mean "try somewhere else" rather than "this pod is invalid"
+FAILOVER_STATUSES = {0, 403, 429, 500, 502, 503, 504}
+
+class TargetUnavailable(Exception):
+    """The target lacks something task pods need there, such as the shared PVC."""
+
+class Target:
+    """A namespace, possibly in another cluster, that task pods can be created in."""
+
+    def __init__(self, context: Optional[str], namespace: str, max_pods: int):
+        self.context = context
+        self.namespace = namespace
+        self.max_pods = max_pods
+        self.name = f"{context}/{namespace}" if context else namespace
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.limiter = TokenBucket(K8S_QPS, K8S_BURST)
+        self.pod_informer: Optional[Informer] = None
+        self.pvc_informer: Optional[Informer] = None
+
+        self.live_pods = 0
+        self.inflight = 0
+        self.start_latency = INITIAL_START_LATENCY
+        self.latency_samples = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.refreshed_at = 0.0
+        self.pvc_ready = False
+        self._measured = set()
+
+    def _load_clients(self) -> None:
+        with self._lock:
+            if self._clients:
+                return
+            if self.context:
+                api_client = config.new_client_from_config(context=self.context)
+            else:
+                try:
+                    config.load_incluster_config()
+                except config.ConfigException:
+                    config.load_kube_config()
+                api_client = client.ApiClient()
+            # Watches use the raw client; every other call is rate limited and retried
+            self._clients["core_v1_raw"] = client.CoreV1Api(api_client)
+            self._clients["apps_v1"] = RateLimitedApi(client.AppsV1Api(api_client), self.limiter)
+            self._clients["core_v1"] = RateLimitedApi(self._clients["core_v1_raw"], self.limiter)
+
+    @property
+    def core_v1(self) -> client.CoreV1Api:
+        if not self._clients:
+            self._load_clients()
+        return self._clients["core_v1"]
+
+    @property
+    def apps_v1(self) -> client.AppsV1Api:
+        if not self._clients:
+            self._load_clients()
+        return self._clients["apps_v1"]
+
+    def start_informers(self) -> None:
+        """Keep local copies of the target's task pods and PVCs."""
+        if not self._clients:
+            self._load_clients()
+        raw = self._clients["core_v1_raw"]
+        self.pod_informer = Informer(
+            f"{self.name}-pods",
+            raw.list_namespaced_pod,
+            self.limiter,
+            namespace=self.namespace,
+            label_selector="app=task"
+        )
+        self.pvc_informer = Informer(
+            f"{self.name}-pvcs",
+            raw.list_namespaced_persistent_volume_claim,
+            self.limiter,
+            namespace=self.namespace
+        )
+        self.pod_informer.start()
+        self.pvc_informer.start()
+
+    def list_pods(self) -> List[Any]:
+        """Task pods of the target, from the informer once it has synced."""
+        if self.pod_informer and self.pod_informer.synced.is_set():
+            return self.pod_informer.items()
+        return self.core_v1.list_namespaced_pod(namespace=self.namespace, label_selector="app=task").items
+
+    def has_pvc(self, name: str) -> Optional[bool]:
+        """Whether the PVC exists, or None when the informer has not synced yet."""
+        if self.pvc_informer and self.pvc_informer.synced.is_set():
+            return self.pvc_informer.get(name) is not None
+        return None
+
+    def refresh(self) -> None:
+        """Count live task pods and fold the start latency of newly started pods into the estimate."""
+        live = 0
+        seen = set()
+        for pod in self.list_pods():
+            seen.add(pod.metadata.name)
+            if pod.status.phase in ("Pending", "Running"):
+                live += 1
+            if pod.metadata.name in self._measured:
+                continue
+            started_at = _container_started_at(pod)
+            if started_at and pod.metadata.creation_timestamp:
+                latency = max((started_at - pod.metadata.creation_timestamp).total_seconds(), 0.0)
+                self.start_latency += LATENCY_EWMA_ALPHA * (latency - self.start_latency)
+                self.latency_samples.append(latency)
+                self._measured.add(pod.metadata.name)
+
+        # Forget pods that no longer exist so the set stays bounded
+        self._measured &= seen
+        self.live_pods = live
+        self.inflight = 0
+        self.refreshed_at = time.monotonic()
+
+    def start_latency_percentile(self, fraction: float) -> Optional[float]:
+        """Nearest-rank percentile of recent start latencies, or None until there are enough of them."""
+        samples = sorted(self.latency_samples)
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[max(math.ceil(fraction * len(samples)) - 1, 0)]
+
+    def saturated(self) -> bool:
+        return self.live_pods + self.inflight >= self.max_pods
+
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.monotonic()
+
+    def expected_wait(self) -> float:
+        """Start latency scaled up by how full the target is."""
+        load = (self.live_pods + self.inflight) / max(self.max_pods, 1)
+        return self.start_latency * (1.0 + load)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self) -> None:
+        # Back off exponentially while the target keeps failing
+        self.failures += 1
+        self.cooldown_until = time.monotonic() + DISPATCH_COOLDOWN_SECONDS * 2 ** min(self.failures - 1, 4)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "context": self.context,
+            "namespace": self.namespace,
+            "max_pods": self.max_pods,
+            "live_pods": self.live_pods + self.inflight,
+            "start_latency_seconds": round(self.start_latency, 3),
+            "start_latency_samples": len(self.latency_samples),
+            "failures": self.failures,
+            "cooling_down": self.cooling_down(),
+            "saturated": self.saturated()
+        }
+
+def _container_started_at(pod):
+    for cs in pod.status.container_statuses or []:
+        if cs.state and cs.state.running and cs.state.running.started_at:
+            return cs.state.running.started_at
+        if cs.state and cs.state.terminated and cs.state.terminated.started_at:
+            return cs.state.terminated.started_at
+    return None
+
+def parse_targets(spec: str) -> List[Target]:
+    targets = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        max_pods = DISPATCH_MAX_PODS
+        if "=" in entry:
+            entry, limit = entry.rsplit("=", 1)
+            max_pods = int(limit)
+        context, _, namespace = entry.rpartition("/")
+        targets.append(Target(context or None, namespace or "default", max_pods))
+    return targets or [Target(None, "default", DISPATCH_MAX_PODS)]
+
+class Dispatcher:
+    """
+    Spread task pods over several targets.
+
+    Targets are ranked by expected start wait, which grows with their live pod
+    count and recent pod start latency. Saturated targets and targets that just
+    failed are tried last. A create that still fails with a quota, throttling,
+    server or connection error after its retries, or a target that cannot run
+    task pods, moves on to the next target.
+    """
+
+    def __init__(self, targets: List[Target]):
+        self.targets = targets
+        self.primary = targets[0]
+        self._lock = threading.Lock()
+
+    def get(self, name: Optional[str]) -> Target:
+        for target in self.targets:
+            if target.name == name:
+                return target
+        return self.primary
+
+    def warm(self) -> None:
+        for target in self.targets:
+            try:
+                if K8S_INFORMERS:
+                    target.start_informers()
+                else:
+                    target.core_v1
+            except Exception as e:
+                print(f"Error connecting to dispatch target {target.name}: {str(e)}")
+
+    def ranked(self) -> List[Target]:
+        now = time.monotonic()
+        for target in self.targets:
+            if target.cooling_down():
+                continue
+            # Counting from a synced informer is free; otherwise list pods at most every refresh interval
+            cached = target.pod_informer is not None and target.pod_informer.synced.is_set()
+            if not cached and now - target.refreshed_at < DISPATCH_REFRESH_SECONDS:
+                continue
+            try:
+                target.refresh()
+            except Exception as e:
+                print(f"Error refreshing dispatch target {target.name}: {str(e)}")
+                target.record_failure()
+
+        with self._lock:
+            return sorted(self.targets, key=lambda t: (t.cooling_down(), t.saturated(), t.expected_wait()))
+
+    def create_pod(self, body: Dict[str, Any], prepare: Optional[Callable[[Target], Any]] = None) -> Target:
+        """Create a pod on the best target, failing over on errors; returns the target used."""
+        last_error = None
+        for target in self.ranked():
+            try:
+                if prepare:
+                    prepare(target)
+                target.core_v1.create_namespaced_pod(namespace=target.namespace, body=body)
+            except ApiException as e:
+                # Pod names are deterministic, so a conflict means an earlier try already created it
+                if e.status == 409:
+                    return target
+                if e.status not in FAILOVER_STATUSES:
+                    raise
+                print(f"Dispatch target {target.name} rejected pod: {e.status} {e.reason}")
+                target.record_failure()
+                last_error = e
+                continue
+            except TargetUnavailable as e:
+                print(f"Dispatch target {target.name} unavailable: {str(e)}")
+                target.record_failure()
+                last_error = e
+                continue
+            except Exception as e:
+                print(f"Dispatch target {target.name} unreachable: {str(e)}")
+                target.record_failure()
+                last_error = e
+                continue
+
+            with self._lock:
+                target.inflight += 1
+            target.record_success()
+            return target
+
+        raise last_error or RuntimeError("No dispatch targets configured")
+
+dispatcher = Dispatcher(parse_targets(DISPATCH_TARGETS))
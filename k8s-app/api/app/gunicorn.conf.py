@@ -0,0 +1,13 @@
+import os
+import multiprocessing
+
+# Multi-worker serving: each worker runs its own startup, which is safe to run concurrently
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Workers import the app themselves so no database or Kubernetes client is shared across a fork
+preload_app = False
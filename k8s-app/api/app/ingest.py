@@ -0,0 +1,195 @@
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Per-field limits for uploads, checked while the body streams in
+MAX_SCRIPT_BYTES = int(os.getenv("MAX_SCRIPT_BYTES", str(1024 * 1024)))
+MAX_DATA_FILE_BYTES = int(os.getenv("MAX_DATA_FILE_BYTES", str(1024 * 1024)))
+MAX_FORM_FIELD_BYTES = int(os.getenv("MAX_FORM_FIELD_BYTES", str(64 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+
+class FileField:
+    """An expected file field: its size limit and a staging directory on the destination's filesystem."""
+
+    def __init__(self, max_bytes: int, staging_dir: Path):
+        self.max_bytes = max_bytes
+        self.staging_dir = staging_dir
+
+class StoredUpload:
+    """An uploaded file written to a staging path, hashed as it was written."""
+
+    def __init__(self, filename: str, staging_path: Path, size: int, sha256: str):
+        self.filename = filename
+        self.staging_path = staging_path
+        self.size = size
+        self.sha256 = sha256
+        self.committed = False
+
+    def commit(self, destination: Path) -> Path:
+        """Move the upload to its final location with one atomic rename."""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.staging_path, destination)
+        self.staging_path = destination
+        self.committed = True
+        return destination
+
+    def discard(self) -> None:
+        if self.committed:
+            return
+        try:
+            os.unlink(self.staging_path)
+        except FileNotFoundError:
+            pass
+
+class Upload:
+    """Parsed form: text fields and staged files."""
+
+    def __init__(self):
+        self.fields: Dict[str, List[str]] = {}
+        self.files: Dict[str, StoredUpload] = {}
+
+    def field(self, name: str, default: Optional[str] = None, required: bool = True) -> Optional[str]:
+        values = self.fields.get(name)
+        if values:
+            return values[0]
+        if required and default is None:
+            raise HTTPException(status_code=422, detail=f"Missing form field: {name}")
+        return default
+
+    def field_list(self, name: str) -> List[str]:
+        return self.fields.get(name, [])
+
+    def file(self, name: str, required: bool = True) -> Optional[StoredUpload]:
+        upload = self.files.get(name)
+        if upload is None and required:
+            raise HTTPException(status_code=422, detail=f"Missing file: {name}")
+        return upload
+
+    def discard(self) -> None:
+        """Remove staged files that were not committed."""
+        for upload in self.files.values():
+            upload.discard()
+
+def _too_large(name: str, limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{name} exceeds the limit of {limit} bytes")
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.name: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.value = bytearray()
+        self.hash = None
+        self.fd = None
+        self.path: Optional[Path] = None
+
+async def read_multipart(request: Request, file_fields: Dict[str, FileField]) -> Upload:
+    """
+    Parse a multipart/form-data body as it streams in.
+
+    Files are written straight into their staging directory while being hashed,
+    so nothing is spooled and copied again. A declared Content-Length over
+    MAX_UPLOAD_BYTES is rejected before reading, and any field that grows past
+    its limit aborts the upload at that point. Unknown file fields are refused.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise _too_large("Upload", MAX_UPLOAD_BYTES)
+
+    upload = Upload()
+    events = []
+    part = None
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        events.append(("header", bytes(header_field).lower(), bytes(header_value)))
+        header_field.clear()
+        header_value.clear()
+
+    callbacks = {
+        "on_part_begin": lambda: events.append(("begin",)),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end",)),
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers",)),
+    }
+    parser = MultipartParser(params[b"boundary"], callbacks)
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES:
+                raise _too_large("Upload", MAX_UPLOAD_BYTES)
+            parser.write(chunk)
+
+            for event in events:
+                kind = event[0]
+                if kind == "begin":
+                    part = _Part()
+                elif kind == "header":
+                    part.headers[event[1]] = event[2]
+                elif kind == "headers":
+                    _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+                    part.name = options.get(b"name", b"").decode("utf-8", errors="replace")
+                    if b"filename" in options:
+                        part.filename = options[b"filename"].decode("utf-8", errors="replace")
+                        spec = file_fields.get(part.name)
+                        if spec is None:
+                            raise HTTPException(status_code=400, detail=f"Unexpected file field: {part.name}")
+                        spec.staging_dir.mkdir(parents=True, exist_ok=True)
+                        fd, path = tempfile.mkstemp(dir=spec.staging_dir, prefix=".upload-")
+                        part.fd, part.path, part.hash = os.fdopen(fd, "wb"), Path(path), hashlib.sha256()
+                elif kind == "data":
+                    data = event[1]
+                    part.size += len(data)
+                    if part.fd is not None:
+                        if part.size > file_fields[part.name].max_bytes:
+                            raise _too_large(part.name, file_fields[part.name].max_bytes)
+                        part.hash.update(data)
+                        part.fd.write(data)
+                    else:
+                        if part.size > MAX_FORM_FIELD_BYTES:
+                            raise _too_large(part.name, MAX_FORM_FIELD_BYTES)
+                        part.value.extend(data)
+                elif kind == "end":
+                    if part.fd is not None:
+                        part.fd.close()
+                        part.fd = None
+                        # An empty file input means the optional file was left out
+                        if part.size == 0 and not part.filename:
+                            os.unlink(part.path)
+                        else:
+                            upload.files[part.name] = StoredUpload(part.filename, part.path, part.size, part.hash.hexdigest())
+                    else:
+                        upload.fields.setdefault(part.name, []).append(part.value.decode("utf-8", errors="replace"))
+                    part = None
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        if part is not None and part.fd is not None:
+            part.fd.close()
+            os.unlink(part.path)
+        upload.discard()
+        raise
+
+    return upload
@@ -0,0 +1,167 @@
+import os
+import time
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+
+# Client-side limits for calls to one API server
+K8S_QPS = float(os.getenv("K8S_QPS", "20"))
+K8S_BURST = int(os.getenv("K8S_BURST", "40"))
+K8S_MAX_RETRIES = int(os.getenv("K8S_MAX_RETRIES", "4"))
+K8S_RETRY_BASE_SECONDS = float(os.getenv("K8S_RETRY_BASE_SECONDS", "0.5"))
+
+# Watch pods and PVCs instead of listing them on demand
+K8S_INFORMERS = os.getenv("K8S_INFORMERS", "1") == "1"
+
+# Watches are restarted from the last seen resourceVersion after this long
+WATCH_TIMEOUT_SECONDS = 300
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Allow `rate` calls per second on average, with bursts of up to `burst` calls."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _retry_after(e: ApiException) -> Optional[float]:
+    try:
+        return float((e.headers or {}).get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def call_with_retry(limiter: TokenBucket, func: Callable, *args, **kwargs):
+    """
+    Make one API call under the rate limit, retrying throttled, server and connection errors.
+
+    Retries back off exponentially with jitter, or wait as long as the server's
+    Retry-After asks. Other errors are raised at once.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except ApiException as e:
+            if e.status not in RETRY_STATUSES or attempt >= K8S_MAX_RETRIES:
+                raise
+            delay = _retry_after(e)
+        except HTTPError:
+            if attempt >= K8S_MAX_RETRIES:
+                raise
+            delay = None
+        if delay is None:
+            delay = K8S_RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+        attempt += 1
+        time.sleep(delay)
+
+class RateLimitedApi:
+    """Wrap a generated API class so every method call goes through call_with_retry."""
+
+    def __init__(self, api: Any, limiter: TokenBucket):
+        self.api = api
+        self.limiter = limiter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.api, name)
+        if not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            return call_with_retry(self.limiter, attr, *args, **kwargs)
+        return limited
+
+class Informer:
+    """
+    Local copy of a list of objects, kept current by a watch.
+
+    A background thread lists the objects once, then applies watch events from
+    the list's resourceVersion. It lists again if the watch falls too far
+    behind (410 Gone) or the connection drops. Readers never call the API server.
+    """
+
+    def __init__(self, name: str, list_func: Callable, limiter: TokenBucket, **kwargs):
+        self.name = name
+        self.list_func = list_func
+        self.limiter = limiter
+        self.kwargs = kwargs
+        self.synced = threading.Event()
+        self._items: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"informer-{self.name}", daemon=True)
+            self._thread.start()
+
+    def items(self) -> List[Any]:
+        with self._lock:
+            return list(self._items.values())
+
+    def get(self, name: str) -> Optional[Any]:
+        with self._lock:
+            return self._items.get(name)
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                resource_version = self._list()
+                failures = 0
+                while True:
+                    resource_version = self._watch(resource_version)
+            except Exception as e:
+                if not (isinstance(e, ApiException) and e.status == 410):
+                    print(f"Error in informer {self.name}: {str(e)}")
+                    failures += 1
+                    self.synced.clear()
+                    time.sleep(min(K8S_RETRY_BASE_SECONDS * 2 ** failures, 30))
+
+    def _list(self) -> str:
+        self.limiter.acquire()
+        listing = self.list_func(**self.kwargs)
+        with self._lock:
+            self._items = {item.metadata.name: item for item in listing.items}
+        self.synced.set()
+        return listing.metadata.resource_version
+
+    def _watch(self, resource_version: str) -> str:
+        self.limiter.acquire()
+        stream = watch.Watch().stream(
+            self.list_func,
+            resource_version=resource_version,
+            timeout_seconds=WATCH_TIMEOUT_SECONDS,
+            **self.kwargs
+        )
+        for event in stream:
+            if event["type"] == "ERROR":
+                raw = event.get("raw_object") or {}
+                raise ApiException(status=raw.get("code", 500), reason=raw.get("message"))
+            item = event["object"]
+            resource_version = item.metadata.resource_version
+            with self._lock:
+                if event["type"] == "DELETED":
+                    self._items.pop(item.metadata.name, None)
+                else:
+                    self._items[item.metadata.name] = item
+        return resource_version
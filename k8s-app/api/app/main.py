@@ -1,21 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime
+from fastapi import FastAPI, HTTPException, Depends, Form, Query, Request
+from sqlalchemy import create_engine, Column, Integer, BigInteger, Float, String, LargeBinary, ForeignKey, DateTime, UniqueConstraint, Index, text, inspect, union, func, distinct, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, Session, aliased
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
 import os
 import shutil
 import json
 import subprocess
-from kubernetes import client, config
+from kubernetes.client.rest import ApiException
 from pathlib import Path
 import time
+import math
+import threading
 import asyncio
 import yaml
 import random
-from fastapi.responses import PlainTextResponse
+import hashlib
+import blobstore
+import compare_outputs
+import similarity
+import ingest
+import precheck
+import tracing
+import seeding
+from dispatch import dispatcher, Target, TargetUnavailable
+import csv
+import io
+from fastapi.responses import PlainTextResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
 
 app = FastAPI()
 
@@ -32,9 +54,111 @@ RESULTS_DIR = BASE_DIR / "results"
 TEACHERS_DIR = BASE_DIR / "teachers"
 STUDENTS_DIR = BASE_DIR / "students"
 
-# Create directories if they don't exist
-for directory in [BASE_DIR, TASKS_DIR, RESULTS_DIR, TEACHERS_DIR, STUDENTS_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
+# Uploads are staged on the filesystem of their final location so they can be renamed into place
+SHARED_INPUT_DIR = Path("/shared/input")
+SHARED_UPLOAD_DIR = SHARED_INPUT_DIR / ".incoming"
+TASKS_UPLOAD_DIR = TASKS_DIR / ".incoming"
+
+# Gradebook export configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_COLUMNS = ["task_name", "student_name", "status", "created_at"]
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Gradebook configuration
+RESULT_SWEEP_INTERVAL = float(os.getenv("RESULT_SWEEP_INTERVAL", "5"))
+# A result claimed for collection longer ago than this was abandoned by a worker that died
+INGEST_CLAIM_SECONDS = float(os.getenv("INGEST_CLAIM_SECONDS", "300"))
+# Likewise for a regrade; its claim is renewed for every student it supersedes
+REGRADE_CLAIM_SECONDS = float(os.getenv("REGRADE_CLAIM_SECONDS", "300"))
+# A batch regrade pod covers many runs, so it gets a deadline of its own
+REGRADE_DEADLINE_SECONDS = int(os.getenv("REGRADE_DEADLINE_SECONDS", "3600"))
+GRADEBOOK_COUNTERS = {
+    "STARTED": "started_count",
+    "SUCCESS": "success_count",
+    "FAIL": "fail_count",
+    "ERROR": "error_count",
+    "COMPILE_ERROR": "error_count"
+}
+
+# Resubmissions inside this window are coalesced into a single pod launch
+RESUBMIT_DEBOUNCE_SECONDS = float(os.getenv("RESUBMIT_DEBOUNCE_SECONDS", "0"))
+
+# Garbage collection of finished pods and shared outputs
+SHARED_OUTPUT_DIR = Path("/shared/output")
+GC_INTERVAL_SECONDS = float(os.getenv("GC_INTERVAL_SECONDS", "60"))
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "50"))
+POD_TTL_SECONDS = float(os.getenv("POD_TTL_SECONDS", "600"))
+BLOB_GRACE_SECONDS = float(os.getenv("BLOB_GRACE_SECONDS", "3600"))
+OUTPUT_RETENTION_DAYS = float(os.getenv("OUTPUT_RETENTION_DAYS", "0"))  # 0 keeps outputs forever
+# Staged uploads are only abandoned once nothing has been written to them for this long
+UPLOAD_STAGING_TTL_SECONDS = float(os.getenv("UPLOAD_STAGING_TTL_SECONDS", "3600"))
+GC_LOCK_ID = 2029
+
+# Task metadata cache; entries expire after the TTL or when the task row changes
+TASK_METADATA_TTL_SECONDS = float(os.getenv("TASK_METADATA_TTL_SECONDS", "30"))
+TASK_METADATA_MAX_AGE = int(os.getenv("TASK_METADATA_MAX_AGE", "0"))
+
+# Image the task pods run in, pre-pulled on every node
+TASK_IMAGE = os.getenv("TASK_IMAGE", "python:3.9-slim")
+PAUSE_IMAGE = os.getenv("PAUSE_IMAGE", "registry.k8s.io/pause:3.9")
+
+# Capacity pre-warming ahead of task deadlines
+CAPACITY_INTERVAL_SECONDS = float(os.getenv("CAPACITY_INTERVAL_SECONDS", "60"))
+PREWARM_LEAD_MINUTES = float(os.getenv("PREWARM_LEAD_MINUTES", "60"))
+PREWARM_HOLD_MINUTES = float(os.getenv("PREWARM_HOLD_MINUTES", "15"))
+PREWARM_STUDENT_FRACTION = float(os.getenv("PREWARM_STUDENT_FRACTION", "0.25"))
+PREWARM_MAX_PLACEHOLDERS = int(os.getenv("PREWARM_MAX_PLACEHOLDERS", "20"))
+PLACEHOLDER_CPU = os.getenv("PLACEHOLDER_CPU", "250m")
+PLACEHOLDER_MEMORY = os.getenv("PLACEHOLDER_MEMORY", "256Mi")
+PLACEHOLDER_PRIORITY_CLASS = "task-placeholder"
+PREPULL_DAEMONSET = "task-image-prepull"
+PLACEHOLDER_DEPLOYMENT = "task-placeholder"
+CAPACITY_LOCK_ID = 2034
+
+# Submissions larger than this are only fingerprinted up to this size
+SIMILARITY_MAX_BYTES = int(os.getenv("SIMILARITY_MAX_BYTES", str(1024 * 1024)))
+SIMILARITY_MAX_PAIRS = 50  # Most similar pairs listed per cluster
+# Submissions still unindexed this long after they were made are indexed by the result sweep
+SIMILARITY_CATCHUP_SECONDS = float(os.getenv("SIMILARITY_CATCHUP_SECONDS", "300"))
+SIMILARITY_CATCHUP_BATCH = 20  # Submissions indexed per sweep
+
+# Runner pod sizing from the measured usage of a task's recent attempts
+RESOURCE_WINDOW = int(os.getenv("RESOURCE_WINDOW", "100"))
+RESOURCE_MIN_SAMPLES = int(os.getenv("RESOURCE_MIN_SAMPLES", "5"))
+RESOURCE_HEADROOM = float(os.getenv("RESOURCE_HEADROOM", "1.5"))
+# Used until a task has enough samples
+RUNNER_CPU_MILLICORES = int(os.getenv("RUNNER_CPU_MILLICORES", "100"))
+RUNNER_MEMORY_MB = int(os.getenv("RUNNER_MEMORY_MB", "128"))
+RUNNER_MEMORY_LIMIT_MB = int(os.getenv("RUNNER_MEMORY_LIMIT_MB", "1024"))
+RUNNER_DEADLINE_SECONDS = int(os.getenv("RUNNER_DEADLINE_SECONDS", "600"))
+# Bounds of measured sizes; the overheads cover the shell, runner and comparison around the scripts
+RUNNER_MAX_CPU_MILLICORES = int(os.getenv("RUNNER_MAX_CPU_MILLICORES", "2000"))
+RUNNER_MAX_MEMORY_MB = int(os.getenv("RUNNER_MAX_MEMORY_MB", "4096"))
+RUNNER_MAX_DEADLINE_SECONDS = int(os.getenv("RUNNER_MAX_DEADLINE_SECONDS", "3600"))
+RUNNER_MIN_CPU_MILLICORES = 50
+RUNNER_MEMORY_OVERHEAD_MB = 64
+RUNNER_DEADLINE_SLACK_SECONDS = 60
+MIB = 1024 * 1024
+
+# Hedged launches: a pod still pending past this percentile of its target's start latency gets a duplicate on another node
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))  # 0 disables hedging
+HEDGE_MIN_SECONDS = float(os.getenv("HEDGE_MIN_SECONDS", "10"))
+HEDGE_MAX_LIVE = int(os.getenv("HEDGE_MAX_LIVE", "10"))
+HEDGE_INTERVAL_SECONDS = float(os.getenv("HEDGE_INTERVAL_SECONDS", "5"))
+
+# Task pods reuse the teacher's output for a teacher script and vars.txt values they have seen before
+TEACHER_OUTPUT_CACHE = os.getenv("TEACHER_OUTPUT_CACHE", "1") == "1"
+
+# Submission timelines; pod events need list access to events in the task namespaces
+TRACE_POD_EVENTS = os.getenv("TRACE_POD_EVENTS", "1") == "1"
+
+# Serializes schema creation across API workers and replicas
+SCHEMA_LOCK_ID = 2032
 
 # Database Models
 class Student(Base):
@@ -56,16 +180,81 @@ class Task(Base):
     description = Column(String)
     teacher_id = Column(Integer, ForeignKey("teachers.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    comparison_mode = Column(String, default="exact")  # exact, whitespace, token, numeric
+    abs_tol = Column(Float, default=0.0)
+    rel_tol = Column(Float, default=0.0)
+    deadline = Column(DateTime, index=True)  # Optional submission deadline (UTC)
+    version = Column(Integer, default=1)  # Bumped whenever the grading inputs change
+    updated_at = Column(DateTime, default=datetime.utcnow)  # Set on every change to the task
 
 class TaskResult(Base):
+    # One row per attempt; rows are never replaced, so earlier attempts stay available
     __tablename__ = "task_results"
+    __table_args__ = (
+        Index("ix_task_results_task_created", "task_id", "created_at"),
+        Index("ix_task_results_task_student_created", "task_id", "student_id", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
     student_id = Column(Integer, ForeignKey("students.id"))
-    status = Column(String)  # SUCCESS, FAIL, ERROR
+    status = Column(String)  # STARTED, SUCCESS, FAIL, ERROR, COMPILE_ERROR, CANCELLED
     created_at = Column(DateTime, default=datetime.utcnow)
     teacher_output_path = Column(String)
     student_output_path = Column(String)
+    script_hash = Column(String, index=True)  # SHA-256 of the submitted script
+    task_version = Column(Integer)  # Task version the attempt was graded against
+    regrade_of = Column(Integer, ForeignKey("task_results.id"))  # Attempt this one regrades after a task update
+    pod_name = Column(String, index=True)
+    pod_target = Column(String)  # Dispatch target (namespace or context/namespace) the pod ran in
+    output_hash = Column(String, index=True)  # Full output.txt in the blob store
+    ingest_claimed_at = Column(DateTime)  # Set by the worker collecting the output, so only one does
+    pod_followup_at = Column(DateTime, index=True)  # Collected, but the pod's timeline and hedge are not handled yet
+    teacher_output_hash = Column(String)
+    student_output_hash = Column(String)
+    patterns_found = Column(Integer)
+    total_patterns = Column(Integer)
+    cpu_seconds = Column(Float)  # Measured usage of the teacher and student runs together
+    peak_memory_bytes = Column(BigInteger)
+    wall_seconds = Column(Float)
+    teacher_cpu_seconds = Column(Float)  # Usage of the teacher run alone, also for a cached teacher output
+    teacher_peak_memory_bytes = Column(BigInteger)
+    teacher_wall_seconds = Column(Float)
+    memory_limit_bytes = Column(BigInteger)  # Limits the attempt's pod ran under
+    deadline_seconds = Column(Integer)
+    trace_id = Column(String, index=True)  # Passed to the pod as TRACE_ID
+    hedge_pod_name = Column(String)  # Duplicate pod launched when the first one was slow to start
+    hedge_pod_target = Column(String)
+    result_pod = Column(String)  # Pod whose output was published
+    vars_seed = Column(String)  # Seed the vars.txt values were drawn from; empty for unseeded values
+    vars_values = Column(String)  # JSON list of the values the attempt ran with
+    teacher_cache_key = Column(String, index=True)  # Teacher output shared by attempts with the same script and values
+
+class SubmissionSpan(Base):
+    # Timed phases of an attempt, from the API, the pod's events and the runner inside it
+    __tablename__ = "submission_spans"
+    id = Column(Integer, primary_key=True, index=True)
+    attempt_id = Column(Integer, ForeignKey("task_results.id"), index=True)
+    name = Column(String)
+    source = Column(String)  # api, pod or runner
+    started_at = Column(DateTime)
+    ended_at = Column(DateTime)
+    attributes = Column(String)  # JSON object
+
+class LatestResult(Base):
+    # The current attempt of each student at each task, kept in step with task_results
+    __tablename__ = "latest_results"
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True, index=True)
+    attempt_id = Column(Integer, ForeignKey("task_results.id"))
+    status = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class OutputBlob(Base):
+    __tablename__ = "output_blobs"
+    digest = Column(String, primary_key=True)
+    size = Column(BigInteger)
+    compressed_size = Column(BigInteger)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 class Group(Base):
     __tablename__ = "groups"
@@ -88,6 +277,90 @@ class TaskGroup(Base):
     group_id = Column(Integer, ForeignKey("groups.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class GradebookEntry(Base):
+    __tablename__ = "gradebook_entries"
+    __table_args__ = (UniqueConstraint("group_id", "task_id", "student_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
+    student_id = Column(Integer, ForeignKey("students.id"))
+    status = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class GradebookSummary(Base):
+    __tablename__ = "gradebook_summaries"
+    __table_args__ = (UniqueConstraint("group_id", "task_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
+    started_count = Column(Integer, default=0)
+    success_count = Column(Integer, default=0)
+    fail_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+
+class SubmissionSignature(Base):
+    __tablename__ = "submission_signatures"
+    __table_args__ = (UniqueConstraint("task_id", "student_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
+    student_id = Column(Integer, ForeignKey("students.id"))
+    attempt_id = Column(Integer)  # Attempt whose script was fingerprinted
+    signature = Column(LargeBinary)  # MinHash signature, see similarity.py
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SimilarityBucket(Base):
+    __tablename__ = "similarity_buckets"
+    __table_args__ = (Index("ix_similarity_buckets_lookup", "task_id", "band", "bucket"),)
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"))
+    student_id = Column(Integer, ForeignKey("students.id"), index=True)
+    band = Column(Integer)
+    bucket = Column(BigInteger)
+
+class TaskVersion(Base):
+    # One row per version of a task's grading inputs, with the regrade it triggered
+    __tablename__ = "task_versions"
+    __table_args__ = (UniqueConstraint("task_id", "version"),)
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
+    version = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    changes = Column(String)  # Comma-separated: teacher_script, vars, find, comparison
+    teacher_script_hash = Column(String)
+    vars_hash = Column(String)
+    find_hash = Column(String)
+    comparison_mode = Column(String)
+    abs_tol = Column(Float)
+    rel_tol = Column(Float)
+    regrade_state = Column(String)  # pending or done when the version was regraded
+    regrade_claimed_at = Column(DateTime)
+    regrade_pod = Column(String)
+    incremental_count = Column(Integer, default=0)  # Regraded from stored student output
+    rerun_count = Column(Integer, default=0)  # Student script run again in a task pod
+    skipped_count = Column(Integer, default=0)
+
+class MaintenanceReport(Base):
+    # Last report of a background job that only one worker runs at a time, readable from every worker
+    __tablename__ = "maintenance_reports"
+    name = Column(String, primary_key=True)
+    report = Column(String)  # JSON object
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class TaskResourceProfile(Base):
+    # Rolling usage percentiles over a task's recent measured attempts, used to size its pods
+    __tablename__ = "task_resource_profiles"
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    samples = Column(Integer, default=0)
+    cpu_seconds_p50 = Column(Float)
+    cpu_seconds_p99 = Column(Float)
+    cpu_cores_p50 = Column(Float)  # CPU time over wall time
+    cpu_cores_p99 = Column(Float)
+    memory_bytes_p50 = Column(BigInteger)
+    memory_bytes_p99 = Column(BigInteger)
+    wall_seconds_p50 = Column(Float)
+    wall_seconds_p99 = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 # Pydantic Models
 class StudentBase(BaseModel):
     name: str
@@ -130,17 +403,39 @@ def get_db():
     finally:
         db.close()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Kubernetes configuration
-try:
-    config.load_incluster_config()
-except:
-    config.load_kube_config()
-
-v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
+def ensure_schema() -> None:
+    """Create missing tables and add columns introduced after a table was first created."""
+    with engine.begin() as conn:
+        # Workers starting together wait here instead of racing on CREATE TABLE
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        
+        backfill_latest = not inspect(conn).has_table(LatestResult.__tablename__)
+        Base.metadata.create_all(bind=conn)
+        
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            
+            # Indexes added to tables that already existed
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        
+        # Results from before latest_results existed: the newest attempt per task and student
+        if backfill_latest:
+            conn.execute(text("""
+                INSERT INTO latest_results (task_id, student_id, attempt_id, status, updated_at)
+                SELECT r.task_id, r.student_id, r.id, r.status, r.created_at
+                FROM task_results r
+                WHERE r.id = (
+                    SELECT MAX(id) FROM task_results
+                    WHERE task_id = r.task_id AND student_id = r.student_id
+                )
+            """))
 
 # Helper functions
 def create_task_directory(task_name: str) -> Path:
@@ -148,6 +443,37 @@ def create_task_directory(task_name: str) -> Path:
     task_dir.mkdir(parents=True, exist_ok=True)
     return task_dir
 
+def install_task_runner(shared_script_dir: Path) -> None:
+    """Copy the scripts task pods run into the task's shared script directory."""
+    app_dir = Path(__file__).parent
+    
+    # Copy the comparison script to shared script directory and make it executable
+    compare_script_path = shared_script_dir / "compare_scripts.sh"
+    shutil.copy(str(app_dir / "script_template.sh"), str(compare_script_path))
+    compare_script_path.chmod(0o755)  # Make the script executable
+    
+    # Copy the output comparator used by the comparison script
+    shutil.copy(str(Path(compare_outputs.__file__)), str(shared_script_dir / "compare_outputs.py"))
+    
+    # Copy the wrapper that measures each script run and the batch regrader
+    shutil.copy(str(app_dir / "run_measured.py"), str(shared_script_dir / "run_measured.py"))
+    shutil.copy(str(app_dir / "regrade_batch.py"), str(shared_script_dir / "regrade_batch.py"))
+
+def file_sha256(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_task_file(link_path: Path, target: Path) -> None:
+    """Point a file in the task directory at its single copy in the shared input."""
+    if link_path.is_symlink() or link_path.exists():
+        link_path.unlink()
+    link_path.symlink_to(target)
+
 def create_student_directory(student_name: str) -> Path:
     student_dir = STUDENTS_DIR / student_name
     student_dir.mkdir(parents=True, exist_ok=True)
@@ -163,62 +489,127 @@ def create_teacher_directory(teacher_name: str) -> Path:
     teacher_dir.mkdir(parents=True, exist_ok=True)
     return teacher_dir
 
-def create_shared_pvc() -> str:
-    """Create a shared PVC for input and output."""
+def require_shared_pvc(target: Target) -> str:
+    """
+    Check that the target has the shared PVC before a pod is created there.
+    
+    The claim is never created here: a new, empty volume would hold none of
+    the task inputs, and the API would never see the outputs written to it.
+    A target without it is unavailable, and the dispatcher fails over.
+    """
     shared_pvc_name = "shared-pvc"
-    shared_pvc = {
-        "apiVersion": "v1",
-        "kind": "PersistentVolumeClaim",
-        "metadata": {
-            "name": shared_pvc_name,
-            "namespace": "default"
-        },
-        "spec": {
-            "accessModes": ["ReadWriteMany"],
-            "resources": {
-                "requests": {
-                    "storage": "1Gi"
-                }
-            },
-            "storageClassName": "standard"
-        }
-    }
+    exists = target.has_pvc(shared_pvc_name)
+    if exists is None:
+        # Without a synced watch, look the claim up once per worker
+        if target.pvc_ready:
+            return shared_pvc_name
+        try:
+            target.core_v1.read_namespaced_persistent_volume_claim(name=shared_pvc_name, namespace=target.namespace)
+            exists = True
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            exists = False
+    if not exists:
+        raise TargetUnavailable(f"PVC {shared_pvc_name} not found in namespace {target.namespace}")
+    target.pvc_ready = True
+    return shared_pvc_name
+
+def sanitize_k8s_name(name: str, default: str) -> str:
+    """Turn a task or student name into a valid Kubernetes name fragment or label value."""
+    # Replace invalid characters and ensure the name starts and ends with alphanumeric characters
+    sanitized = ''.join(c.lower() if c.isalnum() else '-' for c in name).strip('-')
     
-    # Create the shared PVC
+    # If the sanitized name is empty, use a default value
+    return sanitized or default
+
+def task_pod_selector(task_name: str, student_name: Optional[str] = None) -> str:
+    """Label selector matching the task pods of a task, or of one student's attempts at it."""
+    selector = f"app=task,task={sanitize_k8s_name(task_name, 'task')}"
+    if student_name is not None:
+        selector += f",student={sanitize_k8s_name(student_name, 'student')}"
+    return selector
+
+def has_live_task_pods(target: Target, task_name: str, student_name: str) -> bool:
+    """Whether the target may still run pods of a student's task; assumes so until its pod cache syncs."""
+    if not (target.pod_informer and target.pod_informer.synced.is_set()):
+        return True
+    
+    task_label = sanitize_k8s_name(task_name, "task")
+    student_label = sanitize_k8s_name(student_name, "student")
+    for pod in target.pod_informer.items():
+        labels = pod.metadata.labels or {}
+        if labels.get("task") == task_label and labels.get("student") == student_label \
+                and pod.status.phase in ("Pending", "Running"):
+            return True
+    return False
+
+def cancel_task_pods(task_name: str, student_name: str) -> None:
+    """Delete pods of earlier attempts so a resubmission does not race them."""
+    # Earlier attempts may have been dispatched to any target
+    for target in dispatcher.targets:
+        if not has_live_task_pods(target, task_name, student_name):
+            continue
+        try:
+            target.core_v1.delete_collection_namespaced_pod(
+                namespace=target.namespace,
+                label_selector=task_pod_selector(task_name, student_name)
+            )
+        except Exception as e:
+            print(f"Error cancelling task pods in {target.name}: {str(e)}")
+
+def cancel_hedge_loser(task_result: TaskResult) -> None:
+    """Delete the pod of a hedged attempt that did not publish its result."""
+    if not task_result.hedge_pod_name:
+        return
+    if task_result.result_pod == task_result.hedge_pod_name:
+        pod_name, target = task_result.pod_name, dispatcher.get(task_result.pod_target)
+    else:
+        pod_name, target = task_result.hedge_pod_name, dispatcher.get(task_result.hedge_pod_target)
     try:
-        v1.create_namespaced_persistent_volume_claim(namespace="default", body=shared_pvc)
-        return shared_pvc_name
+        target.core_v1.delete_namespaced_pod(name=pod_name, namespace=target.namespace)
+    except ApiException as e:
+        if e.status != 404:
+            print(f"Error cancelling pod {pod_name}: {str(e)}")
     except Exception as e:
-        print(f"Error creating shared PVC: {str(e)}")
-        return shared_pvc_name  # Assume it exists if creation fails
+        print(f"Error cancelling pod {pod_name}: {str(e)}")
 
-def create_task_pod(task_name: str, student_name: str, db: Session, shared_pvc_name: str) -> str:
+def create_task_pod(task_name: str, student_name: str, db: Session, attempt_id: int, hedge: bool = False) -> str:
     try:
-        # Generate unique pod name that follows Kubernetes naming conventions
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        
         # Sanitize task_name and student_name to ensure they only contain valid characters
-        sanitized_task_name = ''.join(c.lower() if c.isalnum() else '-' for c in task_name)
-        sanitized_student_name = ''.join(c.lower() if c.isalnum() else '-' for c in student_name)
+        sanitized_task_name = sanitize_k8s_name(task_name, "task")
+        sanitized_student_name = sanitize_k8s_name(student_name, "student")
+        
+        # Comparison settings of the task
+        task = db.query(Task).filter(Task.name == task_name).first()
+        comparison_mode = (task.comparison_mode if task else None) or "exact"
+        abs_tol = (task.abs_tol if task else None) or 0.0
+        rel_tol = (task.rel_tol if task else None) or 0.0
         
-        # Ensure the name starts and ends with alphanumeric characters
-        sanitized_task_name = sanitized_task_name.strip('-')
-        sanitized_student_name = sanitized_student_name.strip('-')
+        # Size the pod from the task's measured usage
+        profile = db.query(TaskResourceProfile).filter(TaskResourceProfile.task_id == task.id).first() if task else None
+        resources = runner_resources(profile)
+        cpu_request = f"{resources['cpu_request_millicores']}m"
+        memory_request = resources["memory_request_bytes"]
+        memory_limit = resources["memory_limit_bytes"]
+        deadline_seconds = resources["deadline_seconds"]
         
-        # If sanitized names are empty, use a default value
-        if not sanitized_task_name:
-            sanitized_task_name = "task"
-        if not sanitized_student_name:
-            sanitized_student_name = "student"
+        # The attempt's trace continues in the pod, which may reuse a cached teacher output
+        attempt = db.query(TaskResult.trace_id, TaskResult.teacher_cache_key).filter(TaskResult.id == attempt_id).first()
+        trace_id = (attempt.trace_id if attempt else None) or ""
+        teacher_cache_key = (attempt.teacher_cache_key if attempt else None) or ""
         
-        # Create a valid pod name
-        pod_name = f"task-{sanitized_task_name}-{sanitized_student_name}-{timestamp}"
+        # The shared PVC has the same name in every dispatch target
+        shared_pvc_name = "shared-pvc"
+        
+        # One pod name per attempt (and one for its hedge), so retrying a create cannot start a second pod
+        suffix = f"-{attempt_id}-h" if hedge else f"-{attempt_id}"
+        pod_name = f"task-{sanitized_task_name}-{sanitized_student_name}{suffix}"
         
         # Ensure the pod name is not too long (Kubernetes has a limit of 63 characters)
         if len(pod_name) > 63:
             # Truncate the name while keeping the prefix and suffix
             prefix = "task-"
-            suffix = f"-{timestamp}"
             max_middle_length = 63 - len(prefix) - len(suffix)
             middle = f"{sanitized_task_name}-{sanitized_student_name}"
             if len(middle) > max_middle_length:
@@ -234,11 +625,19 @@ metadata:
     app: task
     task: {sanitized_task_name}
     student: {sanitized_student_name}
+    attempt: "{attempt_id}"
 spec:
+  activeDeadlineSeconds: {deadline_seconds}
   containers:
     - name: task
-      image: python:3.9-slim
+      image: {TASK_IMAGE}
       imagePullPolicy: IfNotPresent
+      resources:
+        requests:
+          cpu: "{cpu_request}"
+          memory: "{memory_request}"
+        limits:
+          memory: "{memory_limit}"
       command: ["/bin/sh"]
       args: ["-c", "/shared/input/{task_name}/script/compare_scripts.sh"]
       env:
@@ -246,6 +645,22 @@ spec:
           value: {task_name}
         - name: STUDENT_NAME
           value: {student_name}
+        - name: ATTEMPT_ID
+          value: "{attempt_id}"
+        - name: POD_NAME
+          value: {pod_name}
+        - name: COMPARE_MODE
+          value: "{comparison_mode}"
+        - name: ABS_TOL
+          value: "{abs_tol!r}"
+        - name: REL_TOL
+          value: "{rel_tol!r}"
+        - name: TEACHER_CACHE_KEY
+          value: "{teacher_cache_key}"
+        - name: TRACE_ID
+          value: "{trace_id}"
+        - name: TRACEPARENT
+          value: "{tracing.traceparent(trace_id) if trace_id else ''}"
       volumeMounts:
         - name: shared-volume
           mountPath: /shared
@@ -259,11 +674,29 @@ spec:
         # Parse YAML to dict
         pod_dict = yaml.safe_load(pod_template)
         
-        # Create pod using the API
-        pod = v1.create_namespaced_pod(
-            namespace="default",
-            body=pod_dict
-        )
+        if hedge:
+            # Keep the duplicate off the node the first pod of the attempt is stuck on
+            pod_dict["metadata"]["labels"]["hedge"] = "true"
+            pod_dict["spec"]["affinity"] = {"podAntiAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": [{
+                "labelSelector": {"matchLabels": {"app": "task", "attempt": str(attempt_id)}},
+                "topologyKey": "kubernetes.io/hostname"
+            }]}}
+        
+        # Create the pod on the least loaded target that accepts it
+        target = dispatcher.create_pod(pod_dict, prepare=require_shared_pvc)
+        
+        # Remember where the attempt runs and under which limits
+        if hedge:
+            values = {"hedge_pod_name": pod_name, "hedge_pod_target": target.name}
+        else:
+            values = {
+                "pod_name": pod_name,
+                "pod_target": target.name,
+                "memory_limit_bytes": memory_limit,
+                "deadline_seconds": deadline_seconds
+            }
+        db.query(TaskResult).filter(TaskResult.id == attempt_id).update(values, synchronize_session=False)
+        db.commit()
         
         return pod_name
     except Exception as e:
@@ -305,93 +738,1880 @@ def run_validation_script(task_name: str, student_name: str, file_path: Path) ->
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def collect_task_results(pod_name: str, task_name: str, student_name: str) -> Dict[str, str]:
+def assign_variables(task: Task, task_result: TaskResult, db: Session, keep: bool = False) -> Optional[List[int]]:
+    """
+    Give an attempt its vars.txt values and the key of its teacher output.
+    
+    Values are drawn from the attempt's seed, so under the "student" policy a
+    resubmission gets the same values and its pod reuses the teacher's output.
+    With keep, values the attempt already carries are kept.
+    
+    Returns:
+        The values, or None if a kept attempt has no recorded values
+    """
+    inputs = seeding.task_inputs(
+        task.id, task.version or 1,
+        TASKS_DIR / task.name / "vars.txt",
+        SHARED_INPUT_DIR / task.name / "teacher" / "teacher_script.py"
+    )
+    if keep:
+        values = json.loads(task_result.vars_values) if task_result.vars_values is not None else None
+    else:
+        task_result.vars_seed = seeding.seed_for(task.id, task_result.student_id, task_result.id)
+        values = seeding.draw(inputs.ranges, task_result.vars_seed)
+        task_result.vars_values = json.dumps(values)
+    
+    if TEACHER_OUTPUT_CACHE and inputs.teacher_script_hash and values is not None:
+        task_result.teacher_cache_key = seeding.teacher_cache_key(inputs.teacher_script_hash, values)
+    else:
+        task_result.teacher_cache_key = None
+    db.commit()
+    return values
+
+class _SectionWriter:
+    """Blob writer for one section of output.txt that drops the section's trailing newlines."""
+
+    def __init__(self):
+        self.blob = blobstore.BlobWriter()
+        self.pending = b""
+
+    def write_line(self, line: bytes) -> None:
+        body = line.rstrip(b"\n")
+        if body:
+            self.blob.write(self.pending + body)
+            self.pending = line[len(body):]
+        else:
+            self.pending += line
+
+def store_blob(writer: blobstore.BlobWriter, db: Session) -> str:
+    """
+    Finish a blob, record it and put it in the store; returns its digest.
+    
+    The row is written first and restarts the blob's grace period. An existing
+    row stays locked until the caller commits, so garbage collection either
+    waits and sees the blob is in use, or has already deleted the row and the
+    file, and the file is then published again.
+    """
+    digest, size, compressed_size = writer.close()
+    values = {"digest": digest, "size": size, "compressed_size": compressed_size, "created_at": datetime.utcnow()}
     try:
-        # Create result directory
-        result_dir = create_result_directory(task_name, student_name)
+        if engine.dialect.name == "postgresql":
+            db.execute(pg_insert(OutputBlob).values(**values).on_conflict_do_update(
+                index_elements=["digest"],
+                set_={"created_at": values["created_at"]}
+            ))
+        else:
+            blob = db.query(OutputBlob).filter(OutputBlob.digest == digest).first()
+            if blob:
+                blob.created_at = values["created_at"]
+            else:
+                db.add(OutputBlob(**values))
+            db.flush()
+    except Exception:
+        writer.abort()
+        raise
+    writer.publish()
+    return digest
+
+def ingest_output(result_dir: Path, task_result: TaskResult, db: Session) -> Optional[str]:
+    """
+    Move a finished output.txt into the blob store in one streaming pass.
+
+    The full output and the teacher and student sections are stored as separate
+    compressed, deduplicated blobs referenced from the result. Pattern counts are
+    recorded on the way so readers never have to parse the output again.
+    
+    Returns:
+        The result status derived from the output, or None if there is no output
+        or it has already been collected
+    """
+    source = result_dir / "output.txt"
+    try:
+        f = open(source, "rb")
+    except FileNotFoundError:
+        return None
+    
+    report = blobstore.BlobWriter()
+    teacher = _SectionWriter()
+    student = _SectionWriter()
+    section = None
+    matched = failed = False
+    patterns_found = total_patterns = 0
+    
+    try:
+        with f:
+            for line in f:
+                report.write(line)
+                stripped = line.rstrip(b"\n")
+                if stripped == b"TEACHER OUTPUT:":
+                    section = teacher
+                elif stripped == b"STUDENT OUTPUT:":
+                    section = student
+                elif stripped.startswith((b"SUCCESS:", b"FAIL:", b"ERROR:")):
+                    section = None
+                    matched = matched or stripped == b"SUCCESS: Outputs match!"
+                    failed = failed or stripped == b"FAIL: Outputs do not match"
+                elif section is None and stripped.startswith(b"  Pattern:"):
+                    total_patterns += 1
+                    # Only count lines that contain "FOUND" but NOT "NOT FOUND"
+                    if b"FOUND" in stripped and b"NOT FOUND" not in stripped:
+                        patterns_found += 1
+                elif section is not None:
+                    section.write_line(line)
+    except Exception:
+        for writer in (report, teacher.blob, student.blob):
+            writer.abort()
+        raise
+    
+    for attribute, writer in (
+        ("output_hash", report),
+        ("teacher_output_hash", teacher.blob),
+        ("student_output_hash", student.blob)
+    ):
+        setattr(task_result, attribute, store_blob(writer, db))
+    task_result.patterns_found = patterns_found
+    task_result.total_patterns = total_patterns
+    
+    # The blob store now holds the canonical copy
+    source.unlink(missing_ok=True)
+    
+    if matched:
+        return "SUCCESS"
+    if failed:
+        return "FAIL"
+    return "ERROR"
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+def record_resource_usage(result_dir: Path, task_result: TaskResult, db: Session) -> bool:
+    """Store the usage measured by the runner on the attempt; returns whether there was any."""
+    usage_file = result_dir / "usage.jsonl"
+    if not usage_file.exists():
+        return False
+    
+    runs = []
+    for line in usage_file.read_text().splitlines():
+        try:
+            runs.append(json.loads(line))
+        except ValueError:
+            continue
+    usage_file.unlink()
+    if not runs:
+        return False
+    
+    teacher_runs = [run for run in runs if run.get("label") == "teacher"]
+    student_runs = [run for run in runs if run.get("label") != "teacher"]
+    if teacher_runs:
+        task_result.teacher_cpu_seconds = sum(float(run.get("cpu_seconds") or 0) for run in teacher_runs)
+        task_result.teacher_wall_seconds = sum(float(run.get("wall_seconds") or 0) for run in teacher_runs)
+        task_result.teacher_peak_memory_bytes = max(int(run.get("peak_memory_bytes") or 0) for run in teacher_runs)
+    elif task_result.teacher_cache_key:
+        # The teacher's output came from the cache; a pod that misses it runs the teacher too,
+        # so count the teacher run that filled it
+        measured = db.query(
+            TaskResult.teacher_cpu_seconds, TaskResult.teacher_peak_memory_bytes, TaskResult.teacher_wall_seconds
+        ).filter(
+            TaskResult.teacher_cache_key == task_result.teacher_cache_key,
+            TaskResult.teacher_cpu_seconds.isnot(None)
+        ).order_by(TaskResult.id.desc()).first()
+        if measured:
+            task_result.teacher_cpu_seconds, task_result.teacher_peak_memory_bytes, task_result.teacher_wall_seconds = measured
+    
+    # A script killed with SIGKILL most likely hit the memory limit, so it needed at least that much
+    killed = bool(task_result.memory_limit_bytes) and any(run.get("exit_code") == -9 for run in runs)
+    if task_result.teacher_cache_key and task_result.teacher_cpu_seconds is None:
+        # Without the teacher's share the usage would understate what the task's pods need
+        if killed:
+            task_result.peak_memory_bytes = task_result.memory_limit_bytes
+        return killed
+    
+    # The teacher and student scripts run one after the other in the same pod
+    task_result.cpu_seconds = (task_result.teacher_cpu_seconds or 0) + sum(float(run.get("cpu_seconds") or 0) for run in student_runs)
+    task_result.wall_seconds = (task_result.teacher_wall_seconds or 0) + sum(float(run.get("wall_seconds") or 0) for run in student_runs)
+    peak = max([task_result.teacher_peak_memory_bytes or 0] + [int(run.get("peak_memory_bytes") or 0) for run in student_runs])
+    if killed:
+        peak = max(peak, task_result.memory_limit_bytes)
+    task_result.peak_memory_bytes = peak
+    return True
+
+def update_resource_profile(task_id: int, db: Session) -> None:
+    """Recompute a task's usage percentiles over its most recent measured attempts."""
+    rows = db.query(TaskResult.cpu_seconds, TaskResult.peak_memory_bytes, TaskResult.wall_seconds).filter(
+        TaskResult.task_id == task_id,
+        or_(TaskResult.peak_memory_bytes.isnot(None), TaskResult.wall_seconds.isnot(None))
+    ).order_by(TaskResult.created_at.desc()).limit(RESOURCE_WINDOW).all()
+    
+    cpu = [r.cpu_seconds for r in rows if r.cpu_seconds is not None]
+    cores = [r.cpu_seconds / r.wall_seconds for r in rows if r.cpu_seconds is not None and r.wall_seconds]
+    memory = [r.peak_memory_bytes for r in rows if r.peak_memory_bytes is not None]
+    wall = [r.wall_seconds for r in rows if r.wall_seconds is not None]
+    values = {
+        "task_id": task_id,
+        "samples": len(rows),
+        "cpu_seconds_p50": percentile(cpu, 0.5),
+        "cpu_seconds_p99": percentile(cpu, 0.99),
+        "cpu_cores_p50": percentile(cores, 0.5),
+        "cpu_cores_p99": percentile(cores, 0.99),
+        "memory_bytes_p50": percentile(memory, 0.5),
+        "memory_bytes_p99": percentile(memory, 0.99),
+        "wall_seconds_p50": percentile(wall, 0.5),
+        "wall_seconds_p99": percentile(wall, 0.99),
+        "updated_at": datetime.utcnow()
+    }
+    if engine.dialect.name == "postgresql":
+        db.execute(pg_insert(TaskResourceProfile).values(**values).on_conflict_do_update(
+            index_elements=["task_id"],
+            set_={key: value for key, value in values.items() if key != "task_id"}
+        ))
+        return
+    
+    profile = db.query(TaskResourceProfile).filter(TaskResourceProfile.task_id == task_id).first()
+    if profile:
+        for key, value in values.items():
+            setattr(profile, key, value)
+    else:
+        db.add(TaskResourceProfile(**values))
+
+def runner_resources(profile: Optional[TaskResourceProfile]) -> Dict[str, Any]:
+    """
+    Resources and deadline for a task's next pod.
+
+    Requests follow the median run so pods pack densely; the memory limit and
+    the deadline follow the 99th percentile plus headroom so few runs are cut
+    short. CPU is not limited, so a run can use idle CPU beyond its request.
+    Tasks with too few measured attempts get the configured defaults.
+    """
+    if profile is None or (profile.samples or 0) < RESOURCE_MIN_SAMPLES or profile.memory_bytes_p99 is None:
+        return {
+            "measured": False,
+            "cpu_request_millicores": RUNNER_CPU_MILLICORES,
+            "memory_request_bytes": RUNNER_MEMORY_MB * MIB,
+            "memory_limit_bytes": RUNNER_MEMORY_LIMIT_MB * MIB,
+            "deadline_seconds": RUNNER_DEADLINE_SECONDS
+        }
+    
+    def clamp(value, low, high):
+        return int(min(max(value, low), high))
+    
+    overhead = RUNNER_MEMORY_OVERHEAD_MB * MIB
+    max_memory = RUNNER_MAX_MEMORY_MB * MIB
+    memory_request = clamp(profile.memory_bytes_p50 + overhead, overhead, max_memory)
+    memory_limit = clamp(profile.memory_bytes_p99 * RESOURCE_HEADROOM + overhead, memory_request, max_memory)
+    return {
+        "measured": True,
+        "cpu_request_millicores": clamp((profile.cpu_cores_p50 or 0) * 1000, RUNNER_MIN_CPU_MILLICORES, RUNNER_MAX_CPU_MILLICORES),
+        "memory_request_bytes": memory_request,
+        "memory_limit_bytes": memory_limit,
+        "deadline_seconds": clamp(
+            (profile.wall_seconds_p99 or 0) * RESOURCE_HEADROOM + RUNNER_DEADLINE_SLACK_SECONDS,
+            RUNNER_DEADLINE_SLACK_SECONDS,
+            RUNNER_MAX_DEADLINE_SECONDS
+        )
+    }
+
+def pod_kill_reason(pod) -> Optional[str]:
+    """Why a failed pod was stopped by its limits: DeadlineExceeded, OOMKilled or None."""
+    if pod.status.phase != "Failed":
+        return None
+    if pod.status.reason == "DeadlineExceeded":
+        return "DeadlineExceeded"
+    for cs in pod.status.container_statuses or []:
+        if cs.state and cs.state.terminated and cs.state.terminated.reason == "OOMKilled":
+            return "OOMKilled"
+    return None
+
+def fail_attempt(task_result: TaskResult, db: Session) -> None:
+    """Mark an attempt ERROR, moving the student's gradebook cell if it is their current attempt."""
+    current = db.query(LatestResult).filter(
+        LatestResult.task_id == task_result.task_id,
+        LatestResult.student_id == task_result.student_id,
+        LatestResult.attempt_id == task_result.id
+    ).first() is not None
+    set_attempt_status(task_result, "ERROR", db)
+    if current:
+        record_gradebook_status(task_result.task_id, task_result.student_id, "ERROR", db)
+
+def fail_killed_attempts(db: Session) -> None:
+    """Mark attempts whose pods hit their memory limit or deadline as ERROR and count them in the profile."""
+    killed = {}
+    live = set()
+    finished_batches = set()
+    for target in dispatcher.targets:
+        try:
+            pods = target.list_pods()
+        except Exception as e:
+            print(f"Error listing task pods in {target.name}: {str(e)}")
+            continue
+        for pod in pods:
+            # A batch regrade pod that stopped leaves all its unpublished attempts without a result
+            if (pod.metadata.labels or {}).get("role") == "regrade":
+                if pod.status.phase in ("Succeeded", "Failed"):
+                    finished_batches.add(pod.metadata.name)
+                continue
+            reason = pod_kill_reason(pod)
+            attempt = (pod.metadata.labels or {}).get("attempt", "")
+            if reason and attempt.isdigit():
+                killed[int(attempt)] = reason
+            elif pod.status.phase in ("Pending", "Running") and attempt.isdigit():
+                live.add(int(attempt))
+    
+    # A hedged attempt is only lost once neither of its pods can still publish
+    for attempt in live:
+        killed.pop(attempt, None)
+    
+    if finished_batches:
+        unpublished = db.query(TaskResult, Task.name, Student.name).join(
+            Task, Task.id == TaskResult.task_id
+        ).join(
+            Student, Student.id == TaskResult.student_id
+        ).filter(
+            TaskResult.pod_name.in_(finished_batches),
+            TaskResult.status == "STARTED"
+        ).all()
+        for task_result, task_name, student_name in unpublished:
+            # Results published just before the pod stopped are collected, not failed
+            update_task_result_status(task_result.task_id, task_result.student_id, task_name, student_name, db)
+            db.refresh(task_result)
+            if task_result.status == "STARTED":
+                fail_attempt(task_result, db)
+        db.commit()
+    
+    if not killed:
+        return
+    
+    for task_result in db.query(TaskResult).filter(TaskResult.id.in_(killed), TaskResult.status == "STARTED").all():
+        # The run needed at least the limit it was stopped at
+        if killed[task_result.id] == "OOMKilled":
+            task_result.peak_memory_bytes = task_result.memory_limit_bytes
+        else:
+            task_result.wall_seconds = task_result.deadline_seconds
+        
+        fail_attempt(task_result, db)
+        db.flush()
+        update_resource_profile(task_result.task_id, db)
+        db.commit()
+        print(f"Attempt {task_result.id} stopped: {killed[task_result.id]}")
+
+def store_precheck_report(task_result: TaskResult, message: str, db: Session) -> None:
+    """Store the precheck failure as the attempt's output so it is read like any other result."""
+    report = f"COMPILE_ERROR: Script rejected before running\n  {message}\n".encode()
+    writer = blobstore.BlobWriter()
+    writer.write(report)
+    task_result.output_hash = store_blob(writer, db)
+    task_result.patterns_found = 0
+    task_result.total_patterns = 0
+
+def get_latest_attempt(task_id: int, student_id: int, db: Session) -> Optional[TaskResult]:
+    """The student's current attempt at a task, found through the latest_results primary key."""
+    return db.query(TaskResult).join(
+        LatestResult, LatestResult.attempt_id == TaskResult.id
+    ).filter(
+        LatestResult.task_id == task_id,
+        LatestResult.student_id == student_id
+    ).first()
+
+def set_latest_attempt(task_result: TaskResult, db: Session) -> None:
+    """Make an attempt the student's current one with a single upsert."""
+    values = {
+        "task_id": task_result.task_id,
+        "student_id": task_result.student_id,
+        "attempt_id": task_result.id,
+        "status": task_result.status,
+        "updated_at": datetime.utcnow()
+    }
+    if engine.dialect.name == "postgresql":
+        db.execute(pg_insert(LatestResult).values(**values).on_conflict_do_update(
+            index_elements=["task_id", "student_id"],
+            set_={key: values[key] for key in ("attempt_id", "status", "updated_at")}
+        ))
+        return
+    
+    latest = db.query(LatestResult).filter(
+        LatestResult.task_id == task_result.task_id,
+        LatestResult.student_id == task_result.student_id
+    ).first()
+    if latest:
+        latest.attempt_id = task_result.id
+        latest.status = task_result.status
+        latest.updated_at = values["updated_at"]
+    else:
+        db.add(LatestResult(**values))
+        db.flush()
+
+def set_attempt_status(task_result: TaskResult, status: str, db: Session) -> None:
+    """Change an attempt's status, and the student's latest status if the attempt is still current."""
+    task_result.status = status
+    db.query(LatestResult).filter(
+        LatestResult.task_id == task_result.task_id,
+        LatestResult.student_id == task_result.student_id,
+        LatestResult.attempt_id == task_result.id
+    ).update({
+        LatestResult.status: status,
+        LatestResult.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+def save_spans(attempt_id: int, spans: List[tracing.Span], db: Session) -> None:
+    for span in spans:
+        db.add(SubmissionSpan(
+            attempt_id=attempt_id,
+            name=span.name,
+            source=span.source,
+            started_at=span.started_at,
+            ended_at=span.ended_at,
+            attributes=json.dumps(span.attributes) if span.attributes else None
+        ))
+    db.commit()
+
+def load_spans(attempt_id: int, db: Session) -> List[tracing.Span]:
+    rows = db.query(SubmissionSpan).filter(SubmissionSpan.attempt_id == attempt_id).order_by(
+        SubmissionSpan.started_at, SubmissionSpan.id
+    ).all()
+    return [
+        tracing.Span(row.name, row.source, row.started_at, row.ended_at, json.loads(row.attributes) if row.attributes else {})
+        for row in rows
+    ]
+
+def trace_attributes(task_result: TaskResult, task_name: str, student_name: str) -> Dict[str, Any]:
+    return {
+        "attempt.id": task_result.id,
+        "task.name": task_name,
+        "student.name": student_name,
+        "attempt.status": task_result.status or "",
+        "pod.name": task_result.result_pod or task_result.pod_name or "",
+        "attempt.hedged": bool(task_result.hedge_pod_name)
+    }
+
+def record_runner_timeline(result_dir: Path) -> List[tracing.Span]:
+    """Phases the runner timed inside the pod; the file is consumed like usage.jsonl."""
+    timeline_file = result_dir / "timeline.jsonl"
+    if not timeline_file.exists():
+        return []
+    spans = tracing.parse_runner_timeline(timeline_file.read_text())
+    timeline_file.unlink()
+    return spans
+
+def record_pod_timeline(task_result: TaskResult) -> List[tracing.Span]:
+    """Creation, events and container run of the attempt's pod, as far as the cluster still has them."""
+    if not TRACE_POD_EVENTS or not task_result.pod_name:
+        return []
+    # Of a hedged attempt, follow the pod that published the result
+    pod_name, target_name = task_result.pod_name, task_result.pod_target
+    if task_result.hedge_pod_name and task_result.result_pod == task_result.hedge_pod_name:
+        pod_name, target_name = task_result.hedge_pod_name, task_result.hedge_pod_target
+    target = dispatcher.get(target_name)
+    spans = []
+    try:
+        pod = target.pod_informer.get(pod_name) if target.pod_informer and target.pod_informer.synced.is_set() else None
+        if pod is None:
+            pod = target.core_v1.read_namespaced_pod(name=pod_name, namespace=target.namespace)
+        created_at = tracing.utc_naive(pod.metadata.creation_timestamp)
+        if created_at:
+            spans.append(tracing.Span("pod_created", "pod", created_at, created_at))
+        for cs in pod.status.container_statuses or []:
+            terminated = cs.state.terminated if cs.state else None
+            if terminated and terminated.started_at and terminated.finished_at:
+                spans.append(tracing.Span(
+                    "container", "pod",
+                    tracing.utc_naive(terminated.started_at),
+                    tracing.utc_naive(terminated.finished_at),
+                    {"exit_code": terminated.exit_code, "reason": terminated.reason or ""}
+                ))
+    except Exception as e:
+        print(f"Error reading pod {pod_name}: {str(e)}")
+    
+    # Scheduled, Pulling, Pulled, Created and Started; events expire after an hour by default
+    try:
+        events = target.core_v1.list_namespaced_event(
+            namespace=target.namespace,
+            field_selector=f"involvedObject.name={pod_name}"
+        ).items
+        for event in events:
+            at = tracing.utc_naive(event.event_time or event.first_timestamp or event.last_timestamp)
+            if at:
+                spans.append(tracing.Span(event.reason or "event", "pod", at, at, {"message": event.message or ""}))
+    except Exception as e:
+        print(f"Error reading events of pod {pod_name}: {str(e)}")
+    return spans
+
+def claim_ingest(task_result: TaskResult, db: Session) -> bool:
+    """Claim an uncollected attempt for collecting its output; False if another worker has it or is done."""
+    now = datetime.utcnow()
+    claimed = db.query(TaskResult).filter(
+        TaskResult.id == task_result.id,
+        TaskResult.output_hash.is_(None),
+        or_(
+            TaskResult.ingest_claimed_at.is_(None),
+            TaskResult.ingest_claimed_at < now - timedelta(seconds=INGEST_CLAIM_SECONDS)
+        )
+    ).update({TaskResult.ingest_claimed_at: now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def release_ingest(task_result: TaskResult, db: Session) -> None:
+    """Give up a claim that did not store an output, so the output can be collected later."""
+    db.query(TaskResult).filter(
+        TaskResult.id == task_result.id,
+        TaskResult.output_hash.is_(None)
+    ).update({TaskResult.ingest_claimed_at: None}, synchronize_session=False)
+    db.commit()
+
+def update_task_result_status(task_id: int, student_id: int, task_name: str, student_name: str, db: Session) -> None:
+    """Update task result status based on validation output."""
+    result_dir = SHARED_OUTPUT_DIR / task_name / student_name
+    status_file = result_dir / "status.txt"
+    attempt_file = result_dir / "result_attempt.txt"
+    
+    if status_file.exists() and status_file.read_text().strip() == "COMPLETED":
+        task_result = get_latest_attempt(task_id, student_id, db)
+        if not task_result or task_result.output_hash:
+            return
+        
+        # Ignore output published late by a superseded attempt
+        if attempt_file.exists() and attempt_file.read_text().strip() != str(task_result.id):
+            return
+        
+        # The sweep, result reads and other workers may all see the output; one of them collects it
+        if not claim_ingest(task_result, db):
+            return
+        
+        # Store the output and determine the final status
+        try:
+            status = ingest_output(result_dir, task_result, db)
+        except Exception:
+            db.rollback()
+            release_ingest(task_result, db)
+            raise
+        if status is None:
+            release_ingest(task_result, db)
+            return
+        pod_file = result_dir / "result_pod.txt"
+        if pod_file.exists():
+            task_result.result_pod = pod_file.read_text().strip() or None
+        
+        # Fold the measured usage into the task's resource profile
+        if record_resource_usage(result_dir, task_result, db):
+            db.flush()
+            update_resource_profile(task_id, db)
+        
+        # Update the attempt and the latest result in the database
+        if task_result.status != status:
+            set_attempt_status(task_result, status, db)
+            record_gradebook_status(task_id, student_id, status, db)
+        
+        # Reads collect results too, so the pod's side is left to the result sweep
+        collected_at = datetime.utcnow()
+        task_result.pod_followup_at = collected_at
+        db.commit()
+        
+        spans = record_runner_timeline(result_dir)
+        spans.append(tracing.Span("collect", "api", collected_at, collected_at))
+        save_spans(task_result.id, spans, db)
+
+def follow_up_collected_pods(db: Session) -> None:
+    """Complete the timelines of collected attempts from the cluster and cancel the pods of hedge losers."""
+    pending = db.query(TaskResult, Task.name, Student.name).join(
+        Task, Task.id == TaskResult.task_id
+    ).join(
+        Student, Student.id == TaskResult.student_id
+    ).filter(TaskResult.pod_followup_at.isnot(None)).order_by(TaskResult.pod_followup_at).limit(GC_BATCH_SIZE).all()
+    for task_result, task_name, student_name in pending:
+        # Every worker sweeps; the one that clears the mark does the work
+        claimed = db.query(TaskResult).filter(
+            TaskResult.id == task_result.id,
+            TaskResult.pod_followup_at.isnot(None)
+        ).update({TaskResult.pod_followup_at: None}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            continue
         
-        # Copy output files from pod
-        for file in ["teacher_output.txt", "student_output.txt", "result.txt", "diff.txt"]:
+        save_spans(task_result.id, record_pod_timeline(task_result), db)
+        tracing.export(
+            task_result.trace_id, "submission", load_spans(task_result.id, db),
+            trace_attributes(task_result, task_name, student_name)
+        )
+        
+        # The first pod of a hedged attempt won; the other one is no longer needed
+        cancel_hedge_loser(task_result)
+
+# Cached task metadata: task name -> ((task id, updated_at), expires_at, metadata)
+_task_metadata_cache: Dict[str, Tuple[Tuple[int, Optional[datetime]], float, Dict[str, Any]]] = {}
+
+def invalidate_task_metadata(task_name: str) -> None:
+    """Drop this worker's entry, so its result count is read again."""
+    _task_metadata_cache.pop(task_name, None)
+
+def load_task_metadata(task_name: str, db: Session) -> Optional[Dict[str, Any]]:
+    """
+    Task description, file listing and result count, served from a TTL cache.
+    
+    Entries are keyed on the task's id and updated_at, read from the database
+    on every call, so an update, deletion or recreation made through any
+    worker is seen at once. Only the result count may lag by up to the TTL.
+    """
+    now = time.monotonic()
+    stamp = db.query(Task.id, Task.updated_at).filter(Task.name == task_name).first()
+    if not stamp:
+        _task_metadata_cache.pop(task_name, None)
+        return None
+    stamp = (stamp.id, stamp.updated_at)
+    cached = _task_metadata_cache.get(task_name)
+    if cached and cached[0] == stamp and cached[1] > now:
+        return cached[2]
+    
+    task_obj = db.query(Task).filter(Task.id == stamp[0]).first()
+    if not task_obj:
+        return None
+    
+    task_dir = TASKS_DIR / task_name
+    metadata = {
+        "id": task_obj.id,
+        "description": task_obj.description,
+        "files": [f.name for f in task_dir.iterdir() if f.is_file()] if task_dir.exists() else None,
+        "path": str(task_dir),
+        "result_count": db.query(LatestResult).filter(LatestResult.task_id == task_obj.id).count(),
+        "deadline": task_obj.deadline.isoformat() if task_obj.deadline else None,
+        "version": task_obj.version or 1,
+        "comparison": {
+            "mode": task_obj.comparison_mode or "exact",
+            "abs_tol": task_obj.abs_tol or 0.0,
+            "rel_tol": task_obj.rel_tol or 0.0
+        }
+    }
+    _task_metadata_cache[task_name] = (stamp, now + TASK_METADATA_TTL_SECONDS, metadata)
+    return metadata
+
+def conditional_json(request: Request, payload: Dict[str, Any]) -> Response:
+    """JSON response with an ETag; answers 304 when the client already has this representation."""
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={TASK_METADATA_MAX_AGE}, must-revalidate"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=start-end` range into inclusive offsets, or None if unsatisfiable."""
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = int(end) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first >= size or last < first:
+        return None
+    return first, min(last, size - 1)
+
+def blob_response(digest: str, db: Session, range_header: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> Response:
+    """Stream a stored output, honouring a Range header or an offset/limit window."""
+    blob = db.query(OutputBlob).filter(OutputBlob.digest == digest).first()
+    if not blob or not blobstore.blob_exists(digest):
+        raise HTTPException(status_code=404, detail="Output not found")
+    
+    headers = {"Accept-Ranges": "bytes"}
+    status_code = 200
+    if range_header:
+        byte_range = parse_byte_range(range_header, blob.size)
+        if byte_range is None:
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable")
+        offset, last = byte_range
+        limit = last - offset + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {offset}-{last}/{blob.size}"
+    
+    return StreamingResponse(
+        blobstore.iter_blob(digest, offset, limit),
+        status_code=status_code,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+def record_gradebook_status(task_id: int, student_id: int, status: str, db: Session) -> None:
+    """Move a student's gradebook cell to a new status and adjust the summary counters."""
+    # Every group that contains the student and has the task assigned
+    group_ids = [tg.group_id for tg in db.query(TaskGroup).join(
+        StudentGroup, StudentGroup.group_id == TaskGroup.group_id
+    ).filter(
+        TaskGroup.task_id == task_id,
+        StudentGroup.student_id == student_id
+    ).all()]
+    
+    for group_id in group_ids:
+        entry = db.query(GradebookEntry).filter(
+            GradebookEntry.group_id == group_id,
+            GradebookEntry.task_id == task_id,
+            GradebookEntry.student_id == student_id
+        ).first()
+        old_status = entry.status if entry else None
+        if old_status == status:
+            continue
+        
+        if entry:
+            entry.status = status
+            entry.updated_at = datetime.utcnow()
+        else:
+            db.add(GradebookEntry(
+                group_id=group_id,
+                task_id=task_id,
+                student_id=student_id,
+                status=status
+            ))
+        
+        summary = db.query(GradebookSummary).filter(
+            GradebookSummary.group_id == group_id,
+            GradebookSummary.task_id == task_id
+        )
+        if not summary.first():
+            db.add(GradebookSummary(
+                group_id=group_id,
+                task_id=task_id,
+                started_count=0,
+                success_count=0,
+                fail_count=0,
+                error_count=0
+            ))
+            db.flush()
+        
+        # Increment in SQL so concurrent workers never lose an update
+        counters = {}
+        if old_status:
+            old_column = getattr(GradebookSummary, GRADEBOOK_COUNTERS.get(old_status, "error_count"))
+            counters[old_column] = old_column - 1
+        new_column = getattr(GradebookSummary, GRADEBOOK_COUNTERS.get(status, "error_count"))
+        counters[new_column] = new_column + 1
+        summary.update(counters, synchronize_session=False)
+
+def sweep_started_results() -> None:
+    """Pick up results whose pods finished so the gradebook reflects them without a read."""
+    db = SessionLocal()
+    try:
+        pending = db.query(LatestResult.task_id, LatestResult.student_id, Task.name, Student.name).join(
+            Task, Task.id == LatestResult.task_id
+        ).join(
+            Student, Student.id == LatestResult.student_id
+        ).filter(LatestResult.status == "STARTED").all()
+        for task_id, student_id, task_name, student_name in pending:
+            update_task_result_status(task_id, student_id, task_name, student_name, db)
+        
+        # Pods stopped by their limits never publish a result
+        if pending:
+            fail_killed_attempts(db)
+        
+        follow_up_collected_pods(db)
+        index_missing_submissions(db)
+        resume_regrades(db)
+    finally:
+        db.close()
+
+async def run_periodic(name: str, interval: float, func) -> None:
+    """Run a blocking maintenance function every `interval` seconds in the threadpool."""
+    while True:
+        try:
+            await run_in_threadpool(func)
+        except Exception as e:
+            print(f"Error in {name}: {str(e)}")
+        await asyncio.sleep(interval)
+
+# Set once startup initialization has finished in this worker
+app_ready = False
+# The worker's event loop, for scheduling work from request handlers running in the threadpool
+event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def initialize() -> None:
+    """Prepare data directories and the database schema; safe to run in several workers at once."""
+    for directory in [BASE_DIR, TASKS_DIR, RESULTS_DIR, TEACHERS_DIR, STUDENTS_DIR]:
+        directory.mkdir(parents=True, exist_ok=True)
+    ensure_schema()
+
+@app.on_event("startup")
+async def startup():
+    global app_ready, event_loop
+    event_loop = asyncio.get_event_loop()
+    await run_in_threadpool(initialize)
+    app_ready = True
+    
+    # Load the Kubernetes configuration of every dispatch target off the request path
+    asyncio.create_task(run_in_threadpool(dispatcher.warm))
+    
+    asyncio.create_task(run_periodic("result sweep", RESULT_SWEEP_INTERVAL, sweep_started_results))
+    asyncio.create_task(run_periodic("garbage collection", GC_INTERVAL_SECONDS, run_garbage_collection))
+    asyncio.create_task(run_periodic("capacity planner", CAPACITY_INTERVAL_SECONDS, run_capacity_planner))
+    asyncio.create_task(run_periodic("hedging", HEDGE_INTERVAL_SECONDS, hedge_stragglers))
+
+@app.get("/healthz")
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readiness(db: Session = Depends(get_db)):
+    if not app_ready:
+        raise HTTPException(status_code=503, detail="Starting up")
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {str(e)}")
+    return {"status": "ready"}
+
+# Pending debounced pod launches keyed by (task_name, student_name); changed on the event loop,
+# read by submissions in the threadpool
+_pending_launches: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+_pending_launches_lock = threading.Lock()
+
+def launch_pending(task_name: str, student_name: str) -> bool:
+    with _pending_launches_lock:
+        return (task_name, student_name) in _pending_launches
+
+def launch_task_pod(task_name: str, student_name: str, attempt_id: int) -> Optional[str]:
+    """Start the pod for an attempt unless a newer submission has replaced it."""
+    db = SessionLocal()
+    try:
+        task_result = db.query(TaskResult).filter(TaskResult.id == attempt_id).first()
+        if not task_result or task_result.status != "STARTED":
+            return None
+        
+        recorder = tracing.SpanRecorder()
+        with recorder.span("create_pod", debounced=True):
+            pod_name = create_task_pod(task_name, student_name, db, attempt_id)
+        save_spans(attempt_id, recorder.spans, db)
+        if not pod_name:
+            set_attempt_status(task_result, "ERROR", db)
+            record_gradebook_status(task_result.task_id, task_result.student_id, "ERROR", db)
+            db.commit()
+        return pod_name
+    finally:
+        db.close()
+
+def run_in_background(func, *args) -> None:
+    """Start a blocking function in the threadpool without waiting for it; safe to call from any thread."""
+    event_loop.call_soon_threadsafe(lambda: event_loop.create_task(run_in_threadpool(func, *args)))
+
+def schedule_task_pod(task_name: str, student_name: str, attempt_id: int) -> None:
+    """Launch the pod after the debounce window, replacing any launch still pending; safe to call from any thread."""
+    key = (task_name, student_name)
+    
+    def fire():
+        with _pending_launches_lock:
+            _pending_launches.pop(key, None)
+        event_loop.create_task(run_in_threadpool(launch_task_pod, task_name, student_name, attempt_id))
+    
+    # Timers are only touched from the event loop
+    def schedule():
+        with _pending_launches_lock:
+            pending = _pending_launches.pop(key, None)
+            if pending:
+                pending.cancel()
+            _pending_launches[key] = event_loop.call_later(RESUBMIT_DEBOUNCE_SECONDS, fire)
+    
+    event_loop.call_soon_threadsafe(schedule)
+
+# Report of the most recent hedging pass
+last_hedge_report: Dict[str, Any] = {}
+
+def hedge_stragglers() -> Dict[str, Any]:
+    """
+    Launch a duplicate pod for attempts whose pod is still pending after most pods would have started.
+
+    A pod counts as a straggler once it has been pending longer than the
+    HEDGE_PERCENTILE of its target's recent start latencies, and at least
+    HEDGE_MIN_SECONDS. Its duplicate avoids the first pod's node; whichever
+    publishes first wins and the other is deleted when the result is collected.
+    At most HEDGE_MAX_LIVE duplicates run at once.
+    """
+    global last_hedge_report
+    report = {"stragglers": 0, "hedged": 0, "live_hedges": 0, "thresholds": {}}
+    if HEDGE_PERCENTILE <= 0:
+        return report
+    
+    now = datetime.now(timezone.utc)
+    stragglers = {}
+    for target in dispatcher.targets:
+        threshold = target.start_latency_percentile(HEDGE_PERCENTILE)
+        # Without enough history a slow start cannot be told from a normal one
+        if threshold is None:
+            continue
+        threshold = max(threshold, HEDGE_MIN_SECONDS)
+        report["thresholds"][target.name] = round(threshold, 3)
+        try:
+            pods = target.list_pods()
+        except Exception as e:
+            print(f"Error listing task pods in {target.name}: {str(e)}")
+            continue
+        for pod in pods:
+            labels = pod.metadata.labels or {}
+            if pod.status.phase not in ("Pending", "Running"):
+                continue
+            if labels.get("hedge") == "true":
+                report["live_hedges"] += 1
+                continue
+            attempt = labels.get("attempt", "")
+            if labels.get("role") == "regrade" or not attempt.isdigit() or pod.status.phase != "Pending":
+                continue
+            created_at = pod.metadata.creation_timestamp
+            if created_at and (now - created_at).total_seconds() > threshold:
+                stragglers[int(attempt)] = created_at
+    report["stragglers"] = len(stragglers)
+    
+    budget = HEDGE_MAX_LIVE - report["live_hedges"]
+    if stragglers and budget > 0:
+        db = SessionLocal()
+        try:
+            # Longest waiting first
+            rows = db.query(TaskResult.id, Task.name, Student.name).join(
+                Task, Task.id == TaskResult.task_id
+            ).join(
+                Student, Student.id == TaskResult.student_id
+            ).filter(
+                TaskResult.id.in_(stragglers),
+                TaskResult.status == "STARTED",
+                TaskResult.hedge_pod_name.is_(None)
+            ).all()
+            rows.sort(key=lambda row: stragglers[row[0]])
+            for attempt_id, task_name, student_name in rows[:budget]:
+                started_at = datetime.utcnow()
+                pod_name = create_task_pod(task_name, student_name, db, attempt_id, hedge=True)
+                if pod_name:
+                    save_spans(attempt_id, [tracing.Span("hedge", "api", started_at, datetime.utcnow(), {"pod": pod_name})], db)
+                    report["hedged"] += 1
+        finally:
+            db.close()
+    
+    if report["hedged"]:
+        print(f"Hedged {report['hedged']} of {report['stragglers']} slow-starting task pods")
+    last_hedge_report = dict(report, ran_at=datetime.utcnow().isoformat())
+    return report
+
+def create_regrade_pod(task: Task, version: int, run: str, manifest_path: Path, db: Session) -> Optional[Tuple[str, str]]:
+    """Start the batch pod that regrades stored outputs; returns its name and target."""
+    try:
+        sanitized_task_name = sanitize_k8s_name(task.name, "task")
+        # Each set of entries gets its own pod, so a resumed regrade never mistakes an earlier pod for its own
+        suffix = f"-v{version}-{run}"
+        pod_name = f"regrade-{sanitized_task_name}"[:63 - len(suffix)] + suffix
+        
+        # Sized like the task's pods, with REGRADE_DEADLINE_SECONDS instead of their deadline
+        profile = db.query(TaskResourceProfile).filter(TaskResourceProfile.task_id == task.id).first()
+        resources = runner_resources(profile)
+        
+        pod_template = f"""
+apiVersion: v1
+kind: Pod
+metadata:
+  name: {pod_name}
+  labels:
+    app: task
+    task: {sanitized_task_name}
+    role: regrade
+    version: "{version}"
+spec:
+  activeDeadlineSeconds: {REGRADE_DEADLINE_SECONDS}
+  containers:
+    - name: regrade
+      image: {TASK_IMAGE}
+      imagePullPolicy: IfNotPresent
+      command: ["python3"]
+      args: ["/shared/input/{task.name}/script/regrade_batch.py", "{manifest_path}"]
+      resources:
+        requests:
+          cpu: "{resources['cpu_request_millicores']}m"
+          memory: "{resources['memory_request_bytes']}"
+        limits:
+          memory: "{resources['memory_limit_bytes']}"
+      volumeMounts:
+        - name: shared-volume
+          mountPath: /shared
+  volumes:
+    - name: shared-volume
+      persistentVolumeClaim:
+        claimName: shared-pvc
+  restartPolicy: Never
+"""
+        target = dispatcher.create_pod(yaml.safe_load(pod_template), prepare=require_shared_pvc)
+        return pod_name, target.name
+    except Exception as e:
+        print(f"Error creating regrade pod: {str(e)}")
+        return None
+
+def claim_regrade(task_id: int, version: int, db: Session) -> bool:
+    """Claim or renew the claim on a pending regrade; False if another worker has it or it is done."""
+    now = datetime.utcnow()
+    claimed = db.query(TaskVersion).filter(
+        TaskVersion.task_id == task_id,
+        TaskVersion.version == version,
+        TaskVersion.regrade_state == "pending",
+        or_(
+            TaskVersion.regrade_claimed_at.is_(None),
+            TaskVersion.regrade_claimed_at < now - timedelta(seconds=REGRADE_CLAIM_SECONDS)
+        )
+    ).update({TaskVersion.regrade_claimed_at: now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def regrade_task(task_id: int, version: int) -> Dict[str, int]:
+    """
+    Grade every student's current attempt against a new version of a task.
+
+    Each current attempt is superseded by a new one. When the student's output
+    is still stored and their inputs did not change, the new attempts go to a
+    single batch pod that only runs the teacher's side and compares. The rest,
+    and every attempt when vars.txt changed, run in normal task pods.
+    
+    Every step can be repeated, so a regrade interrupted by a worker restart
+    is finished by the result sweep once its claim expires.
+    """
+    report = {"incremental": 0, "rerun": 0, "skipped": 0}
+    db = SessionLocal()
+    try:
+        if not claim_regrade(task_id, version, db):
+            return report
+        task_version = db.query(TaskVersion).filter(TaskVersion.task_id == task_id, TaskVersion.version == version).first()
+        task = db.query(Task).filter(Task.id == task_id).first()
+        # A newer update has its own regrade, which supersedes this one's attempts
+        if not task or (task.version or 1) != version:
+            task_version.regrade_state = "done"
+            db.commit()
+            return report
+        rerun_students = "vars" in (task_version.changes or "").split(",")
+        
+        # Supersede the current attempts not yet graded against this version
+        current = db.query(TaskResult, Student.name).join(
+            LatestResult, LatestResult.attempt_id == TaskResult.id
+        ).join(
+            Student, Student.id == TaskResult.student_id
+        ).filter(LatestResult.task_id == task_id).all()
+        
+        for previous, student_name in current:
+            if (previous.task_version or 1) == version:
+                continue
+            script_path = SHARED_INPUT_DIR / task.name / student_name / f"{student_name}_script.py"
+            # Rejected scripts do not depend on the teacher's side
+            if previous.status == "COMPILE_ERROR" or not script_path.exists():
+                report["skipped"] += 1
+                continue
+            
+            if previous.status == "STARTED":
+                cancel_task_pods(task.name, student_name)
+            
+            task_result = TaskResult(
+                task_id=task.id,
+                student_id=previous.student_id,
+                status="STARTED",
+                script_hash=previous.script_hash,
+                task_version=version,
+                regrade_of=previous.id,
+                trace_id=tracing.new_trace_id(),
+                vars_seed=previous.vars_seed,
+                vars_values=previous.vars_values,
+                teacher_output_path="",
+                student_output_path=""
+            )
+            db.add(task_result)
+            db.flush()
+            set_latest_attempt(task_result, db)
+            record_gradebook_status(task.id, previous.student_id, "STARTED", db)
+            if previous.status == "STARTED":
+                previous.status = "CANCELLED"
+            task_version.regrade_claimed_at = datetime.utcnow()
+            db.commit()
+        
+        # Start every current successor that has no pod yet, including those of an interrupted run
+        Previous = aliased(TaskResult)
+        pending = db.query(TaskResult, Previous, Student.name).join(
+            LatestResult, LatestResult.attempt_id == TaskResult.id
+        ).join(
+            Previous, Previous.id == TaskResult.regrade_of
+        ).join(
+            Student, Student.id == TaskResult.student_id
+        ).filter(
+            LatestResult.task_id == task_id,
+            TaskResult.task_version == version,
+            TaskResult.status == "STARTED",
+            TaskResult.pod_name.is_(None)
+        ).all()
+        
+        entries = []
+        reruns = []
+        for task_result, previous, student_name in pending:
+            input_dir = SHARED_INPUT_DIR / task.name / student_name
+            
+            # Mark the attempt whose output may be published
+            output_dir = SHARED_OUTPUT_DIR / task.name / student_name
+            output_dir.mkdir(parents=True, exist_ok=True)
+            (output_dir / "current_attempt.txt").write_text(str(task_result.id))
+            
+            reuse = (
+                not rerun_students and
+                previous.status not in ("STARTED", "CANCELLED") and
+                previous.student_output_hash is not None and
+                blobstore.blob_exists(previous.student_output_hash)
+            )
+            if reuse:
+                entries.append({
+                    "attempt_id": task_result.id,
+                    "student_name": student_name,
+                    "student_script": str(input_dir / f"{student_name}_script.py"),
+                    "student_output_blob": str(blobstore.blob_path(previous.student_output_hash)),
+                    "vars_path": str(input_dir / "vars.txt")
+                })
+            else:
+                reruns.append((student_name, task_result))
+        
+        for student_name, task_result in reruns:
+            # New variable ranges need new values; otherwise the student keeps theirs
+            random_values = assign_variables(task, task_result, db, keep=not rerun_students)
+            if rerun_students:
+                vars_path = SHARED_INPUT_DIR / task.name / student_name / "vars.txt"
+                if random_values:
+                    vars_path.write_text(seeding.vars_text(random_values))
+                elif vars_path.exists():
+                    vars_path.unlink()
+            # Pod names follow the attempt id, so a pod created before an interruption is not created twice
+            task_version.regrade_claimed_at = datetime.utcnow()
+            if not create_task_pod(task.name, student_name, db, task_result.id):
+                fail_attempt(task_result, db)
+                db.commit()
+            report["rerun"] += 1
+        
+        regrade_pod = task_version.regrade_pod
+        if entries:
+            run = hashlib.sha256(",".join(str(e["attempt_id"]) for e in entries).encode()).hexdigest()[:8]
+            manifest_path = SHARED_INPUT_DIR / task.name / "regrade" / f"{version}-{run}.json"
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            staging_path = manifest_path.with_suffix(".tmp")
+            staging_path.write_text(json.dumps({
+                "task_name": task.name,
+                "version": version,
+                "teacher_script": str(SHARED_INPUT_DIR / task.name / "teacher" / "teacher_script.py"),
+                "find_file": str(SHARED_INPUT_DIR / task.name / "script" / "find.txt"),
+                "output_dir": str(SHARED_OUTPUT_DIR / task.name),
+                "mode": task.comparison_mode or "exact",
+                "abs_tol": task.abs_tol or 0.0,
+                "rel_tol": task.rel_tol or 0.0,
+                "entries": entries
+            }))
+            os.replace(staging_path, manifest_path)
+            
+            created = create_regrade_pod(task, version, run, manifest_path, db)
+            attempts = db.query(TaskResult).filter(TaskResult.id.in_([e["attempt_id"] for e in entries]))
+            if created:
+                regrade_pod, pod_target = created
+                attempts.update({"pod_name": regrade_pod, "pod_target": pod_target}, synchronize_session=False)
+            else:
+                for task_result in attempts.all():
+                    fail_attempt(task_result, db)
+            db.commit()
+            report["incremental"] = len(entries)
+        
+        # Counts add up over an interrupted run and the run that finished it
+        task_version.regrade_state = "done"
+        task_version.regrade_pod = regrade_pod
+        task_version.incremental_count = (task_version.incremental_count or 0) + report["incremental"]
+        task_version.rerun_count = (task_version.rerun_count or 0) + report["rerun"]
+        task_version.skipped_count = report["skipped"]
+        db.commit()
+        print(f"Regrade of {task.name} v{version}: {report}")
+        return report
+    finally:
+        db.close()
+
+def resume_regrades(db: Session) -> None:
+    """Finish regrades whose worker stopped before they were done."""
+    cutoff = datetime.utcnow() - timedelta(seconds=REGRADE_CLAIM_SECONDS)
+    abandoned = db.query(TaskVersion.task_id, TaskVersion.version).filter(
+        TaskVersion.regrade_state == "pending",
+        or_(TaskVersion.regrade_claimed_at.is_(None), TaskVersion.regrade_claimed_at < cutoff),
+        TaskVersion.created_at < cutoff
+    ).all()
+    for task_id, version in abandoned:
+        run_in_background(regrade_task, task_id, version)
+
+# Report of the most recent garbage collection run
+last_gc_report: Dict[str, Any] = {}
+
+def _pod_finished_at(pod) -> Optional[datetime]:
+    finished = [
+        cs.state.terminated.finished_at
+        for cs in (pod.status.container_statuses or [])
+        if cs.state and cs.state.terminated and cs.state.terminated.finished_at
+    ]
+    if finished:
+        return max(finished)
+    return pod.status.start_time
+
+def reap_finished_pods() -> int:
+    """Delete task pods that finished more than POD_TTL_SECONDS ago, in every dispatch target."""
+    deleted = 0
+    for target in dispatcher.targets:
+        try:
+            deleted += reap_target_pods(target)
+        except Exception as e:
+            print(f"Error reaping task pods in {target.name}: {str(e)}")
+    return deleted
+
+def reap_target_pods(target: Target) -> int:
+    """Delete one target's expired task pods in batches of attempts."""
+    core_v1 = target.core_v1
+    pods = target.list_pods()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=POD_TTL_SECONDS)
+    
+    expired_attempts = set()
+    deleted = 0
+    for pod in pods:
+        if pod.status.phase not in ("Succeeded", "Failed"):
+            continue
+        finished_at = _pod_finished_at(pod)
+        if finished_at is None or finished_at > cutoff:
+            continue
+        attempt = (pod.metadata.labels or {}).get("attempt")
+        if attempt:
+            expired_attempts.add(attempt)
+        else:
+            # Pods from before attempt labels existed are deleted one by one
             try:
-                content = v1.read_namespaced_pod_exec(
-                    name=pod_name,
-                    namespace="default",
-                    command=["cat", f"/app/output/{file}"]
-                )
-                with open(result_dir / file, "w") as f:
-                    f.write(content)
-            except:
-                pass
+                core_v1.delete_namespaced_pod(name=pod.metadata.name, namespace=target.namespace)
+                deleted += 1
+            except Exception as e:
+                print(f"Error deleting pod {pod.metadata.name}: {str(e)}")
+    
+    # A single collection delete per batch; the phase selector spares any pod still running
+    attempts = sorted(expired_attempts)
+    for i in range(0, len(attempts), GC_BATCH_SIZE):
+        batch = attempts[i:i + GC_BATCH_SIZE]
+        try:
+            core_v1.delete_collection_namespaced_pod(
+                namespace=target.namespace,
+                label_selector=f"app=task,attempt in ({','.join(batch)})",
+                field_selector="status.phase!=Pending,status.phase!=Running"
+            )
+            deleted += len(batch)
+        except Exception as e:
+            print(f"Error deleting finished pods: {str(e)}")
+    
+    return deleted
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def prune_outputs(db: Session) -> Dict[str, int]:
+    """Remove orphaned, superseded and expired output directories and ingest leftover outputs."""
+    report = {"output_dirs_removed": 0, "staging_dirs_removed": 0, "outputs_ingested": 0, "bytes_reclaimed": 0}
+    if not SHARED_OUTPUT_DIR.exists():
+        return report
+    
+    now = time.time()
+    retention_cutoff = datetime.utcnow() - timedelta(days=OUTPUT_RETENTION_DAYS)
+    
+    # Release the stored outputs of superseded attempts past the retention period so the blob collector
+    # can reclaim them; current results keep theirs for the gradebook and regrades
+    if OUTPUT_RETENTION_DAYS > 0:
+        db.query(TaskResult).filter(
+            TaskResult.created_at < retention_cutoff,
+            TaskResult.output_hash.isnot(None),
+            TaskResult.id.notin_(db.query(LatestResult.attempt_id).filter(LatestResult.attempt_id.isnot(None)))
+        ).update({
+            TaskResult.output_hash: None,
+            TaskResult.teacher_output_hash: None,
+            TaskResult.student_output_hash: None
+        }, synchronize_session=False)
+        db.commit()
+    
+    tasks = {t.name: t.id for t in db.query(Task.id, Task.name).all()}
+    
+    for task_dir in SHARED_OUTPUT_DIR.iterdir():
+        if not task_dir.is_dir():
+            continue
         
-        # Read results
-        results = {}
-        for file in ["teacher_output.txt", "student_output.txt", "result.txt", "diff.txt"]:
-            if (result_dir / file).exists():
-                with open(result_dir / file, "r") as f:
-                    results[file] = f.read()
+        # Outputs of tasks that no longer exist
+        if task_dir.name not in tasks:
+            report["bytes_reclaimed"] += _tree_size(task_dir)
+            shutil.rmtree(task_dir, ignore_errors=True)
+            report["output_dirs_removed"] += 1
+            continue
         
-        # Delete the pod
-        v1.delete_namespaced_pod(name=pod_name, namespace="default")
+        results = {
+            row.name: row
+            for row in db.query(
+                Student.name, TaskResult.id, TaskResult.student_id, TaskResult.created_at
+            ).join(
+                LatestResult, LatestResult.student_id == Student.id
+            ).join(
+                TaskResult, TaskResult.id == LatestResult.attempt_id
+            ).filter(LatestResult.task_id == tasks[task_dir.name]).all()
+        }
         
-        return results
+        for student_dir in task_dir.iterdir():
+            if not student_dir.is_dir():
+                continue
+            result = results.get(student_dir.name)
+            
+            # Outputs without a result, or past the retention period
+            expired = OUTPUT_RETENTION_DAYS > 0 and result and result.created_at and result.created_at < retention_cutoff
+            if result is None or expired:
+                report["bytes_reclaimed"] += _tree_size(student_dir)
+                shutil.rmtree(student_dir, ignore_errors=True)
+                report["output_dirs_removed"] += 1
+                continue
+            
+            # Staging directories left behind by superseded, killed or losing hedged attempts, and old publish markers
+            for stage_dir in [*student_dir.glob(".attempt-*"), *student_dir.glob(".published-*")]:
+                if stage_dir.stat().st_mtime < now - POD_TTL_SECONDS:
+                    report["bytes_reclaimed"] += _tree_size(stage_dir)
+                    shutil.rmtree(stage_dir, ignore_errors=True)
+                    report["staging_dirs_removed"] += 1
+            
+            # Outputs that were never moved into the blob store
+            if (student_dir / "output.txt").exists():
+                update_task_result_status(tasks[task_dir.name], result.student_id, task_dir.name, student_dir.name, db)
+                if not (student_dir / "output.txt").exists():
+                    report["outputs_ingested"] += 1
+    
+    return report
+
+def prune_uploads() -> Dict[str, int]:
+    """Delete staged uploads left behind by workers that died mid-request."""
+    report = {"uploads_removed": 0}
+    cutoff = time.time() - UPLOAD_STAGING_TTL_SECONDS
+    for staging_dir in (SHARED_UPLOAD_DIR, TASKS_UPLOAD_DIR):
+        if not staging_dir.exists():
+            continue
+        for path in staging_dir.glob(".upload-*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    report["uploads_removed"] += 1
+            except FileNotFoundError:
+                pass
+    return report
+
+def prune_blobs(db: Session) -> Dict[str, int]:
+    """Delete stored outputs that no result references any more."""
+    report = {"blobs_removed": 0, "blob_bytes_reclaimed": 0}
+    cutoff = datetime.utcnow() - timedelta(seconds=BLOB_GRACE_SECONDS)
+    
+    referenced = union(
+        db.query(TaskResult.output_hash).filter(TaskResult.output_hash.isnot(None)).statement,
+        db.query(TaskResult.teacher_output_hash).filter(TaskResult.teacher_output_hash.isnot(None)).statement,
+        db.query(TaskResult.student_output_hash).filter(TaskResult.student_output_hash.isnot(None)).statement
+    )
+    unreferenced = db.query(OutputBlob.digest).filter(
+        OutputBlob.created_at < cutoff,
+        OutputBlob.digest.notin_(referenced)
+    ).all()
+    
+    for (digest,) in unreferenced:
+        # Delete the row again under its conditions; an ingest that reused the blob since has renewed it
+        deleted = db.query(OutputBlob).filter(
+            OutputBlob.digest == digest,
+            OutputBlob.created_at < cutoff,
+            OutputBlob.digest.notin_(referenced)
+        ).delete(synchronize_session=False)
+        # The file goes while the row deletion is uncommitted, so a concurrent ingest waits for both
+        if deleted:
+            report["blob_bytes_reclaimed"] += blobstore.delete_blob(digest)
+            report["blobs_removed"] += 1
+        db.commit()
+    
+    return report
+
+def run_garbage_collection() -> Dict[str, Any]:
+    """Reap finished pods and prune shared outputs, one worker at a time."""
+    global last_gc_report
+    
+    with engine.connect() as conn:
+        # Only one API worker collects garbage at a time
+        if engine.dialect.name == "postgresql":
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": GC_LOCK_ID}).scalar()
+            if not acquired:
+                return last_gc_report
+        
+        db = SessionLocal()
+        try:
+            started = time.time()
+            report = {"pods_deleted": 0}
+            try:
+                report["pods_deleted"] = reap_finished_pods()
+            except Exception as e:
+                print(f"Error reaping task pods: {str(e)}")
+            report.update(prune_outputs(db))
+            report.update(prune_blobs(db))
+            report.update(prune_uploads())
+            report["duration_seconds"] = round(time.time() - started, 3)
+            report["finished_at"] = datetime.utcnow().isoformat()
+            last_gc_report = report
+            print(f"Garbage collection: {report}")
+            return report
+        finally:
+            db.close()
+            if engine.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": GC_LOCK_ID})
+
+def index_submission(task_id: int, student_id: int, attempt_id: int, script_path: Path, db: Session) -> None:
+    """Fingerprint a submission and put it in the task's LSH index, replacing the student's previous one."""
+    indexed = db.query(SubmissionSignature.attempt_id).filter(
+        SubmissionSignature.task_id == task_id,
+        SubmissionSignature.student_id == student_id
+    ).scalar()
+    if indexed is not None and indexed >= attempt_id:
+        return
+    
+    # A newer submission replaced the script; its own indexing takes over
+    try:
+        with open(script_path, "rb") as f:
+            source = f.read(SIMILARITY_MAX_BYTES).decode("utf-8", errors="replace")
+    except FileNotFoundError:
+        return
+    signature = similarity.minhash(similarity.shingles(source))
+    
+    db.query(SimilarityBucket).filter(
+        SimilarityBucket.task_id == task_id,
+        SimilarityBucket.student_id == student_id
+    ).delete(synchronize_session=False)
+    db.query(SubmissionSignature).filter(
+        SubmissionSignature.task_id == task_id,
+        SubmissionSignature.student_id == student_id
+    ).delete(synchronize_session=False)
+    
+    db.add(SubmissionSignature(
+        task_id=task_id,
+        student_id=student_id,
+        attempt_id=attempt_id,
+        signature=similarity.encode_signature(signature)
+    ))
+    db.add_all([
+        SimilarityBucket(task_id=task_id, student_id=student_id, band=band, bucket=bucket)
+        for band, bucket in enumerate(similarity.band_hashes(signature))
+    ])
+    db.commit()
+
+def submission_script_path(task_name: str, student_name: str) -> Path:
+    return SHARED_INPUT_DIR / task_name / student_name / f"{student_name}_script.py"
+
+def index_submission_job(task_id: int, student_id: int, attempt_id: int, task_name: str, student_name: str) -> None:
+    """Index a submission off the request path, in its own session."""
+    db = SessionLocal()
+    try:
+        index_submission(task_id, student_id, attempt_id, submission_script_path(task_name, student_name), db)
     except Exception as e:
-        print(f"Error collecting task results: {str(e)}")
-        return {}
+        db.rollback()
+        print(f"Error indexing submission: {str(e)}")
+    finally:
+        db.close()
 
-def randomize_variables(task_name: str) -> List[int]:
-    """Read variables from vars.txt and generate random values within the specified ranges."""
-    vars_path = TASKS_DIR / task_name / "vars.txt"
-    if not vars_path.exists():
+def index_missing_submissions(db: Session) -> None:
+    """Index current attempts whose background indexing was lost, e.g. to a worker restart."""
+    cutoff = datetime.utcnow() - timedelta(seconds=SIMILARITY_CATCHUP_SECONDS)
+    missing = db.query(LatestResult.task_id, LatestResult.student_id, LatestResult.attempt_id, Task.name, Student.name).join(
+        Task, Task.id == LatestResult.task_id
+    ).join(
+        Student, Student.id == LatestResult.student_id
+    ).join(
+        TaskResult, TaskResult.id == LatestResult.attempt_id
+    ).outerjoin(
+        SubmissionSignature, and_(
+            SubmissionSignature.task_id == LatestResult.task_id,
+            SubmissionSignature.student_id == LatestResult.student_id
+        )
+    ).filter(
+        TaskResult.created_at < cutoff,
+        or_(SubmissionSignature.id.is_(None), SubmissionSignature.attempt_id < LatestResult.attempt_id)
+    ).limit(SIMILARITY_CATCHUP_BATCH).all()
+    for task_id, student_id, attempt_id, task_name, student_name in missing:
+        try:
+            index_submission(task_id, student_id, attempt_id, submission_script_path(task_name, student_name), db)
+        except Exception as e:
+            db.rollback()
+            print(f"Error indexing submission: {str(e)}")
+
+def find_similar_submissions(task_id: int, threshold: float, db: Session) -> List[Dict[str, Any]]:
+    """Clusters of submissions whose estimated similarity reaches the threshold."""
+    # Only pairs sharing an LSH bucket are candidates, so the work follows the
+    # number of near-duplicates rather than the square of the submissions
+    a = aliased(SimilarityBucket)
+    b = aliased(SimilarityBucket)
+    candidates = db.query(a.student_id, b.student_id).join(
+        b,
+        (b.task_id == a.task_id) & (b.band == a.band) & (b.bucket == a.bucket) & (b.student_id > a.student_id)
+    ).filter(a.task_id == task_id).distinct().all()
+    if not candidates:
         return []
     
-    random_values = []
-    with open(vars_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                start, end = map(int, line.split("-"))
-                random_values.append(random.randint(start, end))
-            except ValueError:
-                continue
-    
-    return random_values
+    student_ids = {x for pair in candidates for x in pair}
+    signatures = {
+        student_id: similarity.decode_signature(signature)
+        for student_id, signature in db.query(SubmissionSignature.student_id, SubmissionSignature.signature).filter(
+            SubmissionSignature.task_id == task_id,
+            SubmissionSignature.student_id.in_(student_ids)
+        )
+    }
+    names = dict(db.query(Student.id, Student.name).filter(Student.id.in_(student_ids)))
+    
+    pairs = []
+    for x, y in candidates:
+        if x not in signatures or y not in signatures:
+            continue
+        score = similarity.estimate_similarity(signatures[x], signatures[y])
+        if score >= threshold:
+            pairs.append((x, y, score))
+    
+    clusters = []
+    for cluster in similarity.cluster_pairs(pairs):
+        cluster_pairs = sorted(cluster["pairs"], key=lambda p: -p[2])
+        clusters.append({
+            "students": sorted(names.get(x, str(x)) for x in cluster["members"]),
+            "max_similarity": round(cluster_pairs[0][2], 3),
+            "pair_count": len(cluster_pairs),
+            "pairs": [
+                {"a": names.get(x, str(x)), "b": names.get(y, str(y)), "similarity": round(score, 3)}
+                for x, y, score in cluster_pairs[:SIMILARITY_MAX_PAIRS]
+            ]
+        })
+    clusters.sort(key=lambda c: -c["max_similarity"])
+    return clusters
 
-def update_task_result_status(task_id: int, student_id: int, task_name: str, student_name: str, db: Session) -> None:
-    """Update task result status based on validation output."""
-    result_dir = Path(f"/shared/output/{task_name}/{student_name}")
-    status_file = result_dir / "status.txt"
-    output_file = result_dir / "output.txt"
+def save_maintenance_report(name: str, report: Dict[str, Any], db: Session) -> None:
+    values = {"name": name, "report": json.dumps(report, default=str), "updated_at": datetime.utcnow()}
+    if engine.dialect.name == "postgresql":
+        db.execute(pg_insert(MaintenanceReport).values(**values).on_conflict_do_update(
+            index_elements=["name"],
+            set_={key: values[key] for key in ("report", "updated_at")}
+        ))
+    else:
+        db.merge(MaintenanceReport(**values))
+    db.commit()
+
+def load_maintenance_report(name: str, db: Session) -> Dict[str, Any]:
+    row = db.query(MaintenanceReport.report).filter(MaintenanceReport.name == name).first()
+    return json.loads(row.report) if row and row.report else {}
+
+def ensure_image_prepull(target: Target) -> bool:
+    """Keep a DaemonSet that pulls the task image on every node; returns True if it was (re)created."""
+    daemonset_template = f"""
+apiVersion: apps/v1
+kind: DaemonSet
+metadata:
+  name: {PREPULL_DAEMONSET}
+  labels:
+    app: task-image-prepull
+spec:
+  selector:
+    matchLabels:
+      app: task-image-prepull
+  template:
+    metadata:
+      labels:
+        app: task-image-prepull
+    spec:
+      initContainers:
+        - name: prepull
+          image: {TASK_IMAGE}
+          imagePullPolicy: IfNotPresent
+          command: ["/bin/sh", "-c", "true"]
+      containers:
+        - name: pause
+          image: {PAUSE_IMAGE}
+          resources:
+            requests:
+              cpu: 1m
+              memory: 4Mi
+"""
+    apps_v1 = target.apps_v1
+    try:
+        current = apps_v1.read_namespaced_daemon_set(name=PREPULL_DAEMONSET, namespace=target.namespace)
+        if current.spec.template.spec.init_containers[0].image == TASK_IMAGE:
+            return False
+        # The task image changed; pull the new one instead
+        apps_v1.delete_namespaced_daemon_set(name=PREPULL_DAEMONSET, namespace=target.namespace)
+    except ApiException as e:
+        if e.status != 404:
+            raise
+    apps_v1.create_namespaced_daemon_set(namespace=target.namespace, body=yaml.safe_load(daemonset_template))
+    return True
+
+def scale_placeholders(target: Target, replicas: int) -> None:
+    """Set the number of preemptible placeholder pods, creating their Deployment if needed."""
+    apps_v1 = target.apps_v1
+    try:
+        current = apps_v1.read_namespaced_deployment(name=PLACEHOLDER_DEPLOYMENT, namespace=target.namespace)
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        if replicas == 0:
+            return
+        deployment_template = f"""
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {PLACEHOLDER_DEPLOYMENT}
+  labels:
+    app: task-placeholder
+spec:
+  replicas: {replicas}
+  selector:
+    matchLabels:
+      app: task-placeholder
+  template:
+    metadata:
+      labels:
+        app: task-placeholder
+    spec:
+      priorityClassName: {PLACEHOLDER_PRIORITY_CLASS}
+      terminationGracePeriodSeconds: 0
+      containers:
+        - name: pause
+          image: {PAUSE_IMAGE}
+          resources:
+            requests:
+              cpu: "{PLACEHOLDER_CPU}"
+              memory: "{PLACEHOLDER_MEMORY}"
+"""
+        apps_v1.create_namespaced_deployment(namespace=target.namespace, body=yaml.safe_load(deployment_template))
+        return
+    
+    if current.spec.replicas != replicas:
+        apps_v1.patch_namespaced_deployment_scale(
+            name=PLACEHOLDER_DEPLOYMENT,
+            namespace=target.namespace,
+            body={"spec": {"replicas": replicas}}
+        )
+
+def plan_capacity(db: Session) -> Dict[str, Any]:
+    """
+    Size the placeholder pool for the deadlines around now.
+    
+    A task needs warm capacity from PREWARM_LEAD_MINUTES before its deadline until
+    PREWARM_HOLD_MINUTES after it. Its share is a fraction of the students in the
+    groups it is assigned to; the pool is the sum over such tasks, capped.
+    """
+    now = datetime.utcnow()
+    window_start = now - timedelta(minutes=PREWARM_HOLD_MINUTES)
+    window_end = now + timedelta(minutes=PREWARM_LEAD_MINUTES)
+    
+    upcoming = db.query(Task.name, Task.deadline, func.count(distinct(StudentGroup.student_id))).join(
+        TaskGroup, TaskGroup.task_id == Task.id
+    ).join(
+        StudentGroup, StudentGroup.group_id == TaskGroup.group_id
+    ).filter(
+        Task.deadline.isnot(None),
+        Task.deadline >= window_start,
+        Task.deadline <= window_end
+    ).group_by(Task.id, Task.name, Task.deadline).all()
+    
+    tasks = []
+    wanted = 0
+    for task_name, deadline, student_count in upcoming:
+        share = math.ceil(student_count * PREWARM_STUDENT_FRACTION)
+        wanted += share
+        tasks.append({
+            "task": task_name,
+            "deadline": deadline.isoformat(),
+            "students": student_count,
+            "placeholders": share
+        })
     
-    if status_file.exists() and status_file.read_text().strip() == "COMPLETED":
-        # Read the output file to determine the final status
-        if output_file.exists():
-            output_content = output_file.read_text()
-            if "SUCCESS: Outputs match!" in output_content:
-                status = "SUCCESS"
-            elif "FAIL: Outputs do not match" in output_content:
-                status = "FAIL"
-            else:
-                status = "ERROR"
-            
-            # Update the task result in the database
-            task_result = db.query(TaskResult).filter(
-                TaskResult.task_id == task_id,
-                TaskResult.student_id == student_id
-            ).first()
+    return {
+        "tasks": tasks,
+        "placeholders": min(wanted, PREWARM_MAX_PLACEHOLDERS)
+    }
+
+def run_capacity_planner() -> Dict[str, Any]:
+    """Pre-pull the task image and scale placeholder pods ahead of deadlines, one worker at a time."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": CAPACITY_LOCK_ID}).scalar()
+            if not acquired:
+                db = SessionLocal()
+                try:
+                    return load_maintenance_report("capacity", db)
+                finally:
+                    db.close()
+        
+        db = SessionLocal()
+        try:
+            report = plan_capacity(db)
             
-            if task_result:
-                task_result.status = status
-                db.commit()
+            # Every dispatch target gets the image, and placeholders in proportion to its pod limit
+            total_max_pods = sum(target.max_pods for target in dispatcher.targets) or 1
+            report["targets"] = {}
+            for target in dispatcher.targets:
+                replicas = math.ceil(report["placeholders"] * target.max_pods / total_max_pods)
+                try:
+                    prepull_created = ensure_image_prepull(target)
+                    scale_placeholders(target, replicas)
+                    report["targets"][target.name] = {"placeholders": replicas, "prepull_created": prepull_created}
+                except Exception as e:
+                    print(f"Error planning capacity in {target.name}: {str(e)}")
+                    report["targets"][target.name] = {"error": str(e)}
+            report["planned_at"] = datetime.utcnow().isoformat()
+            # The lock holder writes the report so that every worker serves it
+            save_maintenance_report("capacity", report, db)
+            return report
+        finally:
+            db.close()
+            if engine.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": CAPACITY_LOCK_ID})
+
+class _ExportSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a streaming response."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def query_export_rows(db: Session, teacher_id: int, group_id: Optional[int] = None, history: bool = False):
+    """Stream (task, student, status, created_at) rows using a server-side cursor."""
+    query = db.query(
+        Task.name,
+        Student.name,
+        TaskResult.status,
+        TaskResult.created_at
+    ).join(Task, Task.id == TaskResult.task_id).join(
+        Student, Student.id == TaskResult.student_id
+    ).filter(Task.teacher_id == teacher_id)
+    
+    # Only the current attempts unless the whole history is asked for
+    if not history:
+        query = query.join(LatestResult, LatestResult.attempt_id == TaskResult.id)
+    
+    if group_id is not None:
+        group_tasks = db.query(TaskGroup.task_id).filter(TaskGroup.group_id == group_id)
+        group_students = db.query(StudentGroup.student_id).filter(StudentGroup.group_id == group_id)
+        query = query.filter(
+            TaskResult.task_id.in_(group_tasks),
+            TaskResult.student_id.in_(group_students)
+        )
+    
+    return query.order_by(Task.name, Student.name, TaskResult.created_at).execution_options(
+        stream_results=True
+    ).yield_per(EXPORT_BATCH_SIZE)
+
+def stream_export(export_format: str, teacher_id: int, group_id: Optional[int] = None, history: bool = False):
+    """Generate the gradebook export in chunks, holding at most one batch in memory."""
+    db = SessionLocal()
+    try:
+        rows = query_export_rows(db, teacher_id, group_id, history)
+        if export_format == "csv":
+            yield from _export_csv(rows)
+        elif export_format == "ndjson":
+            yield from _export_ndjson(rows)
+        else:
+            yield from _export_parquet(rows)
+    finally:
+        db.close()
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for task_name, student_name, status, created_at in rows:
+        writer.writerow([task_name, student_name, status, created_at.isoformat() if created_at else ""])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _export_ndjson(rows):
+    lines = []
+    size = 0
+    for task_name, student_name, status, created_at in rows:
+        line = json.dumps({
+            "task_name": task_name,
+            "student_name": student_name,
+            "status": status,
+            "created_at": created_at.isoformat() if created_at else None
+        }) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(lines)
+            lines = []
+            size = 0
+    yield "".join(lines)
+
+def _export_parquet(rows):
+    schema = pyarrow.schema([
+        ("task_name", pyarrow.string()),
+        ("student_name", pyarrow.string()),
+        ("status", pyarrow.string()),
+        ("created_at", pyarrow.timestamp("us"))
+    ])
+    sink = _ExportSink()
+    writer = pq.ParquetWriter(sink, schema)
+    columns = {name: [] for name in EXPORT_COLUMNS}
+    
+    # Each batch becomes one row group, so memory is bounded by EXPORT_BATCH_SIZE
+    for row in rows:
+        for name, value in zip(EXPORT_COLUMNS, row):
+            columns[name].append(value)
+        if len(columns["task_name"]) >= EXPORT_BATCH_SIZE:
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            columns = {name: [] for name in EXPORT_COLUMNS}
+            yield sink.drain()
+    
+    if columns["task_name"]:
+        writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+    writer.close()
+    yield sink.drain()
 
 @app.post("/student/validate")
-async def validate_student_task(
-    student_name: str = Form(...),
-    task_name: str = Form(...),
-    script_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
+async def validate_student_task(request: Request, db: Session = Depends(get_db)):
+    # The submission's timeline starts when the request arrives
+    recorder = tracing.SpanRecorder()
+    received_at = datetime.utcnow()
+    
+    # Stream the form; the script is staged next to its final location
+    upload = await ingest.read_multipart(request, {
+        "script_file": ingest.FileField(ingest.MAX_SCRIPT_BYTES, SHARED_UPLOAD_DIR)
+    })
+    recorder.add("upload", received_at, datetime.utcnow())
+    try:
+        # Kubernetes calls may wait on rate limits and retries, which must not block the event loop
+        return await run_in_threadpool(submit_student_script, upload, db, recorder)
+    finally:
+        upload.discard()
+
+def submit_student_script(upload: ingest.Upload, db: Session, recorder: Optional[tracing.SpanRecorder] = None):
+    recorder = recorder or tracing.SpanRecorder()
+    student_name = upload.field("student_name")
+    task_name = upload.field("task_name")
+    script_file = upload.file("script_file")
+    
     # Validate student
     student = db.query(Student).filter(Student.name == student_name).first()
     if not student:
@@ -418,35 +2638,64 @@ async def validate_student_task(
     if not task_groups:
         raise HTTPException(status_code=403, detail="You don't have access to this task")
     
+    # Scripts that do not compile or break the rules are graded here instead of in a pod
+    with recorder.span("precheck"):
+        precheck_error = precheck.check_script(str(script_file.staging_path), script_file.sha256)
+    
     # Check for existing results
-    existing_result = db.query(TaskResult).filter(
-        TaskResult.task_id == task.id,
-        TaskResult.student_id == student.id
-    ).first()
+    existing_result = get_latest_attempt(task.id, student.id, db)
+    
+    # Coalesce rapid resubmissions when a debounce window is configured
+    debounce = RESUBMIT_DEBOUNCE_SECONDS > 0 and (
+        launch_pending(task_name, student_name) or (
+            existing_result is not None and existing_result.created_at is not None and
+            (datetime.utcnow() - existing_result.created_at).total_seconds() < RESUBMIT_DEBOUNCE_SECONDS
+        )
+    )
     
     if existing_result:
-        # Delete existing result from database
-        db.delete(existing_result)
-        db.commit()
+        # Keep a finished but not yet collected output in the attempt's history
+        if existing_result.status == "STARTED":
+            with recorder.span("collect_previous"):
+                update_task_result_status(task.id, student.id, task_name, student_name, db)
+        
+        # Cancel pods still running for the superseded attempt
+        with recorder.span("cancel_previous"):
+            cancel_task_pods(task_name, student_name)
+        
+        # The earlier attempt stays as history; one that never finished is marked as superseded
+        if existing_result.status == "STARTED":
+            existing_result.status = "CANCELLED"
         
         # Delete old result files
         result_dir = RESULTS_DIR / task_name / student_name
         if result_dir.exists():
             shutil.rmtree(result_dir)
     
-    # Create a new result with STARTED status
-    task_result = TaskResult(
-        task_id=task.id,
-        student_id=student.id,
-        status="STARTED",
-        teacher_output_path="",
-        student_output_path=""
-    )
-    db.add(task_result)
-    db.commit()
+    # Create a new result with STARTED status, or its final status if the precheck failed
+    status = "COMPILE_ERROR" if precheck_error else "STARTED"
+    with recorder.span("record_attempt"):
+        task_result = TaskResult(
+            task_id=task.id,
+            student_id=student.id,
+            status=status,
+            script_hash=script_file.sha256,
+            task_version=task.version or 1,
+            trace_id=tracing.new_trace_id(),
+            teacher_output_path="",
+            student_output_path=""
+        )
+        db.add(task_result)
+        db.flush()
+        if precheck_error:
+            store_precheck_report(task_result, precheck_error, db)
+        set_latest_attempt(task_result, db)
+        record_gradebook_status(task.id, student.id, status, db)
+        db.commit()
+    invalidate_task_metadata(task_name)
     
     # Clean up old files and directories
-    shared_input_dir = Path(f"/shared/input/{task_name}/{student_name}")
+    shared_input_dir = SHARED_INPUT_DIR / task_name / student_name
     if shared_input_dir.exists():
         shutil.rmtree(shared_input_dir)
     
@@ -458,30 +2707,50 @@ async def validate_student_task(
     student_dir = create_student_directory(student_name)
     task_dir = create_task_directory(task_name)
     
-    # Save the student's script to shared input
-    shared_input_dir.mkdir(parents=True, exist_ok=True)
-    student_script_path = shared_input_dir / f"{student_name}_script.py"
-    with open(student_script_path, "wb") as buffer:
-        shutil.copyfileobj(script_file.file, buffer)
-    
-    # Check for vars.txt in task directory and generate random values
-    task_vars_path = task_dir / "vars.txt"
-    if task_vars_path.exists():
-        random_values = randomize_variables(task_name)
-        if random_values:
-            # Save random values to student's vars.txt
-            student_vars_path = shared_input_dir / "vars.txt"
-            with open(student_vars_path, "w") as f:
-                f.write("\n".join(map(str, random_values)))
-    
-    # Create shared PVC
-    shared_pvc_name = create_shared_pvc()
+    # Mark the attempt whose output may be published
+    shared_output_dir.mkdir(parents=True, exist_ok=True)
+    (shared_output_dir / "current_attempt.txt").write_text(str(task_result.id))
+    
+    # Move the staged script into the shared input
+    with recorder.span("save_script"):
+        script_file.commit(shared_input_dir / f"{student_name}_script.py")
+    
+    # Fingerprinting a large script takes about a second, so the similarity index is updated in the background
+    run_in_background(index_submission_job, task.id, student.id, task_result.id, task_name, student_name)
+    
+    if precheck_error:
+        save_spans(task_result.id, recorder.spans, db)
+        tracing.export(task_result.trace_id, "submission", recorder.spans, trace_attributes(task_result, task_name, student_name))
+        return {
+            "message": "Script rejected before running",
+            "status": "COMPILE_ERROR",
+            "detail": precheck_error,
+            "pod_name": None,
+            "result_url": f"/student/task/result/{task_name}/{student_name}"
+        }
+    
+    # Draw the attempt's values from its seed and save them to the student's vars.txt
+    random_values = assign_variables(task, task_result, db)
+    if random_values:
+        (shared_input_dir / "vars.txt").write_text(seeding.vars_text(random_values))
+    
+    if debounce:
+        save_spans(task_result.id, recorder.spans, db)
+        schedule_task_pod(task_name, student_name, task_result.id)
+        return {
+            "message": "Task validation queued",
+            "pod_name": None,
+            "result_url": f"/student/task/result/{task_name}/{student_name}"
+        }
     
     # Create and start task pod
-    pod_name = create_task_pod(task_name, student_name, db, shared_pvc_name)
+    with recorder.span("create_pod"):
+        pod_name = create_task_pod(task_name, student_name, db, task_result.id)
+    save_spans(task_result.id, recorder.spans, db)
     if not pod_name:
         # If pod creation fails, update status to ERROR
-        task_result.status = "ERROR"
+        set_attempt_status(task_result, "ERROR", db)
+        record_gradebook_status(task.id, student.id, "ERROR", db)
         db.commit()
         raise HTTPException(status_code=500, detail="Failed to create task pod")
     
@@ -493,7 +2762,14 @@ async def validate_student_task(
     }
 
 @app.get("/student/task/result/{task_name}/{student_name}", response_class=PlainTextResponse)
-def get_task_result(task_name: str, student_name: str, db: Session = Depends(get_db)):
+def get_task_result(
+    task_name: str,
+    student_name: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
     # Validate student
     student = db.query(Student).filter(Student.name == student_name).first()
     if not student:
@@ -516,11 +2792,8 @@ def get_task_result(task_name: str, student_name: str, db: Session = Depends(get
     if not task_groups:
         raise HTTPException(status_code=403, detail="You don't have access to this task")
     
-    # Get most recent task result from database
-    task_result = db.query(TaskResult).filter(
-        TaskResult.task_id == task.id,
-        TaskResult.student_id == student.id
-    ).order_by(TaskResult.created_at.desc()).first()
+    # Get the current attempt from database
+    task_result = get_latest_attempt(task.id, student.id, db)
     
     if not task_result:
         return "NOT_STARTED"
@@ -528,17 +2801,10 @@ def get_task_result(task_name: str, student_name: str, db: Session = Depends(get
     # Update the status if validation is complete
     update_task_result_status(task.id, student.id, task_name, student_name, db)
     
-    # Read the output file
-    output_path = Path(f"/shared/output/{task_name}/{student_name}/output.txt")
-    if not output_path.exists():
+    # Stream the stored output, or just the status while it is not available
+    if not task_result.output_hash:
         return task_result.status
-    
-    try:
-        with open(output_path, "r") as f:
-            output_content = f.read()
-        return output_content
-    except Exception as e:
-        return f"Error reading output: {str(e)}"
+    return blob_response(task_result.output_hash, db, request.headers.get("range"), offset, limit)
 
 @app.get("/student", response_model=APIInfo)
 def get_student_info(name: str, db: Session = Depends(get_db)):
@@ -558,18 +2824,6 @@ def get_student_info(name: str, db: Session = Depends(get_db)):
     # Get task details
     tasks = db.query(Task).filter(Task.id.in_(task_ids)).all()
     
-    # Get most recent results for these tasks
-    results = db.query(TaskResult).filter(
-        TaskResult.task_id.in_(task_ids),
-        TaskResult.student_id == student.id
-    ).order_by(TaskResult.created_at.desc()).all()
-    
-    # Create result map for quick lookup (most recent result for each task)
-    result_map = {}
-    for r in results:
-        if r.task_id not in result_map:  # Only keep the first (most recent) result for each task
-            result_map[r.task_id] = r.status
-    
     # Format task information
     task_info = []
     for task in tasks:
@@ -577,15 +2831,15 @@ def get_student_info(name: str, db: Session = Depends(get_db)):
         update_task_result_status(task.id, student.id, task.name, name, db)
         
         # Get the updated status after running update_task_result_status
-        updated_result = db.query(TaskResult).filter(
-            TaskResult.task_id == task.id,
-            TaskResult.student_id == student.id
-        ).order_by(TaskResult.created_at.desc()).first()
+        latest = db.query(LatestResult).filter(
+            LatestResult.task_id == task.id,
+            LatestResult.student_id == student.id
+        ).first()
         
         task_info.append({
             "name": task.name,
             "description": task.description,
-            "result": updated_result.status if updated_result else result_map.get(task.id, "NOT_STARTED")  # Use updated status
+            "result": latest.status if latest else "NOT_STARTED"
         })
     
     return APIInfo(
@@ -599,15 +2853,15 @@ def get_student_info(name: str, db: Session = Depends(get_db)):
     )
 
 @app.get("/student/task/{task}")
-def get_task(task: str, name: str, db: Session = Depends(get_db)):
+def get_task(task: str, name: str, request: Request, db: Session = Depends(get_db)):
     # Validate student
     student = db.query(Student).filter(Student.name == name).first()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Validate task
-    task_obj = db.query(Task).filter(Task.name == task).first()
-    if not task_obj:
+    metadata = load_task_metadata(task, db)
+    if not metadata:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Check if student has access to this task
@@ -615,7 +2869,7 @@ def get_task(task: str, name: str, db: Session = Depends(get_db)):
     group_ids = [sg.group_id for sg in student_groups]
     
     task_groups = db.query(TaskGroup).filter(
-        TaskGroup.task_id == task_obj.id,
+        TaskGroup.task_id == metadata["id"],
         TaskGroup.group_id.in_(group_ids)
     ).first()
     
@@ -623,38 +2877,67 @@ def get_task(task: str, name: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="You don't have access to this task")
     
     # Check if task directory exists
-    task_dir = TASKS_DIR / task
-    if not task_dir.exists():
+    if metadata["files"] is None:
         raise HTTPException(status_code=404, detail="Task directory not found")
     
-    # Get task files
-    task_files = [f.name for f in task_dir.iterdir() if f.is_file()]
-    
-    # Get most recent result if exists
-    result = db.query(TaskResult).filter(
-        TaskResult.task_id == task_obj.id,
-        TaskResult.student_id == student.id
-    ).order_by(TaskResult.created_at.desc()).first()
+    # Get the latest result if exists
+    result = db.query(LatestResult).filter(
+        LatestResult.task_id == metadata["id"],
+        LatestResult.student_id == student.id
+    ).first()
     
-    return {
+    return conditional_json(request, {
         "name": task,
-        "description": task_obj.description,
-        "files": task_files,
-        "path": str(task_dir),
+        "description": metadata["description"],
+        "files": metadata["files"],
+        "path": metadata["path"],
+        "deadline": metadata["deadline"],
         "status": result.status if result else "NOT_STARTED"
-    }
+    })
 
 @app.post("/teacher/task/create")
-async def create_task(
-    task_name: str = Form(...),
-    description: str = Form(...),
-    teacher_name: str = Form(...),
-    group_names: List[str] = Form(...),
-    script_file: UploadFile = File(...),
-    variables_file: UploadFile = File(None),  # New optional file upload
-    find_file: UploadFile = File(None),  # New optional file upload for find.txt
-    db: Session = Depends(get_db)
-):
+async def create_task(request: Request, db: Session = Depends(get_db)):
+    # Stream the form; each file is staged next to its final location
+    upload = await ingest.read_multipart(request, {
+        "script_file": ingest.FileField(ingest.MAX_SCRIPT_BYTES, SHARED_UPLOAD_DIR),
+        "variables_file": ingest.FileField(ingest.MAX_DATA_FILE_BYTES, TASKS_UPLOAD_DIR),
+        "find_file": ingest.FileField(ingest.MAX_DATA_FILE_BYTES, SHARED_UPLOAD_DIR)
+    })
+    try:
+        return await run_in_threadpool(save_task, upload, db)
+    finally:
+        upload.discard()
+
+def parse_form_float(upload: ingest.Upload, name: str, default: float) -> float:
+    try:
+        return float(upload.field(name, str(default)))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} must be a number")
+
+def parse_form_datetime(upload: ingest.Upload, name: str) -> Optional[datetime]:
+    value = upload.field(name, required=False)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} must be an ISO 8601 datetime")
+
+def save_task(upload: ingest.Upload, db: Session):
+    task_name = upload.field("task_name")
+    description = upload.field("description")
+    teacher_name = upload.field("teacher_name")
+    group_names = upload.field_list("group_names")
+    if not group_names:
+        raise HTTPException(status_code=422, detail="Missing form field: group_names")
+    script_file = upload.file("script_file")
+    variables_file = upload.file("variables_file", required=False)
+    find_file = upload.file("find_file", required=False)
+    comparison_mode = upload.field("comparison_mode", "exact")
+    abs_tol = parse_form_float(upload, "abs_tol", 0.0)
+    rel_tol = parse_form_float(upload, "rel_tol", 0.0)
+    deadline = parse_form_datetime(upload, "deadline")
+    
     # Validate teacher
     teacher = db.query(Teacher).filter(Teacher.name == teacher_name).first()
     if not teacher:
@@ -669,11 +2952,25 @@ async def create_task(
     if not script_file.filename.endswith('.py'):
         raise HTTPException(status_code=400, detail="Script file must be a Python file (.py)")
     
+    # Validate comparison settings
+    if comparison_mode not in compare_outputs.MODES:
+        raise HTTPException(status_code=400, detail=f"Comparison mode must be one of: {', '.join(compare_outputs.MODES)}")
+    if abs_tol < 0 or rel_tol < 0:
+        raise HTTPException(status_code=400, detail="Tolerances must not be negative")
+    
+    # Deadlines are stored as naive UTC, like the other timestamps
+    if deadline and deadline.tzinfo:
+        deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    
     # Create task in database
     db_task = Task(
         name=task_name,
         description=description,
-        teacher_id=teacher.id
+        teacher_id=teacher.id,
+        comparison_mode=comparison_mode,
+        abs_tol=abs_tol,
+        rel_tol=rel_tol,
+        deadline=deadline
     )
     db.add(db_task)
     db.commit()
@@ -683,43 +2980,39 @@ async def create_task(
     task_dir = create_task_directory(task_name)
     teacher_dir = create_teacher_directory(teacher_name)
     
-    # Save the script file
-    script_path = task_dir / "teacher_script.py"
-    with open(script_path, "wb") as buffer:
-        shutil.copyfileobj(script_file.file, buffer)
-    
-    # Save the variables file if provided
-    if variables_file:
-        vars_path = task_dir / "vars.txt"
-        with open(vars_path, "wb") as buffer:
-            shutil.copyfileobj(variables_file.file, buffer)
-    
-    # Save the find.txt file if provided
-    if find_file:
-        find_path = task_dir / "find.txt"
-        with open(find_path, "wb") as buffer:
-            shutil.copyfileobj(find_file.file, buffer)
-    
     # Create shared directories for the task
-    shared_script_dir = Path(f"/shared/input/{task_name}/script")
+    shared_script_dir = SHARED_INPUT_DIR / task_name / "script"
     shared_script_dir.mkdir(parents=True, exist_ok=True)
     
-    shared_teacher_dir = Path(f"/shared/input/{task_name}/teacher")
+    shared_teacher_dir = SHARED_INPUT_DIR / task_name / "teacher"
     shared_teacher_dir.mkdir(parents=True, exist_ok=True)
     
-    # Copy teacher's script to shared directory
-    shutil.copy(str(script_path), str(shared_teacher_dir / "teacher_script.py"))
+    # Move the teacher's script into the shared directory; the task directory links to it
+    script_path = script_file.commit(shared_teacher_dir / "teacher_script.py")
+    link_task_file(task_dir / "teacher_script.py", script_path)
     
-    # Copy find.txt to shared directory if it exists
-    if find_file:
-        shared_find_path = shared_script_dir / "find.txt"
-        shutil.copy(str(find_path), str(shared_find_path))
+    # Save the variables file if provided
+    if variables_file:
+        variables_file.commit(task_dir / "vars.txt")
     
-    # Copy the comparison script to shared script directory and make it executable
-    script_template_path = Path(__file__).parent / "script_template.sh"
-    compare_script_path = shared_script_dir / "compare_scripts.sh"
-    shutil.copy(str(script_template_path), str(compare_script_path))
-    compare_script_path.chmod(0o755)  # Make the script executable
+    # Move find.txt into the shared directory if provided
+    if find_file:
+        find_path = find_file.commit(shared_script_dir / "find.txt")
+        link_task_file(task_dir / "find.txt", find_path)
+    
+    install_task_runner(shared_script_dir)
+    
+    # Record the first version of the grading inputs
+    db.add(TaskVersion(
+        task_id=db_task.id,
+        version=1,
+        teacher_script_hash=script_file.sha256,
+        vars_hash=variables_file.sha256 if variables_file else None,
+        find_hash=find_file.sha256 if find_file else None,
+        comparison_mode=comparison_mode,
+        abs_tol=abs_tol,
+        rel_tol=rel_tol
+    ))
     
     # Assign task to groups
     for group_name in group_names:
@@ -737,6 +3030,14 @@ async def create_task(
             group_id=group.id
         )
         db.add(db_task_group)
+        db.add(GradebookSummary(
+            group_id=group.id,
+            task_id=db_task.id,
+            started_count=0,
+            success_count=0,
+            fail_count=0,
+            error_count=0
+        ))
     
     db.commit()
     
@@ -745,17 +3046,140 @@ async def create_task(
         "task_id": db_task.id
     }
 
+@app.post("/teacher/task/update/{task}")
+async def update_task(task: str, request: Request, db: Session = Depends(get_db)):
+    # Stream the form; each file is staged next to its final location
+    upload = await ingest.read_multipart(request, {
+        "script_file": ingest.FileField(ingest.MAX_SCRIPT_BYTES, SHARED_UPLOAD_DIR),
+        "variables_file": ingest.FileField(ingest.MAX_DATA_FILE_BYTES, TASKS_UPLOAD_DIR),
+        "find_file": ingest.FileField(ingest.MAX_DATA_FILE_BYTES, SHARED_UPLOAD_DIR)
+    })
+    try:
+        return await run_in_threadpool(save_task_update, task, upload, db)
+    finally:
+        upload.discard()
+
+def save_task_update(task_name: str, upload: ingest.Upload, db: Session):
+    # Validate task; the row stays locked until the commit, so concurrent updates of a task take turns
+    task = db.query(Task).filter(Task.name == task_name).with_for_update().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Every field is optional; missing ones keep their current value
+    script_file = upload.file("script_file", required=False)
+    variables_file = upload.file("variables_file", required=False)
+    find_file = upload.file("find_file", required=False)
+    description = upload.field("description", required=False)
+    comparison_mode = upload.field("comparison_mode", task.comparison_mode or "exact")
+    abs_tol = parse_form_float(upload, "abs_tol", task.abs_tol or 0.0)
+    rel_tol = parse_form_float(upload, "rel_tol", task.rel_tol or 0.0)
+    deadline = parse_form_datetime(upload, "deadline")
+    regrade = upload.field("regrade", "true").lower() not in ("false", "0", "no")
+    
+    # Validate script file is a Python file
+    if script_file and not script_file.filename.endswith('.py'):
+        raise HTTPException(status_code=400, detail="Script file must be a Python file (.py)")
+    
+    # Validate comparison settings
+    if comparison_mode not in compare_outputs.MODES:
+        raise HTTPException(status_code=400, detail=f"Comparison mode must be one of: {', '.join(compare_outputs.MODES)}")
+    if abs_tol < 0 or rel_tol < 0:
+        raise HTTPException(status_code=400, detail="Tolerances must not be negative")
+    
+    task_dir = create_task_directory(task_name)
+    shared_script_dir = SHARED_INPUT_DIR / task_name / "script"
+    shared_script_dir.mkdir(parents=True, exist_ok=True)
+    shared_teacher_dir = SHARED_INPUT_DIR / task_name / "teacher"
+    shared_teacher_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Only inputs whose content differs start a new version
+    changes = []
+    if script_file and script_file.sha256 != file_sha256(shared_teacher_dir / "teacher_script.py"):
+        changes.append("teacher_script")
+    if variables_file and variables_file.sha256 != file_sha256(task_dir / "vars.txt"):
+        changes.append("vars")
+    if find_file and find_file.sha256 != file_sha256(shared_script_dir / "find.txt"):
+        changes.append("find")
+    if (comparison_mode, abs_tol, rel_tol) != (task.comparison_mode or "exact", task.abs_tol or 0.0, task.rel_tol or 0.0):
+        changes.append("comparison")
+    
+    # Replace the files in one rename each, so a running pod sees either version
+    if "teacher_script" in changes:
+        script_path = script_file.commit(shared_teacher_dir / "teacher_script.py")
+        link_task_file(task_dir / "teacher_script.py", script_path)
+        # Outputs of the old script can no longer be reused
+        shutil.rmtree(shared_teacher_dir / "cache", ignore_errors=True)
+    if "vars" in changes:
+        variables_file.commit(task_dir / "vars.txt")
+    if "find" in changes:
+        find_path = find_file.commit(shared_script_dir / "find.txt")
+        link_task_file(task_dir / "find.txt", find_path)
+    install_task_runner(shared_script_dir)
+    
+    if description is not None:
+        task.description = description
+    if deadline:
+        # Deadlines are stored as naive UTC, like the other timestamps
+        task.deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None) if deadline.tzinfo else deadline
+    task.comparison_mode = comparison_mode
+    task.abs_tol = abs_tol
+    task.rel_tol = rel_tol
+    task.updated_at = datetime.utcnow()
+    
+    # Regrade in the background; students only run again when their inputs changed
+    regrading = bool(changes) and regrade
+    
+    if changes:
+        task.version = (task.version or 1) + 1
+        db.add(TaskVersion(
+            task_id=task.id,
+            version=task.version,
+            changes=",".join(changes),
+            teacher_script_hash=file_sha256(shared_teacher_dir / "teacher_script.py"),
+            vars_hash=file_sha256(task_dir / "vars.txt"),
+            find_hash=file_sha256(shared_script_dir / "find.txt"),
+            comparison_mode=comparison_mode,
+            abs_tol=abs_tol,
+            rel_tol=rel_tol,
+            regrade_state="pending" if regrading else None
+        ))
+    db.commit()
+    
+    if regrading:
+        run_in_background(regrade_task, task.id, task.version)
+    
+    return {
+        "message": "Task updated successfully",
+        "task_id": task.id,
+        "version": task.version or 1,
+        "changes": changes,
+        "regrade": "started" if regrading else None,
+        "versions_url": f"/teacher/task/{task_name}/versions"
+    }
+
 @app.get("/teacher", response_model=APIInfo)
 def get_teacher_info(db: Session = Depends(get_db)):
     endpoints = [
         {"path": "/teacher/task/create", "description": "Create a new task"},
+        {"path": "/teacher/task/update/{task}", "description": "Update a task and regrade its submissions"},
         {"path": "/teacher/task/results/{task}", "description": "Get results for a task"},
+        {"path": "/teacher/task/results/{task}/{student}/output", "description": "Get a byte range of a student's stored output"},
+        {"path": "/teacher/task/results/{task}/{student}/attempts", "description": "Get all attempts of a student at a task"},
+        {"path": "/teacher/submission/{attempt_id}/timeline", "description": "Get where the time of a submission went, from request to result"},
+        {"path": "/teacher/export/results", "description": "Stream results for all tasks of a teacher or group"},
         {"path": "/teacher/task/delete/{task}", "description": "Delete a task"},
         {"path": "/teacher/task/{task}", "description": "Get task information"},
+        {"path": "/teacher/task/{task}/similarity", "description": "Get clusters of likely copied submissions"},
+        {"path": "/teacher/task/{task}/versions", "description": "Get the versions of a task and the progress of their regrades"},
+        {"path": "/teacher/gc", "description": "Get the report of the last garbage collection"},
+        {"path": "/teacher/gc/run", "description": "Run garbage collection now"},
+        {"path": "/teacher/capacity", "description": "Get the report of the last capacity planning run"},
+        {"path": "/teacher/dispatch", "description": "Get the load and health of the pod dispatch targets"},
         {"path": "/teacher/group/create", "description": "Create a new group"},
         {"path": "/teacher/group/add-student", "description": "Add a student to a group"},
         {"path": "/teacher/group/{group}/students", "description": "Get students in a group"},
-        {"path": "/teacher/group/{group}/tasks", "description": "Get tasks assigned to a group"}
+        {"path": "/teacher/group/{group}/tasks", "description": "Get tasks assigned to a group"},
+        {"path": "/teacher/group/{group}/gradebook", "description": "Get the student/task status matrix of a group"}
     ]
     
     return APIInfo(
@@ -765,65 +3189,247 @@ def get_teacher_info(db: Session = Depends(get_db)):
     )
 
 @app.get("/teacher/task/results/{task}")
-def get_task_results(task: str, db: Session = Depends(get_db)):
+def get_task_results(task: str, preview_bytes: int = Query(4096, ge=0), db: Session = Depends(get_db)):
     # Validate task
     task_obj = db.query(Task).filter(Task.name == task).first()
     if not task_obj:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Get all results for the task
-    results = db.query(TaskResult).filter(TaskResult.task_id == task_obj.id).all()
+    # Get the latest result of each student for the task
+    results = db.query(LatestResult.student_id, Student.name).join(
+        Student, Student.id == LatestResult.student_id
+    ).filter(LatestResult.task_id == task_obj.id).all()
     
     # Process each result to include output if available
     processed_results = []
-    for r in results:
-        student = db.query(Student).filter(Student.id == r.student_id).first()
-        student_name = student.name if student else "Unknown"
-        
+    for student_id, student_name in results:
         # Update the status if validation is complete
-        update_task_result_status(task_obj.id, student.id, task, student_name, db)
+        update_task_result_status(task_obj.id, student_id, task, student_name, db)
         
-        # Get the output if available
-        output_path = Path(f"/shared/output/{task}/{student_name}/output.txt")
-        output_content = None
-        patterns_found = 0
-        total_patterns = 0
+        # Get the updated attempt after running update_task_result_status
+        updated_result = get_latest_attempt(task_obj.id, student_id, db)
+        if not updated_result:
+            continue
         
-        if output_path.exists():
-            try:
-                with open(output_path, "r") as f:
-                    output_content = f.read()
-                    
-                    # Count patterns found
-                    if output_content:
-                        # Look for pattern search results
-                        pattern_section = output_content.split("PATTERN SEARCH:")[-1] if "PATTERN SEARCH:" in output_content else ""
-                        if pattern_section:
-                            # Count lines with "Pattern:" in them
-                            pattern_lines = [line.strip() for line in pattern_section.split("\n") if line.strip() and "Pattern:" in line]
-                            total_patterns = len(pattern_lines)
-                            # Only count lines that contain "FOUND" but NOT "NOT FOUND"
-                            patterns_found = sum(1 for line in pattern_lines if "FOUND" in line and "NOT FOUND" not in line)
-            except:
-                pass
-        
-        # Get the updated status after running update_task_result_status
-        updated_result = db.query(TaskResult).filter(
-            TaskResult.task_id == task_obj.id,
-            TaskResult.student_id == student.id
-        ).order_by(TaskResult.created_at.desc()).first()
+        # Get a preview of the output if available
+        output_preview = None
+        output_size = None
+        if updated_result.output_hash:
+            blob = db.query(OutputBlob).filter(OutputBlob.digest == updated_result.output_hash).first()
+            if blob and blobstore.blob_exists(blob.digest):
+                output_preview = blobstore.read_blob(blob.digest, 0, preview_bytes).decode("utf-8", errors="replace")
+                output_size = blob.size
         
         processed_results.append({
             "student_name": student_name,
-            "result": updated_result.status if updated_result else r.status,  # Use updated status
-            "created_at": r.created_at,
-            "output": output_content,
-            "patterns_found": patterns_found,
-            "total_patterns": total_patterns
+            "result": updated_result.status,  # Use updated status
+            "created_at": updated_result.created_at,
+            "attempt_id": updated_result.id,
+            "output": output_preview,
+            "output_size": output_size,
+            "output_truncated": output_size is not None and output_size > preview_bytes,
+            "output_url": f"/teacher/task/results/{task}/{student_name}/output",
+            "patterns_found": updated_result.patterns_found or 0,
+            "total_patterns": updated_result.total_patterns or 0,
+            "pod_target": updated_result.pod_target
         })
     
     return processed_results
 
+@app.get("/teacher/task/results/{task}/{student}/output", response_class=PlainTextResponse)
+def get_task_result_output(
+    task: str,
+    student: str,
+    request: Request,
+    section: str = "report",
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+    attempt: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # Validate task and student
+    task_obj = db.query(Task).filter(Task.name == task).first()
+    if not task_obj:
+        raise HTTPException(status_code=404, detail="Task not found")
+    student_obj = db.query(Student).filter(Student.name == student).first()
+    if not student_obj:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    # Validate section
+    section_columns = {
+        "report": "output_hash",
+        "teacher": "teacher_output_hash",
+        "student": "student_output_hash"
+    }
+    if section not in section_columns:
+        raise HTTPException(status_code=400, detail=f"Unknown output section: {section}")
+    
+    # The current attempt unless an earlier one is asked for
+    if attempt is None:
+        task_result = get_latest_attempt(task_obj.id, student_obj.id, db)
+    else:
+        task_result = db.query(TaskResult).filter(
+            TaskResult.id == attempt,
+            TaskResult.task_id == task_obj.id,
+            TaskResult.student_id == student_obj.id
+        ).first()
+    if not task_result or not getattr(task_result, section_columns[section]):
+        raise HTTPException(status_code=404, detail="Output not found")
+    
+    return blob_response(getattr(task_result, section_columns[section]), db, request.headers.get("range"), offset, limit)
+
+@app.get("/teacher/task/results/{task}/{student}/attempts")
+def get_task_result_attempts(task: str, student: str, db: Session = Depends(get_db)):
+    # Validate task and student
+    task_obj = db.query(Task).filter(Task.name == task).first()
+    if not task_obj:
+        raise HTTPException(status_code=404, detail="Task not found")
+    student_obj = db.query(Student).filter(Student.name == student).first()
+    if not student_obj:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    latest = db.query(LatestResult).filter(
+        LatestResult.task_id == task_obj.id,
+        LatestResult.student_id == student_obj.id
+    ).first()
+    
+    # Newest first, served by the (task_id, student_id, created_at) index
+    attempts = db.query(TaskResult).filter(
+        TaskResult.task_id == task_obj.id,
+        TaskResult.student_id == student_obj.id
+    ).order_by(TaskResult.created_at.desc(), TaskResult.id.desc()).all()
+    
+    return [
+        {
+            "attempt_id": a.id,
+            "status": a.status,
+            "created_at": a.created_at,
+            "current": latest is not None and latest.attempt_id == a.id,
+            "patterns_found": a.patterns_found or 0,
+            "total_patterns": a.total_patterns or 0,
+            "output_url": f"/teacher/task/results/{task}/{student}/output?attempt={a.id}" if a.output_hash else None,
+            "timeline_url": f"/teacher/submission/{a.id}/timeline",
+            "task_version": a.task_version,
+            "vars": json.loads(a.vars_values) if a.vars_values is not None else None,
+            "vars_seed": a.vars_seed
+        }
+        for a in attempts
+    ]
+
+def timeline_breakdown(spans: List[tracing.Span]) -> Dict[str, Optional[float]]:
+    """Seconds spent in each stage of a submission; None for stages the timeline has no record of."""
+    def find(name: str, source: str) -> Optional[tracing.Span]:
+        return next((span for span in spans if span.name == name and span.source == source), None)
+    
+    def between(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+        if start is None or end is None:
+            return None
+        return round(max((end - start).total_seconds(), 0.0), 3)
+    
+    api_spans = [span for span in spans if span.source == "api" and span.name not in ("collect", "collect_previous")]
+    created = find("pod_created", "pod")
+    scheduled = find("Scheduled", "pod")
+    pulling = find("Pulling", "pod")
+    pulled = find("Pulled", "pod")
+    started = find("Started", "pod")
+    container = find("container", "pod")
+    collect = find("collect", "api")
+    runner_end = max((span.ended_at for span in spans if span.source == "runner"), default=None)
+    
+    breakdown = {
+        "api": between(
+            min((span.started_at for span in api_spans), default=None),
+            max((span.ended_at for span in api_spans), default=None)
+        ),
+        "scheduling": between(created and created.started_at, scheduled and scheduled.started_at),
+        # Without a Pulling event the image was already on the node
+        "image_pull": between(pulling.started_at, pulled and pulled.started_at) if pulling else (0.0 if pulled else None),
+        "container_start": between(
+            (pulled or scheduled).started_at if (pulled or scheduled) else None,
+            container.started_at if container else (started and started.started_at)
+        )
+    }
+    for phase in ("teacher_script", "teacher_cached", "student_script", "comparison", "pattern_search"):
+        span = find(phase, "runner")
+        breakdown[phase] = between(span.started_at, span.ended_at) if span else None
+    breakdown["result_pickup"] = between(container.ended_at if container else runner_end, collect and collect.started_at)
+    breakdown["total"] = between(
+        min((span.started_at for span in spans), default=None),
+        max((span.ended_at for span in spans), default=None)
+    )
+    return breakdown
+
+@app.get("/teacher/submission/{attempt_id}/timeline")
+def get_submission_timeline(attempt_id: int, db: Session = Depends(get_db)):
+    task_result = db.query(TaskResult).filter(TaskResult.id == attempt_id).first()
+    if not task_result:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    task = db.query(Task).filter(Task.id == task_result.task_id).first()
+    student = db.query(Student).filter(Student.id == task_result.student_id).first()
+    
+    spans = load_spans(attempt_id, db)
+    origin = min((span.started_at for span in spans), default=task_result.created_at)
+    
+    return {
+        "attempt_id": task_result.id,
+        "task_name": task.name if task else None,
+        "student_name": student.name if student else None,
+        "status": task_result.status,
+        "trace_id": task_result.trace_id,
+        "pod_name": task_result.pod_name,
+        "created_at": task_result.created_at,
+        "breakdown": timeline_breakdown(spans),
+        "spans": [
+            {
+                "name": span.name,
+                "source": span.source,
+                "started_at": span.started_at,
+                "ended_at": span.ended_at,
+                "offset_seconds": round((span.started_at - origin).total_seconds(), 3),
+                "duration_seconds": round((span.ended_at - span.started_at).total_seconds(), 3),
+                "attributes": span.attributes
+            }
+            for span in sorted(spans, key=lambda span: span.started_at)
+        ]
+    }
+
+@app.get("/teacher/export/results")
+def export_results(
+    teacher_name: str,
+    group_name: Optional[str] = None,
+    export_format: str = Query("csv", alias="format"),
+    history: bool = False,
+    db: Session = Depends(get_db)
+):
+    # Validate teacher
+    teacher = db.query(Teacher).filter(Teacher.name == teacher_name).first()
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    
+    # Validate group if the export is limited to one
+    group_id = None
+    if group_name:
+        group = db.query(Group).filter(
+            Group.name == group_name,
+            Group.teacher_id == teacher.id
+        ).first()
+        if not group:
+            raise HTTPException(status_code=404, detail="Group not found")
+        group_id = group.id
+    
+    # Validate export format
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+    if export_format == "parquet" and pyarrow is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    
+    filename = f"results-{group_name or teacher_name}.{export_format}"
+    return StreamingResponse(
+        stream_export(export_format, teacher.id, group_id, history),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.delete("/teacher/task/delete/{task}")
 def delete_task(task: str, db: Session = Depends(get_db)):
     # Validate task
@@ -852,22 +3458,32 @@ def delete_task(task: str, db: Session = Depends(get_db)):
             shutil.rmtree(shared_output_dir)
         
         # Delete any running task pods for this task
-        pods = v1.list_namespaced_pod(
-            namespace="default",
-            label_selector=f"app=task,task={task}"
-        )
-        for pod in pods.items:
+        for target in dispatcher.targets:
             try:
-                v1.delete_namespaced_pod(
-                    name=pod.metadata.name,
-                    namespace="default"
+                target.core_v1.delete_collection_namespaced_pod(
+                    namespace=target.namespace,
+                    label_selector=task_pod_selector(task)
                 )
-            except:
-                pass
+            except Exception as e:
+                print(f"Error deleting task pods in {target.name}: {str(e)}")
         
         # Delete task results from database
+        db.query(LatestResult).filter(LatestResult.task_id == task_obj.id).delete()
+        db.query(SubmissionSpan).filter(SubmissionSpan.attempt_id.in_(
+            db.query(TaskResult.id).filter(TaskResult.task_id == task_obj.id)
+        )).delete(synchronize_session=False)
         db.query(TaskResult).filter(TaskResult.task_id == task_obj.id).delete()
         
+        # Delete the similarity index of the task
+        db.query(SimilarityBucket).filter(SimilarityBucket.task_id == task_obj.id).delete()
+        db.query(SubmissionSignature).filter(SubmissionSignature.task_id == task_obj.id).delete()
+        db.query(TaskResourceProfile).filter(TaskResourceProfile.task_id == task_obj.id).delete()
+        db.query(TaskVersion).filter(TaskVersion.task_id == task_obj.id).delete()
+        
+        # Delete gradebook aggregates for the task
+        db.query(GradebookEntry).filter(GradebookEntry.task_id == task_obj.id).delete()
+        db.query(GradebookSummary).filter(GradebookSummary.task_id == task_obj.id).delete()
+        
         # Delete task groups first
         db.query(TaskGroup).filter(TaskGroup.task_id == task_obj.id).delete()
         
@@ -879,30 +3495,114 @@ def delete_task(task: str, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete task: {str(e)}")
 
-@app.get("/teacher/task/{task}")
-def get_teacher_task(task: str, db: Session = Depends(get_db)):
+@app.get("/teacher/gc")
+def get_gc_report():
+    return last_gc_report
+
+@app.post("/teacher/gc/run")
+def run_gc_now():
+    return run_garbage_collection()
+
+@app.get("/teacher/dispatch")
+def get_dispatch_targets():
+    return {"targets": [target.snapshot() for target in dispatcher.targets], "hedging": last_hedge_report}
+
+@app.get("/teacher/capacity")
+def get_capacity_report(db: Session = Depends(get_db)):
+    return load_maintenance_report("capacity", db)
+
+@app.get("/teacher/task/{task}/similarity")
+def get_task_similarity(task: str, threshold: float = Query(0.8, ge=0.0, le=1.0), db: Session = Depends(get_db)):
     # Validate task
     task_obj = db.query(Task).filter(Task.name == task).first()
     if not task_obj:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    clusters = find_similar_submissions(task_obj.id, threshold, db)
+    return {
+        "task": task,
+        "threshold": threshold,
+        "submissions": db.query(SubmissionSignature).filter(SubmissionSignature.task_id == task_obj.id).count(),
+        "clusters": clusters
+    }
+
+def load_resource_report(task_id: int, db: Session) -> Dict[str, Any]:
+    """Measured usage percentiles of a task and the resources its next pod gets."""
+    profile = db.query(TaskResourceProfile).filter(TaskResourceProfile.task_id == task_id).first()
+    usage = None
+    if profile:
+        usage = {
+            "samples": profile.samples,
+            "cpu_seconds": {"p50": profile.cpu_seconds_p50, "p99": profile.cpu_seconds_p99},
+            "cpu_cores": {"p50": profile.cpu_cores_p50, "p99": profile.cpu_cores_p99},
+            "peak_memory_bytes": {"p50": profile.memory_bytes_p50, "p99": profile.memory_bytes_p99},
+            "wall_seconds": {"p50": profile.wall_seconds_p50, "p99": profile.wall_seconds_p99},
+            "updated_at": profile.updated_at.isoformat() if profile.updated_at else None
+        }
+    return {"usage": usage, "next_pod": runner_resources(profile)}
+
+@app.get("/teacher/task/{task}")
+def get_teacher_task(task: str, request: Request, db: Session = Depends(get_db)):
+    # Validate task
+    metadata = load_task_metadata(task, db)
+    if not metadata:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
     # Check if task directory exists
-    task_dir = TASKS_DIR / task
-    if not task_dir.exists():
+    if metadata["files"] is None:
         raise HTTPException(status_code=404, detail="Task directory not found")
     
-    # Get task files
-    task_files = [f.name for f in task_dir.iterdir() if f.is_file()]
+    return conditional_json(request, {
+        "name": task,
+        "description": metadata["description"],
+        "files": metadata["files"],
+        "result_count": metadata["result_count"],
+        "path": metadata["path"],
+        "deadline": metadata["deadline"],
+        "version": metadata["version"],
+        "comparison": metadata["comparison"],
+        "resources": load_resource_report(metadata["id"], db)
+    })
+
+@app.get("/teacher/task/{task}/versions")
+def get_task_versions(task: str, db: Session = Depends(get_db)):
+    # Validate task
+    task_obj = db.query(Task).filter(Task.name == task).first()
+    if not task_obj:
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    # Count results from database
-    result_count = db.query(TaskResult).filter(TaskResult.task_id == task_obj.id).count()
+    # Status counts of the attempts each version's regrade created
+    progress: Dict[int, Dict[str, int]] = {}
+    for version, status, count in db.query(TaskResult.task_version, TaskResult.status, func.count(TaskResult.id)).filter(
+        TaskResult.task_id == task_obj.id,
+        TaskResult.regrade_of.isnot(None)
+    ).group_by(TaskResult.task_version, TaskResult.status).all():
+        progress.setdefault(version, {})[status] = count
     
+    versions = db.query(TaskVersion).filter(TaskVersion.task_id == task_obj.id).order_by(TaskVersion.version.desc()).all()
     return {
-        "name": task,
-        "description": task_obj.description,
-        "files": task_files,
-        "result_count": result_count,
-        "path": str(task_dir)
+        "task": task,
+        "version": task_obj.version or 1,
+        "versions": [
+            {
+                "version": v.version,
+                "created_at": v.created_at,
+                "changes": v.changes.split(",") if v.changes else [],
+                "teacher_script_hash": v.teacher_script_hash,
+                "vars_hash": v.vars_hash,
+                "find_hash": v.find_hash,
+                "comparison": {"mode": v.comparison_mode, "abs_tol": v.abs_tol, "rel_tol": v.rel_tol},
+                "regrade": {
+                    "state": v.regrade_state,
+                    "pod": v.regrade_pod,
+                    "incremental": v.incremental_count or 0,
+                    "rerun": v.rerun_count or 0,
+                    "skipped": v.skipped_count or 0,
+                    "statuses": progress.get(v.version, {})
+                }
+            }
+            for v in versions
+        ]
     }
 
 @app.post("/teacher/group/create")
@@ -969,6 +3669,16 @@ def add_student_to_group(
         group_id=group.id
     )
     db.add(db_student_group)
+    db.flush()
+    
+    # Carry the student's existing results into the group's gradebook
+    group_task_ids = db.query(TaskGroup.task_id).filter(TaskGroup.group_id == group.id)
+    existing_results = db.query(LatestResult).filter(
+        LatestResult.student_id == student.id,
+        LatestResult.task_id.in_(group_task_ids)
+    ).all()
+    for r in existing_results:
+        record_gradebook_status(r.task_id, student.id, r.status, db)
     db.commit()
     
     return {"message": "Student added to group successfully"}
@@ -1015,4 +3725,64 @@ def get_group_tasks(group: str, teacher_name: str, db: Session = Depends(get_db)
     task_ids = [tg.task_id for tg in task_groups]
     tasks = db.query(Task).filter(Task.id.in_(task_ids)).all()
     
-    return [{"name": task.name, "description": task.description} for task in tasks]
\ No newline at end of file
+    return [{"name": task.name, "description": task.description} for task in tasks]
+
+@app.get("/teacher/group/{group}/gradebook")
+def get_group_gradebook(group: str, teacher_name: str, db: Session = Depends(get_db)):
+    # Validate teacher
+    teacher = db.query(Teacher).filter(Teacher.name == teacher_name).first()
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    
+    # Validate group
+    group_obj = db.query(Group).filter(
+        Group.name == group,
+        Group.teacher_id == teacher.id
+    ).first()
+    if not group_obj:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    # Get tasks and students of the group
+    tasks = db.query(Task.id, Task.name).join(
+        TaskGroup, TaskGroup.task_id == Task.id
+    ).filter(TaskGroup.group_id == group_obj.id).order_by(Task.name).all()
+    students = db.query(Student.id, Student.name).join(
+        StudentGroup, StudentGroup.student_id == Student.id
+    ).filter(StudentGroup.group_id == group_obj.id).order_by(Student.name).all()
+    
+    # Read the precomputed cells and counters
+    entries = db.query(
+        GradebookEntry.task_id, GradebookEntry.student_id, GradebookEntry.status
+    ).filter(GradebookEntry.group_id == group_obj.id).all()
+    summaries = db.query(GradebookSummary).filter(GradebookSummary.group_id == group_obj.id).all()
+    
+    task_names = {task_id: name for task_id, name in tasks}
+    student_names = {student_id: name for student_id, name in students}
+    
+    matrix = {name: {task_name: "NOT_STARTED" for task_name in task_names.values()} for name in student_names.values()}
+    for task_id, student_id, status in entries:
+        if task_id in task_names and student_id in student_names:
+            matrix[student_names[student_id]][task_names[task_id]] = status
+    
+    summary = {}
+    for s in summaries:
+        if s.task_id not in task_names:
+            continue
+        submitted = s.started_count + s.success_count + s.fail_count + s.error_count
+        summary[task_names[s.task_id]] = {
+            "students": len(students),
+            "submitted": submitted,
+            "started": s.started_count,
+            "success": s.success_count,
+            "fail": s.fail_count,
+            "error": s.error_count,
+            "pass_rate": s.success_count / len(students) if students else 0.0
+        }
+    
+    return {
+        "group": group,
+        "tasks": list(task_names.values()),
+        "students": list(student_names.values()),
+        "matrix": matrix,
+        "summary": summary
+    }
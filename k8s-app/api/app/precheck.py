@@ -0,0 +1,82 @@
+import os
+import ast
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+# Limits a script must meet before a pod is started for it
+PRECHECK_MAX_LINES = int(os.getenv("PRECHECK_MAX_LINES", "5000"))
+PRECHECK_FORBIDDEN_IMPORTS = tuple(
+    name.strip() for name in os.getenv("PRECHECK_FORBIDDEN_IMPORTS", "ctypes,socket,subprocess,multiprocessing").split(",")
+    if name.strip()
+)
+PRECHECK_CACHE_SIZE = int(os.getenv("PRECHECK_CACHE_SIZE", "4096"))
+
+# Verdicts by script hash; a change of rules starts a new set of keys
+_RULES_KEY = f"{PRECHECK_MAX_LINES}:{','.join(sorted(PRECHECK_FORBIDDEN_IMPORTS))}"
+_verdicts: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+_verdicts_lock = threading.Lock()
+
+def _imported_modules(tree: ast.AST) -> Iterator[Tuple[str, int]]:
+    """Dotted names of imported modules, including __import__ and importlib.import_module with literal names."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name, node.lineno
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module, node.lineno
+            for alias in node.names:
+                yield f"{node.module}.{alias.name}", node.lineno
+        elif isinstance(node, ast.Call) and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            func = node.func
+            if (isinstance(func, ast.Name) and func.id == "__import__") or (
+                isinstance(func, ast.Attribute) and func.attr == "import_module"
+            ):
+                yield node.args[0].value, node.lineno
+
+def _forbidden(module: str) -> bool:
+    return any(module == name or module.startswith(name + ".") for name in PRECHECK_FORBIDDEN_IMPORTS)
+
+def check_source(source: bytes, filename: str = "script.py") -> Optional[str]:
+    """
+    Compile a script to bytecode and apply the size and import rules.
+
+    Returns:
+        None if the script may run, otherwise a message for the student
+    """
+    lines = source.count(b"\n") + (0 if source.endswith(b"\n") or not source else 1)
+    if lines > PRECHECK_MAX_LINES:
+        return f"Script has {lines} lines, more than the limit of {PRECHECK_MAX_LINES}"
+
+    try:
+        # Compiling catches everything ast.parse does plus errors such as a misplaced return
+        compile(source, filename, "exec", dont_inherit=True)
+        tree = ast.parse(source, filename)
+    except SyntaxError as e:
+        location = f" (line {e.lineno}" + (f", column {e.offset}" if e.offset else "") + ")" if e.lineno else ""
+        text = f"\n    {e.text.rstrip()}" if e.text else ""
+        return f"{type(e).__name__}: {e.msg}{location}{text}"
+    except (ValueError, RecursionError, MemoryError) as e:
+        return f"Script could not be compiled: {type(e).__name__}: {str(e) or 'too deeply nested'}"
+
+    for module, lineno in _imported_modules(tree):
+        if _forbidden(module):
+            return f"Import of {module} is not allowed (line {lineno}); forbidden modules: {', '.join(PRECHECK_FORBIDDEN_IMPORTS)}"
+    return None
+
+def check_script(path: str, sha256: str) -> Optional[str]:
+    """Verdict for a saved script, cached by its content hash."""
+    key = (sha256, _RULES_KEY)
+    with _verdicts_lock:
+        if key in _verdicts:
+            _verdicts.move_to_end(key)
+            return _verdicts[key]
+
+    with open(path, "rb") as f:
+        verdict = check_source(f.read(), os.path.basename(path))
+
+    with _verdicts_lock:
+        _verdicts[key] = verdict
+        while len(_verdicts) > PRECHECK_CACHE_SIZE:
+            _verdicts.popitem(last=False)
+    return verdict
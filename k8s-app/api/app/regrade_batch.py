@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compare_outputs import compare_files, SUCCESS_MESSAGE, FAIL_MESSAGE
+
+CHUNK_SIZE = 1024 * 1024
+
+def run_teacher(script: str, vars_path: Optional[str], output_path: str) -> None:
+    """Run the teacher's script the way the task pod does: vars.txt on stdin, stderr with stdout."""
+    with open(output_path, "wb") as out:
+        if vars_path and os.path.exists(vars_path) and os.path.getsize(vars_path) > 0:
+            with open(vars_path, "rb") as stdin:
+                subprocess.run(["python3", script], stdin=stdin, stdout=out, stderr=subprocess.STDOUT)
+        else:
+            subprocess.run(["python3", script], stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT)
+
+def append_section(report, path: str) -> None:
+    """Append an output without its trailing blank lines, as the task pod's append_output does."""
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            body = chunk.rstrip(b"\n")
+            if body:
+                report.write(pending + body)
+                pending = chunk[len(body):]
+            else:
+                pending += chunk
+    report.write(b"\n")
+
+def pattern_report(find_file: str, student_script: str) -> str:
+    lines = ["", "PATTERN SEARCH:"]
+    with open(find_file) as f:
+        # Like `while read`, a last line without a newline is not a pattern
+        for pattern in f.read().split("\n")[:-1]:
+            result = subprocess.run(["grep", "-c", pattern, student_script], capture_output=True, text=True)
+            count = int(result.stdout.strip() or 0)
+            if count > 0:
+                lines.append(f'  Pattern: "{pattern}" - FOUND ({count} occurrences)')
+            else:
+                lines.append(f'  Pattern: "{pattern}" - NOT FOUND')
+    return "\n".join(lines) + "\n"
+
+def comparison_report(teacher_path: str, student_path: str, mode: str, abs_tol: float, rel_tol: float) -> str:
+    try:
+        match, detail = compare_files(teacher_path, student_path, mode, abs_tol, rel_tol)
+    except Exception as e:
+        return f"ERROR: Comparison failed: {str(e)}\n"
+    if match:
+        return SUCCESS_MESSAGE + "\n"
+    return f"{FAIL_MESSAGE}\n  {detail}\n"
+
+def publish(output_dir: str, attempt_id: int, report_path: str) -> bool:
+    """Publish a report through the task pod's protocol, unless a newer attempt superseded it."""
+    try:
+        with open(os.path.join(output_dir, "current_attempt.txt")) as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        current = ""
+    if current and current != str(attempt_id):
+        os.unlink(report_path)
+        return False
+    os.replace(report_path, os.path.join(output_dir, "output.txt"))
+    with open(os.path.join(output_dir, "result_attempt.txt"), "w") as f:
+        f.write(f"{attempt_id}\n")
+    with open(os.path.join(output_dir, "status.txt"), "w") as f:
+        f.write("COMPLETED\n")
+    return True
+
+def regrade(manifest: Dict) -> int:
+    """
+    Regrade stored student outputs against a new version of the teacher's side.
+
+    Student scripts are not run again: each entry's stored student output is
+    compared with the teacher's output for the same vars.txt. The teacher's
+    script runs once per distinct vars.txt, so a task without variables costs
+    one teacher run for the whole class.
+    """
+    work_dir = tempfile.mkdtemp(prefix="regrade-")
+    teacher_outputs: Dict[str, str] = {}
+    published = 0
+    try:
+        for entry in manifest["entries"]:
+            attempt_id = entry["attempt_id"]
+            output_dir = os.path.join(manifest["output_dir"], entry["student_name"])
+            stage_dir = os.path.join(output_dir, f".attempt-{attempt_id}")
+            os.makedirs(stage_dir, exist_ok=True)
+            report_path = os.path.join(stage_dir, "output.txt")
+            try:
+                # Reuse the teacher's output for identical inputs
+                vars_path = entry.get("vars_path")
+                key = "none"
+                if vars_path and os.path.exists(vars_path):
+                    with open(vars_path, "rb") as f:
+                        key = hashlib.sha256(f.read()).hexdigest()
+                if key not in teacher_outputs:
+                    teacher_outputs[key] = os.path.join(work_dir, f"teacher-{len(teacher_outputs)}.txt")
+                    run_teacher(manifest["teacher_script"], vars_path, teacher_outputs[key])
+                teacher_path = teacher_outputs[key]
+
+                student_path = os.path.join(work_dir, "student.txt")
+                with gzip.open(entry["student_output_blob"], "rb") as src, open(student_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+                with open(report_path, "wb") as report:
+                    report.write(b"TEACHER OUTPUT:\n")
+                    append_section(report, teacher_path)
+                    report.write(b"\nSTUDENT OUTPUT:\n")
+                    append_section(report, student_path)
+                    report.write(b"\n")
+                    report.write(comparison_report(
+                        teacher_path, student_path, manifest["mode"], manifest["abs_tol"], manifest["rel_tol"]
+                    ).encode())
+                    if manifest.get("find_file") and os.path.exists(manifest["find_file"]):
+                        report.write(pattern_report(manifest["find_file"], entry["student_script"]).encode())
+            except Exception as e:
+                # The attempt still completes, as an error the teacher can read
+                with open(report_path, "w") as report:
+                    report.write(f"ERROR: Regrade failed: {str(e)}\n")
+            published += publish(output_dir, attempt_id, report_path)
+            shutil.rmtree(stage_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Regraded {published} of {len(manifest['entries'])} attempts with {len(teacher_outputs)} teacher runs")
+    return published
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: regrade_batch.py MANIFEST")
+        sys.exit(2)
+    with open(sys.argv[1]) as f:
+        regrade(json.load(f))
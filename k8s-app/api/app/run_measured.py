@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+def run_measured(command, usage_path: str, label: str) -> int:
+    """
+    Run a command and append its CPU time, peak memory and wall time to a JSON lines file.
+
+    The child's own resource usage comes from wait4, so the measurement covers
+    exactly this command and whatever it waited for, not the runner around it.
+    """
+    started = time.monotonic()
+    process = subprocess.Popen(command)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_seconds = time.monotonic() - started
+    exit_code = os.waitstatus_to_exitcode(status)
+    process.returncode = exit_code
+
+    record = {
+        "label": label,
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_bytes": usage.ru_maxrss * 1024,
+        "wall_seconds": round(wall_seconds, 3),
+        "exit_code": exit_code
+    }
+    try:
+        with open(usage_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        # stderr belongs to the measured script's output, so a lost measurement stays silent
+        pass
+    return exit_code
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a command and record its resource usage")
+    parser.add_argument("--usage", required=True, help="JSON lines file the measurement is appended to")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.error("no command given")
+    sys.exit(run_measured(args.command, args.usage, args.label))
@@ -15,61 +15,152 @@ INPUT_DIR="/shared/input/$TASK_NAME"
 OUTPUT_DIR="/shared/output/$TASK_NAME/$STUDENT_NAME"
 mkdir -p $OUTPUT_DIR
 
+# Write results into a private staging directory until they are published;
+# a hedged attempt runs in two pods at once, so each pod stages separately
+ATTEMPT_ID=${ATTEMPT_ID:-0}
+POD_NAME=${POD_NAME:-$HOSTNAME}
+STAGE_DIR="$OUTPUT_DIR/.attempt-$ATTEMPT_ID-$POD_NAME"
+mkdir -p $STAGE_DIR
+
+# Outputs are kept in files so large outputs never pass through shell variables
+TEACHER_OUTPUT_FILE="$STAGE_DIR/teacher_output.txt"
+STUDENT_OUTPUT_FILE="$STAGE_DIR/student_output.txt"
+
+# CPU time, peak memory and wall time of each script run, used to size future pods
+USAGE_FILE="$STAGE_DIR/usage.jsonl"
+measure() {
+    python3 "$INPUT_DIR/script/run_measured.py" --usage "$USAGE_FILE" --label "$@"
+}
+
+# Start and end of each phase, merged into the submission's timeline (trace $TRACE_ID)
+TIMELINE_FILE="$STAGE_DIR/timeline.jsonl"
+phase_start() {
+    PHASE_START=$(date +%s.%N)
+}
+phase_end() {
+    echo "{\"name\": \"$1\", \"start\": $PHASE_START, \"end\": $(date +%s.%N)}" >> "$TIMELINE_FILE"
+}
+
+# Teacher outputs are shared by attempts with the same teacher script and vars.txt values
+TEACHER_CACHE_DIR="$INPUT_DIR/teacher/cache"
+TEACHER_CACHE_FILE=""
+if [ -n "$TEACHER_CACHE_KEY" ]; then
+    TEACHER_CACHE_FILE="$TEACHER_CACHE_DIR/$TEACHER_CACHE_KEY.txt"
+fi
+
 # Check for vars.txt in student's directory
 VARS_FILE="/shared/input/$TASK_NAME/$STUDENT_NAME/vars.txt"
-if [ -s "$VARS_FILE" ]; then
+if [ -n "$TEACHER_CACHE_FILE" ] && [ -f "$TEACHER_CACHE_FILE" ]; then
+    echo "Using cached teacher output..."
+    phase_start
+    cp "$TEACHER_CACHE_FILE" "$TEACHER_OUTPUT_FILE"
+    TEACHER_EXIT_CODE=$?
+    phase_end teacher_cached
+elif [ -s "$VARS_FILE" ]; then
     # Run teacher's script with all inputs
     echo "Running teacher's script with vars.txt..."
-    TEACHER_OUTPUT=$(python3 "$INPUT_DIR/teacher/teacher_script.py" < "$VARS_FILE" 2>&1)
+    phase_start
+    measure teacher python3 "$INPUT_DIR/teacher/teacher_script.py" < "$VARS_FILE" > "$TEACHER_OUTPUT_FILE" 2>&1
     TEACHER_EXIT_CODE=$?
-    
-    # Run student's script with all inputs
-    echo "Running student's script with vars.txt..."
-    STUDENT_OUTPUT=$(python3 "$INPUT_DIR/$STUDENT_NAME/${STUDENT_NAME}_script.py" < "$VARS_FILE" 2>&1)
-    STUDENT_EXIT_CODE=$?
+    phase_end teacher_script
 else
     # Run teacher's script without input
     echo "Running teacher's script..."
-    TEACHER_OUTPUT=$(python3 "$INPUT_DIR/teacher/teacher_script.py" 2>&1)
+    phase_start
+    measure teacher python3 "$INPUT_DIR/teacher/teacher_script.py" > "$TEACHER_OUTPUT_FILE" 2>&1
     TEACHER_EXIT_CODE=$?
+    phase_end teacher_script
+fi
+
+# Keep the output of a clean teacher run for later attempts; the rename makes it appear whole
+if [ -n "$TEACHER_CACHE_FILE" ] && [ ! -f "$TEACHER_CACHE_FILE" ] && [ "$TEACHER_EXIT_CODE" = "0" ]; then
+    mkdir -p "$TEACHER_CACHE_DIR"
+    cp "$TEACHER_OUTPUT_FILE" "$TEACHER_CACHE_FILE.$POD_NAME" && mv -f "$TEACHER_CACHE_FILE.$POD_NAME" "$TEACHER_CACHE_FILE"
+fi
 
+if [ -s "$VARS_FILE" ]; then
+    # Run student's script with all inputs
+    echo "Running student's script with vars.txt..."
+    phase_start
+    measure student python3 "$INPUT_DIR/$STUDENT_NAME/${STUDENT_NAME}_script.py" < "$VARS_FILE" > "$STUDENT_OUTPUT_FILE" 2>&1
+    STUDENT_EXIT_CODE=$?
+    phase_end student_script
+else
     # Run student's script without input
     echo "Running student's script..."
-    STUDENT_OUTPUT=$(python3 "$INPUT_DIR/$STUDENT_NAME/${STUDENT_NAME}_script.py" 2>&1)
+    phase_start
+    measure student python3 "$INPUT_DIR/$STUDENT_NAME/${STUDENT_NAME}_script.py" > "$STUDENT_OUTPUT_FILE" 2>&1
     STUDENT_EXIT_CODE=$?
+    phase_end student_script
 fi
 
+# Append an output file to the report without its trailing blank lines, as $(...) did
+append_output() {
+    if grep -q . "$1"; then
+        sed -e :a -e '/^\n*$/{$d;N;ba' -e '}' -e '$a\' "$1" >> $STAGE_DIR/output.txt
+    else
+        echo "" >> $STAGE_DIR/output.txt
+    fi
+}
+
 # Write outputs to output.txt
-echo "TEACHER OUTPUT:" > $OUTPUT_DIR/output.txt
-echo "$TEACHER_OUTPUT" >> $OUTPUT_DIR/output.txt
-echo "" >> $OUTPUT_DIR/output.txt
-echo "STUDENT OUTPUT:" >> $OUTPUT_DIR/output.txt
-echo "$STUDENT_OUTPUT" >> $OUTPUT_DIR/output.txt
-echo "" >> $OUTPUT_DIR/output.txt
-
-# Compare outputs
-if [ "$TEACHER_OUTPUT" = "$STUDENT_OUTPUT" ]; then
-    echo "SUCCESS: Outputs match!" >> $OUTPUT_DIR/output.txt
-    echo "COMPLETED" > $OUTPUT_DIR/status.txt
-else
-    echo "FAIL: Outputs do not match" >> $OUTPUT_DIR/output.txt
-    echo "COMPLETED" > $OUTPUT_DIR/status.txt
-fi
+echo "TEACHER OUTPUT:" > $STAGE_DIR/output.txt
+append_output "$TEACHER_OUTPUT_FILE"
+echo "" >> $STAGE_DIR/output.txt
+echo "STUDENT OUTPUT:" >> $STAGE_DIR/output.txt
+append_output "$STUDENT_OUTPUT_FILE"
+echo "" >> $STAGE_DIR/output.txt
+
+# Compare outputs using the task's comparison mode (exact, whitespace, token or numeric)
+phase_start
+python3 "$INPUT_DIR/script/compare_outputs.py" \
+    --mode "${COMPARE_MODE:-exact}" \
+    --abs-tol "${ABS_TOL:-0}" \
+    --rel-tol "${REL_TOL:-0}" \
+    "$TEACHER_OUTPUT_FILE" "$STUDENT_OUTPUT_FILE" >> $STAGE_DIR/output.txt 2>&1
+phase_end comparison
 
 # Check for patterns in find.txt if it exists
 if [ -f "$INPUT_DIR/script/find.txt" ]; then
-    echo "" >> $OUTPUT_DIR/output.txt
-    echo "PATTERN SEARCH:" >> $OUTPUT_DIR/output.txt
+    phase_start
+    echo "" >> $STAGE_DIR/output.txt
+    echo "PATTERN SEARCH:" >> $STAGE_DIR/output.txt
     
     while IFS= read -r pattern; do
         # Count occurrences of pattern in student's script
         COUNT=$(grep -c "$pattern" "$INPUT_DIR/$STUDENT_NAME/${STUDENT_NAME}_script.py")
         if [ $COUNT -gt 0 ]; then
-            echo "  Pattern: \"$pattern\" - FOUND ($COUNT occurrences)" >> $OUTPUT_DIR/output.txt
+            echo "  Pattern: \"$pattern\" - FOUND ($COUNT occurrences)" >> $STAGE_DIR/output.txt
         else
-            echo "  Pattern: \"$pattern\" - NOT FOUND" >> $OUTPUT_DIR/output.txt
+            echo "  Pattern: \"$pattern\" - NOT FOUND" >> $STAGE_DIR/output.txt
         fi
     done < "$INPUT_DIR/script/find.txt"
+    phase_end pattern_search
+fi
+
+# Publish only if no newer submission has superseded this attempt
+CURRENT_ATTEMPT=$(cat "$OUTPUT_DIR/current_attempt.txt" 2>/dev/null)
+if [ -n "$CURRENT_ATTEMPT" ] && [ "$CURRENT_ATTEMPT" != "$ATTEMPT_ID" ]; then
+    echo "Attempt $ATTEMPT_ID was superseded by $CURRENT_ATTEMPT, discarding results"
+    rm -rf "$STAGE_DIR"
+    exit 0
 fi
 
-echo "COMPLETED" > $OUTPUT_DIR/status.txt
+# Only the first pod of a hedged attempt publishes; mkdir either creates the marker or fails
+if ! mkdir "$OUTPUT_DIR/.published-$ATTEMPT_ID" 2>/dev/null; then
+    echo "Attempt $ATTEMPT_ID was already published by another pod, discarding results"
+    rm -rf "$STAGE_DIR"
+    exit 0
+fi
+
+if [ -f "$USAGE_FILE" ]; then
+    mv -f "$USAGE_FILE" "$OUTPUT_DIR/usage.jsonl"
+fi
+if [ -f "$TIMELINE_FILE" ]; then
+    mv -f "$TIMELINE_FILE" "$OUTPUT_DIR/timeline.jsonl"
+fi
+mv -f "$STAGE_DIR/output.txt" "$OUTPUT_DIR/output.txt"
+rm -rf "$STAGE_DIR"
+echo "$POD_NAME" > $OUTPUT_DIR/result_pod.txt
+echo "$ATTEMPT_ID" > $OUTPUT_DIR/result_attempt.txt
+echo "COMPLETED" > $OUTPUT_DIR/status.txt
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+# How an attempt's vars.txt values are seeded: "student" gives all attempts of a student at a task
+# the same values, "attempt" gives each attempt its own, "random" draws unseeded values
+VARS_SEED_POLICY = os.getenv("VARS_SEED_POLICY", "student")
+# Mixed into every seed, so values cannot be worked out from task and student ids alone
+VARS_SEED_KEY = os.getenv("VARS_SEED_KEY", "")
+TASK_INPUTS_CACHE_SIZE = 1024
+
+class TaskInputs(NamedTuple):
+    """Parsed vars.txt ranges and teacher script hash of one task version."""
+    ranges: Tuple[Tuple[int, int], ...]
+    teacher_script_hash: Optional[str]
+
+_inputs: "OrderedDict[Tuple[int, int], TaskInputs]" = OrderedDict()
+_inputs_lock = threading.Lock()
+
+def parse_spec(text: str) -> Tuple[Tuple[int, int], ...]:
+    """The "start-end" lines of vars.txt; other lines and empty ranges are skipped."""
+    ranges = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            start, end = map(int, line.split("-"))
+        except ValueError:
+            continue
+        if start <= end:
+            ranges.append((start, end))
+    return tuple(ranges)
+
+def _file_sha256(path: Path) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def task_inputs(task_id: int, version: int, vars_path: Path, teacher_script_path: Path) -> TaskInputs:
+    """
+    Inputs of a task version, read once per worker.
+
+    Every change of vars.txt or the teacher's script starts a new task
+    version, so entries never need invalidating.
+    """
+    key = (task_id, version)
+    with _inputs_lock:
+        if key in _inputs:
+            _inputs.move_to_end(key)
+            return _inputs[key]
+
+    try:
+        ranges = parse_spec(vars_path.read_text())
+    except FileNotFoundError:
+        ranges = ()
+    inputs = TaskInputs(ranges, _file_sha256(teacher_script_path))
+
+    with _inputs_lock:
+        _inputs[key] = inputs
+        while len(_inputs) > TASK_INPUTS_CACHE_SIZE:
+            _inputs.popitem(last=False)
+    return inputs
+
+def seed_for(task_id: int, student_id: int, attempt_id: int, policy: str = VARS_SEED_POLICY) -> Optional[str]:
+    """Seed of an attempt's values under the policy, or None for unseeded values."""
+    if policy == "random":
+        return None
+    parts = [VARS_SEED_KEY, str(task_id), str(student_id)]
+    if policy == "attempt":
+        parts.append(str(attempt_id))
+    return hashlib.sha256(":".join(parts).encode()).hexdigest()[:32]
+
+def draw(ranges: Tuple[Tuple[int, int], ...], seed: Optional[str]) -> List[int]:
+    """One value per range; the same seed always gives the same values."""
+    rng = random.Random(seed) if seed is not None else random.Random()
+    return [rng.randint(start, end) for start, end in ranges]
+
+def vars_text(values: List[int]) -> str:
+    """Contents of the vars.txt written for an attempt."""
+    return "\n".join(map(str, values))
+
+def teacher_cache_key(teacher_script_hash: str, values: List[int]) -> str:
+    """Key of the teacher's output for a script and its input, shared by every attempt with both."""
+    return hashlib.sha256(f"{teacher_script_hash}\n{vars_text(values)}".encode()).hexdigest()
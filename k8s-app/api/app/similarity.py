@@ -0,0 +1,148 @@
+import io
+import ast
+import keyword
+import hashlib
+import tokenize
+import builtins
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
+
+# 128 hash functions split into 16 bands of 8 rows: pairs with a Jaccard
+# similarity around 0.7 or more share at least one band bucket with high probability
+NUM_PERMUTATIONS = 128
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+TOKEN_SHINGLE_SIZE = 5
+AST_PATH_DEPTH = 3
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _seeded_params() -> List[Tuple[int, int]]:
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % _PRIME
+        params.append((a, b))
+    return params
+
+# Fixed so signatures stay comparable across workers and restarts
+_PERMUTATIONS = _seeded_params()
+_BUILTINS = set(dir(builtins))
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+def normalized_tokens(source: str) -> List[str]:
+    """
+    Token stream with renaming and formatting erased.
+
+    User-chosen identifiers, string and number literals become placeholders;
+    keywords, builtins, operators and indentation are kept. Comments and blank
+    lines are dropped.
+    """
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER):
+                continue
+            if tok.type == tokenize.NAME:
+                tokens.append(tok.string if keyword.iskeyword(tok.string) or tok.string in _BUILTINS else "ID")
+            elif tok.type == tokenize.STRING:
+                tokens.append("STR")
+            elif tok.type == tokenize.NUMBER:
+                tokens.append("NUM")
+            elif tok.type == tokenize.NEWLINE:
+                tokens.append("NEWLINE")
+            elif tok.type == tokenize.INDENT:
+                tokens.append("INDENT")
+            elif tok.type == tokenize.DEDENT:
+                tokens.append("DEDENT")
+            else:
+                tokens.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Keep whatever was tokenized before the error
+        pass
+    return tokens
+
+def ast_paths(source: str) -> List[str]:
+    """Root-ward paths of AST node types, which survive reordering of independent statements."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+
+    paths = []
+
+    def visit(node, ancestors):
+        path = ancestors + [type(node).__name__]
+        paths.append(">".join(path[-AST_PATH_DEPTH:]))
+        for child in ast.iter_child_nodes(node):
+            visit(child, path[-(AST_PATH_DEPTH - 1):])
+
+    visit(tree, [])
+    return paths
+
+def shingles(source: str) -> Set[int]:
+    """Hashed token k-shingles and AST paths of a script."""
+    tokens = normalized_tokens(source)
+    result = set()
+    for i in range(max(len(tokens) - TOKEN_SHINGLE_SIZE + 1, 1 if tokens else 0)):
+        result.add(_hash64("t:" + " ".join(tokens[i:i + TOKEN_SHINGLE_SIZE])))
+    for path in ast_paths(source):
+        result.add(_hash64("a:" + path))
+    return result
+
+def minhash(features: Iterable[int]) -> List[int]:
+    """MinHash signature of a feature set; an empty set gets the all-max signature."""
+    signature = [_MAX_HASH] * NUM_PERMUTATIONS
+    for x in features:
+        for i, (a, b) in enumerate(_PERMUTATIONS):
+            h = ((a * x + b) % _PRIME) & _MAX_HASH
+            if h < signature[i]:
+                signature[i] = h
+    return signature
+
+def band_hashes(signature: List[int]) -> List[int]:
+    """One signed 64-bit bucket key per band, for storage in a BIGINT column."""
+    keys = []
+    for band in range(BANDS):
+        rows = array("I", signature[band * ROWS:(band + 1) * ROWS]).tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big", signed=True))
+    return keys
+
+def encode_signature(signature: List[int]) -> bytes:
+    return array("I", signature).tobytes()
+
+def decode_signature(data: bytes) -> List[int]:
+    values = array("I")
+    values.frombytes(data)
+    return values.tolist()
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity: the share of hash functions with the same minimum."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+def cluster_pairs(pairs: Iterable[Tuple[int, int, float]]) -> List[Dict]:
+    """Group similar pairs into connected components with union-find."""
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    pairs = list(pairs)
+    for a, b, _ in pairs:
+        parent[find(a)] = find(b)
+
+    clusters: Dict[int, Dict] = {}
+    for a, b, score in pairs:
+        cluster = clusters.setdefault(find(a), {"members": set(), "pairs": []})
+        cluster["members"].update((a, b))
+        cluster["pairs"].append((a, b, score))
+    return list(clusters.values())
@@ -0,0 +1,137 @@
+import os
+import json
+import secrets
+import threading
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Optional export of submission traces to an OTLP/HTTP collector, e.g. http://localhost:4318
+OTLP_TRACES_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or (
+    os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/") + "/v1/traces"
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else None
+)
+OTLP_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "school-task-api")
+OTLP_TIMEOUT_SECONDS = 2.0
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+def traceparent(trace_id: str) -> str:
+    """W3C traceparent header value for a new child of the trace."""
+    return f"00-{trace_id}-{new_span_id()}-01"
+
+class Span:
+    """A timed phase of a submission; instants such as pod events have equal start and end."""
+
+    def __init__(self, name: str, source: str, started_at: datetime, ended_at: datetime, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.source = source
+        self.started_at = started_at
+        self.ended_at = ended_at
+        self.attributes = attributes or {}
+
+class SpanRecorder:
+    """Collects the API's spans of a request before the attempt they belong to exists."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        started_at = datetime.utcnow()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(name, "api", started_at, datetime.utcnow(), attributes))
+
+    def add(self, name: str, started_at: datetime, ended_at: datetime, **attributes) -> None:
+        self.spans.append(Span(name, "api", started_at, ended_at, attributes))
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps from the Kubernetes API are aware; stored ones are naive UTC."""
+    if value is not None and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def parse_runner_timeline(text: str) -> List[Span]:
+    """Phases written by the task pod as JSON lines of name, start and end epoch seconds."""
+    spans = []
+    for line in text.splitlines():
+        try:
+            record = json.loads(line)
+            started_at = datetime.utcfromtimestamp(float(record["start"]))
+            ended_at = datetime.utcfromtimestamp(float(record["end"]))
+        except (ValueError, KeyError, TypeError):
+            continue
+        spans.append(Span(str(record.get("name", "runner")), "runner", started_at, ended_at))
+    return spans
+
+def _unix_nanos(value: datetime) -> str:
+    return str(int(value.replace(tzinfo=timezone.utc).timestamp() * 1_000_000_000))
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        values.append({"key": key, "value": encoded})
+    return values
+
+def otlp_payload(trace_id: str, root_name: str, spans: List[Span], attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON request with a root span covering all spans of the trace."""
+    root_id = new_span_id()
+    encoded = [{
+        "traceId": trace_id,
+        "spanId": root_id,
+        "name": root_name,
+        "kind": 2,
+        "startTimeUnixNano": _unix_nanos(min(s.started_at for s in spans)),
+        "endTimeUnixNano": _unix_nanos(max(s.ended_at for s in spans)),
+        "attributes": _otlp_attributes(attributes)
+    }]
+    for span in spans:
+        encoded.append({
+            "traceId": trace_id,
+            "spanId": new_span_id(),
+            "parentSpanId": root_id,
+            "name": f"{span.source}.{span.name}",
+            "kind": 1,
+            "startTimeUnixNano": _unix_nanos(span.started_at),
+            "endTimeUnixNano": _unix_nanos(span.ended_at),
+            "attributes": _otlp_attributes(dict(span.attributes, source=span.source))
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": OTLP_SERVICE_NAME})},
+        "scopeSpans": [{"scope": {"name": OTLP_SERVICE_NAME}, "spans": encoded}]
+    }]}
+
+def export(trace_id: str, root_name: str, spans: List[Span], attributes: Dict[str, Any]) -> None:
+    """Send a finished trace to the collector in the background; does nothing unless OTLP is configured."""
+    if not OTLP_TRACES_ENDPOINT or not trace_id or not spans:
+        return
+    body = json.dumps(otlp_payload(trace_id, root_name, spans, attributes)).encode()
+
+    def send():
+        request = urllib.request.Request(
+            OTLP_TRACES_ENDPOINT,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=OTLP_TIMEOUT_SECONDS).close()
+        except Exception as e:
+            print(f"Error exporting trace {trace_id}: {str(e)}")
+
+    threading.Thread(target=send, name="otlp-export", daemon=True).start()
@@ -0,0 +1,32 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The API modules import each other by name, the way they run inside the image
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """The API module on a SQLite database; tests that need it are skipped where FastAPI is missing."""
+    pytest.importorskip("fastapi")
+    database = tmp_path_factory.mktemp("db") / "school.db"
+    # Sync endpoints run in the threadpool, so the connection is shared across threads
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}?check_same_thread=false"
+    import main as main_module
+    return main_module
+
+@pytest.fixture
+def db(main):
+    """A session on an empty schema."""
+    main.Base.metadata.drop_all(bind=main.engine)
+    main.ensure_schema()
+    session = main.SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(main, db):
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)
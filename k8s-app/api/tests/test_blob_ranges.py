@@ -0,0 +1,101 @@
+import pytest
+
+import blobstore
+
+CONTENT = bytes(range(256)) * 1000
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-200", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes= 5-5", (5, 5)),
+    ("bytes=100-", None),
+    ("bytes=9-3", None),
+    ("bytes=0-1,5-6", None),
+    ("bytes=a-b", None),
+    ("items=0-9", None),
+])
+def test_parse_byte_range(main, header, expected):
+    assert main.parse_byte_range(header, 100) == expected
+
+@pytest.fixture
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_DIR", tmp_path / "blobs")
+    monkeypatch.setattr(blobstore, "CHUNK_SIZE", 1000)
+    return tmp_path / "blobs"
+
+def store(data: bytes) -> str:
+    writer = blobstore.BlobWriter()
+    writer.write(data)
+    digest, size, compressed_size = writer.close()
+    writer.publish()
+    return digest
+
+@pytest.mark.parametrize("offset, length", [(0, None), (0, 10), (999, 2), (12345, None), (len(CONTENT) - 1, 5), (len(CONTENT), None)])
+def test_iter_blob_reads_a_window(blob_dir, offset, length):
+    digest = store(CONTENT)
+    end = len(CONTENT) if length is None else offset + length
+    assert blobstore.read_blob(digest, offset, length) == CONTENT[offset:end]
+    assert all(len(chunk) <= 1000 for chunk in blobstore.iter_blob(digest, offset, length))
+
+def test_identical_content_is_stored_once(blob_dir):
+    assert store(CONTENT) == store(CONTENT)
+    assert [p.name for p in blob_dir.rglob("*") if p.is_file()] == [f"{store(CONTENT)}.gz"]
+
+@pytest.fixture
+def output(main, db, blob_dir):
+    """bob's current attempt at "sum", whose report is CONTENT."""
+    teacher = main.Teacher(name="max", password="x")
+    student = main.Student(name="bob", password="x")
+    db.add_all([teacher, student])
+    db.flush()
+    task = main.Task(name="sum", description="d", teacher_id=teacher.id)
+    db.add(task)
+    db.flush()
+    writer = blobstore.BlobWriter()
+    writer.write(CONTENT)
+    attempt = main.TaskResult(task_id=task.id, student_id=student.id, status="SUCCESS", output_hash=main.store_blob(writer, db))
+    db.add(attempt)
+    db.flush()
+    main.set_latest_attempt(attempt, db)
+    db.commit()
+    return "/teacher/task/results/sum/bob/output"
+
+def test_whole_output(client, output):
+    response = client.get(output)
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == CONTENT
+
+def test_range_header(client, output):
+    response = client.get(output, headers={"Range": "bytes=1000-1999"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+    assert response.content == CONTENT[1000:2000]
+
+def test_suffix_range(client, output):
+    response = client.get(output, headers={"Range": "bytes=-3"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-3:]
+
+def test_unsatisfiable_range(client, output):
+    assert client.get(output, headers={"Range": f"bytes={len(CONTENT)}-"}).status_code == 416
+
+def test_offset_and_limit(client, output):
+    response = client.get(output, params={"offset": 2500, "limit": 100})
+    assert response.status_code == 200
+    assert response.content == CONTENT[2500:2600]
+    assert client.get(output, params={"offset": 255990}).content == CONTENT[255990:]
+    assert client.get(output, params={"offset": -1}).status_code == 422
+
+def test_range_header_overrides_offset(client, output):
+    response = client.get(output, params={"offset": 5, "limit": 1}, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+
+def test_missing_blob_file(client, output, blob_dir):
+    for path in blob_dir.rglob("*.gz"):
+        path.unlink()
+    assert client.get(output).status_code == 404
@@ -0,0 +1,112 @@
+import shutil
+import subprocess
+
+import pytest
+
+import bulk_grade
+
+SCRIPT = (
+    "import sys\n"
+    "def total(xs):\n"
+    "    return sum(xs)  # sum()\n"
+    "print(total([1, 2]))\n"
+    "x = 10**2 + 3*4\n"
+    "for i in range(3): print(i)\n"
+    "\tif  x: pass\n"
+    "a.b[0] = 'x'\n"
+    "end$\n"
+    "no newline at end"
+)
+
+# Patterns the in-process translation handles, each checked against what grep itself counts
+PATTERNS = [
+    "print",
+    "^print",
+    "pass$",
+    "end$",
+    "^$",
+    "sum(",
+    "sum\\(xs\\)",
+    "\\(to\\)tal",
+    "\\(a\\)\\1",
+    "for\\|while",
+    "10*",
+    "*2",
+    "\\(*x\\)",
+    "x\\+",
+    "1\\?0",
+    "0\\{2\\}",
+    "[0-9]\\{2,\\}",
+    "[[:digit:]]",
+    "^[[:space:]]",
+    "[[:upper:]]",
+    "[^a-z ]",
+    "[]a]",
+    "[\\]",
+    "a.b",
+    "a\\.b",
+    "a\\[0]",
+    "'x'",
+    "$x",
+    "x^",
+]
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text(SCRIPT)
+    return str(path)
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_translation_matches_grep(pattern, script):
+    if shutil.which("grep") is None:
+        pytest.skip("grep is not installed")
+    assert bulk_grade.bre_to_regex(pattern) is not None
+    expected = subprocess.run(["grep", "-c", pattern, script], capture_output=True, text=True, env={"LC_ALL": "C.UTF-8"})
+    assert bulk_grade.count_matching_lines(pattern, script) == int(expected.stdout.strip())
+
+@pytest.mark.parametrize("pattern", ["\\w+", "\\<print", "\\bx", "[[:word:]]", "[[=a=]]", "x\\{1", "\\{2\\}", "ab\\"])
+def test_unsupported_syntax_is_left_to_grep(pattern):
+    assert bulk_grade.bre_to_regex(pattern) is None
+
+@pytest.mark.parametrize("pattern, regex", [
+    ("*a", "\\*a"),
+    ("\\(*a\\)", "(\\*a)"),
+    ("a\\|*b", "a|\\*b"),
+    ("a^b", "a\\^b"),
+    ("a$b", "a\\$b"),
+    ("a\\+", "a+"),
+    ("\\+a", "\\+a"),
+    ("[[:alpha:]_]", "[a-zA-Z_]"),
+])
+def test_translation(pattern, regex):
+    assert bulk_grade.bre_to_regex(pattern).pattern == regex
+
+@pytest.mark.parametrize("pattern", ["\\w", "-e"])
+def test_fallback_runs_grep(pattern, script, monkeypatch):
+    calls = []
+    def run(args, **kwargs):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0, stdout="4\n")
+    monkeypatch.setattr(bulk_grade.subprocess, "run", run)
+    assert bulk_grade.count_matching_lines(pattern, script) == 4
+    assert calls == [["grep", "-c", pattern, script]]
+
+def test_fallback_counts_nothing_when_grep_fails(script, monkeypatch):
+    monkeypatch.setattr(bulk_grade.subprocess, "run", lambda args, **kwargs: subprocess.CompletedProcess(args, 2, stdout=""))
+    assert bulk_grade.count_matching_lines("\\w", script) == 0
+
+def test_final_newline_does_not_add_a_line(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("a\n\n")
+    assert bulk_grade.count_matching_lines("^$", str(path)) == 1
+
+def test_pattern_report(script):
+    report = bulk_grade.pattern_report(["print", "while"], script)
+    assert report == '\nPATTERN SEARCH:\n  Pattern: "print" - FOUND (2 occurrences)\n  Pattern: "while" - NOT FOUND\n'
+
+def test_read_patterns_skips_unterminated_last_line(tmp_path):
+    path = tmp_path / "find.txt"
+    path.write_text("print\n\nwhile")
+    assert bulk_grade.read_patterns(str(path)) == ["print", ""]
+    assert bulk_grade.read_patterns(str(tmp_path / "missing.txt")) == []
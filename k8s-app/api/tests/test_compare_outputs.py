@@ -0,0 +1,81 @@
+import pytest
+
+import compare_outputs
+
+@pytest.fixture
+def compare(tmp_path):
+    def run(teacher: str, student: str, mode: str = "exact", abs_tol: float = 0.0, rel_tol: float = 0.0):
+        teacher_path = tmp_path / "teacher.txt"
+        student_path = tmp_path / "student.txt"
+        teacher_path.write_text(teacher)
+        student_path.write_text(student)
+        return compare_outputs.compare_files(str(teacher_path), str(student_path), mode, abs_tol, rel_tol)
+    return run
+
+def test_exact_ignores_trailing_newlines(compare):
+    assert compare("1\n2\n", "1\n2")[0]
+    assert compare("1\n2", "1\n2\n\n\n")[0]
+
+def test_exact_reports_first_differing_byte(compare):
+    assert compare("abcdef", "abcxef") == (False, "first difference at byte 3")
+    assert compare("abc", "abcd") == (False, "outputs differ in length after byte 3")
+
+def test_whitespace_collapses_runs_and_trailing_blank_lines(compare):
+    assert compare("a  b\n\n", "a b\t\n", "whitespace")[0]
+    assert compare("a\n\nb\n", "a\nb\n", "whitespace") == (False, "line 2: expected '', got 'b'")
+
+def test_token_ignores_layout(compare):
+    assert compare("1 2\n3\n", "1\n2 3", "token")[0]
+    assert compare("1 2 3", "1 2", "token") == (False, "token 3: expected '3', got end of output")
+
+def test_numeric_within_tolerance(compare):
+    assert compare("1.0 2.0", "1 2.0000001", "numeric", abs_tol=1e-6)[0]
+    assert not compare("1.0 2.0", "1 2.01", "numeric", abs_tol=1e-6)[0]
+
+def test_numeric_tolerance_limits_are_inclusive(compare):
+    assert compare("10", "10.5", "numeric", abs_tol=0.5)[0]
+    assert compare("100", "101", "numeric", rel_tol=0.01)[0]
+    assert not compare("100", "101.5", "numeric", rel_tol=0.01)[0]
+    # Relative tolerance scales with the teacher's value, not the student's
+    assert not compare("-100", "-102", "numeric", rel_tol=0.01)[0]
+    assert compare("100", "101.5", "numeric", abs_tol=0.5, rel_tol=0.01)[0]
+
+def test_numeric_without_tolerance_needs_equal_values(compare):
+    assert compare("1.50", "1.5", "numeric")[0]
+    assert not compare("1.5", "1.5000001", "numeric")[0]
+
+@pytest.mark.parametrize("teacher, student", [
+    ("42", "nan"),
+    ("1.0 2.0 3.0", "nan nan nan"),
+    ("nan", "42"),
+    ("inf", "5"),
+    ("inf", "-inf"),
+    ("-inf", "inf"),
+    ("5", "inf"),
+    ("inf", "nan"),
+])
+def test_numeric_non_finite_values_do_not_pass(compare, teacher, student):
+    assert not compare(teacher, student, "numeric", abs_tol=1.0, rel_tol=0.5)[0]
+
+@pytest.mark.parametrize("teacher, student", [
+    ("nan", "NaN"),
+    ("inf", "Infinity"),
+    ("-inf", "-INF"),
+])
+def test_numeric_non_finite_values_match_themselves(compare, teacher, student):
+    assert compare(teacher, student, "numeric", abs_tol=1.0, rel_tol=0.5)[0]
+
+def test_numeric_mixed_tokens(compare):
+    assert compare("total: 3.0 items", "total: 3 items", "numeric")[0]
+    assert compare("total: 3.0 items", "Total: 3 items", "numeric") == (False, "token 1: expected 'total:', got 'Total:'")
+    assert compare("x 1", "1 x", "numeric") == (False, "token 1: expected 'x', got '1'")
+
+def test_numeric_mismatch_across_chunks(compare, monkeypatch):
+    monkeypatch.setattr(compare_outputs, "CHUNK_SIZE", 8)
+    teacher = " ".join(str(i) for i in range(100))
+    assert compare(teacher, teacher.replace(" 57 ", " 57.0 "), "numeric")[0]
+    assert compare(teacher, teacher.replace(" 57 ", " 58 "), "numeric") == (False, "token 58: expected '57', got '58'")
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        compare_outputs.compare_files(str(tmp_path / "a"), str(tmp_path / "b"), "fuzzy")
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("kubernetes")
+
+from kubernetes.client.rest import ApiException
+
+import dispatch
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(dispatch, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def target(name: str, max_pods: int = 10, live_pods: int = 0, start_latency: float = 5.0, clock=None) -> dispatch.Target:
+    """A target with an API stub, counted just now so ranking does not list its pods."""
+    t = dispatch.Target(None, name, max_pods)
+    t.live_pods = live_pods
+    t.start_latency = start_latency
+    t.refreshed_at = clock.value if clock else 0.0
+    t._clients = {"core_v1": mock.Mock(), "core_v1_raw": mock.Mock(), "apps_v1": mock.Mock()}
+    return t
+
+def test_parse_targets():
+    targets = dispatch.parse_targets("default, east/tasks=5,  ,west/")
+    assert [(t.context, t.namespace, t.max_pods, t.name) for t in targets] == [
+        (None, "default", dispatch.DISPATCH_MAX_PODS, "default"),
+        ("east", "tasks", 5, "east/tasks"),
+        ("west", "default", dispatch.DISPATCH_MAX_PODS, "west/default"),
+    ]
+    assert [t.name for t in dispatch.parse_targets(" , ")] == ["default"]
+
+def test_ranked_by_expected_wait(clock):
+    idle_slow = target("idle-slow", start_latency=10.0, clock=clock)
+    busy_fast = target("busy-fast", live_pods=5, start_latency=4.0, clock=clock)
+    idle_fast = target("idle-fast", start_latency=4.0, clock=clock)
+    assert busy_fast.expected_wait() == 6.0
+    ranked = dispatch.Dispatcher([idle_slow, busy_fast, idle_fast]).ranked()
+    assert [t.name for t in ranked] == ["idle-fast", "busy-fast", "idle-slow"]
+
+def test_saturated_and_cooling_down_targets_go_last(clock):
+    full = target("full", max_pods=2, live_pods=2, start_latency=1.0, clock=clock)
+    failing = target("failing", start_latency=1.0, clock=clock)
+    slow = target("slow", start_latency=60.0, clock=clock)
+    failing.record_failure()
+    assert full.saturated() and failing.cooling_down()
+    ranked = dispatch.Dispatcher([failing, full, slow]).ranked()
+    assert [t.name for t in ranked] == ["slow", "full", "failing"]
+
+def test_inflight_pods_count_towards_saturation(clock):
+    t = target("t", max_pods=2, live_pods=1, clock=clock)
+    assert not t.saturated()
+    t.inflight = 1
+    assert t.saturated()
+
+def test_cooldown_backs_off_exponentially(clock, monkeypatch):
+    monkeypatch.setattr(dispatch, "DISPATCH_COOLDOWN_SECONDS", 10.0)
+    t = target("t", clock=clock)
+    waits = []
+    for _ in range(6):
+        t.record_failure()
+        waits.append(t.cooldown_until - clock.value)
+    assert waits == [10.0, 20.0, 40.0, 80.0, 160.0, 160.0]
+    clock.value += 160.0
+    assert not t.cooling_down()
+    t.record_failure()
+    t.record_success()
+    assert (t.failures, t.cooling_down()) == (0, False)
+
+def test_refresh_only_after_the_interval(clock, monkeypatch):
+    monkeypatch.setattr(dispatch, "DISPATCH_REFRESH_SECONDS", 5.0)
+    t = target("t", clock=clock)
+    t.refresh = mock.Mock()
+    dispatcher = dispatch.Dispatcher([t])
+    dispatcher.ranked()
+    t.refresh.assert_not_called()
+    clock.value += 5.0
+    dispatcher.ranked()
+    t.refresh.assert_called_once()
+
+def test_refresh_error_starts_a_cooldown(clock):
+    t = target("t", clock=clock)
+    t.refreshed_at = 0.0
+    t.refresh = mock.Mock(side_effect=RuntimeError("unreachable"))
+    dispatch.Dispatcher([t]).ranked()
+    assert t.cooling_down()
+
+def test_refresh_counts_live_pods_and_start_latency(clock):
+    created = datetime(2026, 1, 1)
+    def pod(name, phase, started_after=None):
+        running = SimpleNamespace(started_at=created + timedelta(seconds=started_after)) if started_after is not None else None
+        statuses = [SimpleNamespace(state=SimpleNamespace(running=running, terminated=None))]
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name=name, creation_timestamp=created),
+            status=SimpleNamespace(phase=phase, container_statuses=statuses)
+        )
+    t = target("t", start_latency=5.0, clock=clock)
+    t.inflight = 3
+    t._clients["core_v1"].list_namespaced_pod.return_value.items = [pod("a", "Pending"), pod("b", "Running", 15), pod("c", "Succeeded")]
+    t.refresh()
+    assert (t.live_pods, t.inflight) == (2, 0)
+    assert t.start_latency == pytest.approx(5.0 + dispatch.LATENCY_EWMA_ALPHA * 10)
+    # A pod's latency is only counted once
+    t.refresh()
+    assert list(t.latency_samples) == [15.0]
+
+def test_create_pod_fails_over(clock):
+    first = target("first", start_latency=1.0, clock=clock)
+    second = target("second", start_latency=2.0, clock=clock)
+    first.core_v1.create_namespaced_pod.side_effect = ApiException(status=403, reason="exceeded quota")
+    dispatcher = dispatch.Dispatcher([first, second])
+    assert dispatcher.create_pod({"metadata": {"name": "p"}}) is second
+    second.core_v1.create_namespaced_pod.assert_called_once_with(namespace="second", body={"metadata": {"name": "p"}})
+    assert first.cooling_down() and not second.cooling_down()
+    assert second.inflight == 1
+    # The failed target is tried last until its cooldown ends
+    assert [t.name for t in dispatcher.ranked()] == ["second", "first"]
+
+def test_create_pod_fails_over_when_prepare_finds_target_unavailable(clock):
+    first = target("first", start_latency=1.0, clock=clock)
+    second = target("second", start_latency=2.0, clock=clock)
+    def prepare(t):
+        if t is first:
+            raise dispatch.TargetUnavailable("no shared PVC")
+    assert dispatch.Dispatcher([first, second]).create_pod({}, prepare) is second
+    first.core_v1.create_namespaced_pod.assert_not_called()
+
+def test_create_pod_conflict_means_already_created(clock):
+    t = target("t", clock=clock)
+    t.core_v1.create_namespaced_pod.side_effect = ApiException(status=409)
+    assert dispatch.Dispatcher([t]).create_pod({}) is t
+    assert not t.cooling_down()
+
+def test_create_pod_raises_invalid_pod_errors(clock):
+    first = target("first", start_latency=1.0, clock=clock)
+    second = target("second", start_latency=2.0, clock=clock)
+    first.core_v1.create_namespaced_pod.side_effect = ApiException(status=422)
+    with pytest.raises(ApiException):
+        dispatch.Dispatcher([first, second]).create_pod({})
+    second.core_v1.create_namespaced_pod.assert_not_called()
+
+def test_create_pod_raises_the_last_error_when_every_target_fails(clock):
+    first = target("first", clock=clock)
+    second = target("second", clock=clock)
+    first.core_v1.create_namespaced_pod.side_effect = ApiException(status=503)
+    second.core_v1.create_namespaced_pod.side_effect = ApiException(status=429)
+    with pytest.raises(ApiException) as e:
+        dispatch.Dispatcher([first, second]).create_pod({})
+    assert e.value.status == 429
+
+def test_start_latency_percentile():
+    t = dispatch.Target(None, "t", 10)
+    t.latency_samples.extend(range(1, dispatch.LATENCY_MIN_SAMPLES))
+    assert t.start_latency_percentile(0.5) is None
+    t.latency_samples.extend(range(dispatch.LATENCY_MIN_SAMPLES, 101))
+    assert t.start_latency_percentile(0.5) == 50
+    assert t.start_latency_percentile(0.95) == 95
+    assert t.start_latency_percentile(0.0) == 1
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture
+def gradebook(main, db):
+    """A teacher with two groups; bob has two attempts at the task, amy one."""
+    teacher = main.Teacher(name="max", password="x")
+    db.add(teacher)
+    db.flush()
+    task = main.Task(name="sum", description="d", teacher_id=teacher.id)
+    db.add(task)
+    db.flush()
+    started = datetime(2026, 1, 1)
+    for group_name, student_name, statuses in (("g1", "bob", ["FAIL", "SUCCESS"]), ("g2", "amy", ["ERROR"])):
+        group = main.Group(name=group_name, teacher_id=teacher.id)
+        student = main.Student(name=student_name, password="x")
+        db.add_all([group, student])
+        db.flush()
+        db.add_all([
+            main.StudentGroup(student_id=student.id, group_id=group.id),
+            main.TaskGroup(task_id=task.id, group_id=group.id)
+        ])
+        for minutes, status in enumerate(statuses):
+            attempt = main.TaskResult(task_id=task.id, student_id=student.id, status=status, created_at=started + timedelta(minutes=minutes))
+            db.add(attempt)
+            db.flush()
+            main.set_latest_attempt(attempt, db)
+    db.commit()
+
+def test_csv_lists_current_attempts(client, gradebook):
+    response = client.get("/teacher/export/results", params={"teacher_name": "max"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="results-max.csv"'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [
+        ["task_name", "student_name", "status", "created_at"],
+        ["sum", "amy", "ERROR", "2026-01-01T00:00:00"],
+        ["sum", "bob", "SUCCESS", "2026-01-01T00:01:00"]
+    ]
+
+def test_ndjson_history_of_one_group(client, gradebook):
+    response = client.get("/teacher/export/results", params={"teacher_name": "max", "group_name": "g1", "format": "ndjson", "history": "true"})
+    assert response.status_code == 200
+    assert [json.loads(line)["status"] for line in response.text.splitlines()] == ["FAIL", "SUCCESS"]
+
+def test_parquet_in_row_groups(main, client, gradebook, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 1)
+    response = client.get("/teacher/export/results", params={"teacher_name": "max", "format": "parquet", "history": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column("student_name").to_pylist() == ["amy", "bob", "bob"]
+    assert table.column("status").to_pylist() == ["ERROR", "FAIL", "SUCCESS"]
+    assert table.column("created_at").to_pylist()[2] == datetime(2026, 1, 1, 0, 1)
+
+def test_unknown_teacher_group_and_format(client, gradebook):
+    assert client.get("/teacher/export/results", params={"teacher_name": "nobody"}).status_code == 404
+    assert client.get("/teacher/export/results", params={"teacher_name": "max", "group_name": "g9"}).status_code == 404
+    assert client.get("/teacher/export/results", params={"teacher_name": "max", "format": "xlsx"}).status_code == 400
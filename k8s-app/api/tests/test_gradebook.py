@@ -0,0 +1,128 @@
+import pytest
+
+@pytest.fixture
+def course(main, db):
+    """Task "sum" assigned to groups g1 (bob, amy) and g2 (bob)."""
+    teacher = main.Teacher(name="max", password="x")
+    db.add(teacher)
+    db.flush()
+    task = main.Task(name="sum", description="d", teacher_id=teacher.id)
+    g1 = main.Group(name="g1", teacher_id=teacher.id)
+    g2 = main.Group(name="g2", teacher_id=teacher.id)
+    bob = main.Student(name="bob", password="x")
+    amy = main.Student(name="amy", password="x")
+    db.add_all([task, g1, g2, bob, amy])
+    db.flush()
+    db.add_all([
+        main.TaskGroup(task_id=task.id, group_id=g1.id),
+        main.TaskGroup(task_id=task.id, group_id=g2.id),
+        main.StudentGroup(student_id=bob.id, group_id=g1.id),
+        main.StudentGroup(student_id=amy.id, group_id=g1.id),
+        main.StudentGroup(student_id=bob.id, group_id=g2.id),
+    ])
+    db.commit()
+    return task, bob, amy
+
+def submit(main, db, task, student, status="STARTED"):
+    """Record a new attempt the way submission does, superseding an unfinished one."""
+    previous = main.get_latest_attempt(task.id, student.id, db)
+    if previous and previous.status == "STARTED":
+        previous.status = "CANCELLED"
+    attempt = main.TaskResult(task_id=task.id, student_id=student.id, status=status)
+    db.add(attempt)
+    db.flush()
+    main.set_latest_attempt(attempt, db)
+    main.record_gradebook_status(task.id, student.id, status, db)
+    db.commit()
+    return attempt
+
+def finish(main, db, attempt, status):
+    """Record a collected result the way update_task_result_status does."""
+    main.set_attempt_status(attempt, status, db)
+    main.record_gradebook_status(attempt.task_id, attempt.student_id, status, db)
+    db.commit()
+
+def gradebook(client, group):
+    response = client.get(f"/teacher/group/{group}/gradebook", params={"teacher_name": "max"})
+    assert response.status_code == 200
+    return response.json()
+
+def counts(book):
+    summary = book["summary"]["sum"]
+    return {key: summary[key] for key in ("started", "success", "fail", "error", "submitted")}
+
+def test_started_then_collected(main, db, client, course):
+    task, bob, amy = course
+    attempt = submit(main, db, task, bob)
+    assert counts(gradebook(client, "g1")) == {"started": 1, "success": 0, "fail": 0, "error": 0, "submitted": 1}
+    finish(main, db, attempt, "SUCCESS")
+    book = gradebook(client, "g1")
+    assert book["matrix"] == {"amy": {"sum": "NOT_STARTED"}, "bob": {"sum": "SUCCESS"}}
+    assert counts(book) == {"started": 0, "success": 1, "fail": 0, "error": 0, "submitted": 1}
+    assert book["summary"]["sum"]["pass_rate"] == 0.5
+    # Every group holding the student and the task moves together
+    assert counts(gradebook(client, "g2")) == counts(book)
+
+def test_resubmission_moves_the_cell_back_to_started(main, db, client, course):
+    task, bob, amy = course
+    first = submit(main, db, task, bob)
+    finish(main, db, first, "SUCCESS")
+    submit(main, db, task, bob)
+    assert counts(gradebook(client, "g1")) == {"started": 1, "success": 0, "fail": 0, "error": 0, "submitted": 1}
+    assert first.status == "SUCCESS"
+
+def test_superseded_unfinished_attempt_is_cancelled_in_history_only(main, db, client, course):
+    task, bob, amy = course
+    first = submit(main, db, task, bob)
+    second = submit(main, db, task, bob)
+    assert first.status == "CANCELLED"
+    assert counts(gradebook(client, "g1")) == {"started": 1, "success": 0, "fail": 0, "error": 0, "submitted": 1}
+    # A late result of the superseded attempt leaves the student's current status alone
+    main.set_attempt_status(first, "SUCCESS", db)
+    db.commit()
+    assert main.get_latest_attempt(task.id, bob.id, db).id == second.id
+    assert db.query(main.LatestResult).filter_by(student_id=bob.id).one().status == "STARTED"
+    finish(main, db, second, "FAIL")
+    assert counts(gradebook(client, "g1")) == {"started": 0, "success": 0, "fail": 1, "error": 0, "submitted": 1}
+
+def test_compile_errors_count_as_errors(main, db, client, course):
+    task, bob, amy = course
+    submit(main, db, task, bob, "COMPILE_ERROR")
+    attempt = submit(main, db, task, amy)
+    main.fail_attempt(attempt, db)
+    db.commit()
+    book = gradebook(client, "g1")
+    assert book["matrix"] == {"amy": {"sum": "ERROR"}, "bob": {"sum": "COMPILE_ERROR"}}
+    assert counts(book) == {"started": 0, "success": 0, "fail": 0, "error": 2, "submitted": 2}
+
+def test_failing_a_superseded_attempt_leaves_the_cell(main, db, client, course):
+    task, bob, amy = course
+    first = submit(main, db, task, bob)
+    second = submit(main, db, task, bob)
+    finish(main, db, second, "SUCCESS")
+    main.fail_attempt(first, db)
+    db.commit()
+    assert first.status == "ERROR"
+    assert counts(gradebook(client, "g1")) == {"started": 0, "success": 1, "fail": 0, "error": 0, "submitted": 1}
+
+def test_repeated_status_is_counted_once(main, db, client, course):
+    task, bob, amy = course
+    attempt = submit(main, db, task, bob)
+    finish(main, db, attempt, "SUCCESS")
+    finish(main, db, attempt, "SUCCESS")
+    assert counts(gradebook(client, "g1"))["success"] == 1
+
+def test_student_added_later_brings_their_results(main, db, client, course):
+    task, bob, amy = course
+    teacher = db.query(main.Teacher).filter_by(name="max").one()
+    g3 = main.Group(name="g3", teacher_id=teacher.id)
+    db.add(g3)
+    db.flush()
+    db.add(main.TaskGroup(task_id=task.id, group_id=g3.id))
+    db.commit()
+    finish(main, db, submit(main, db, task, amy), "FAIL")
+    response = client.post("/teacher/group/add-student", data={"student_name": "amy", "group_name": "g3", "teacher_name": "max"})
+    assert response.status_code == 200
+    book = gradebook(client, "g3")
+    assert book["matrix"] == {"amy": {"sum": "FAIL"}}
+    assert counts(book) == {"started": 0, "success": 0, "fail": 1, "error": 0, "submitted": 1}
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException, Request
+
+import ingest
+
+BOUNDARY = "boundary"
+
+def multipart(*parts) -> bytes:
+    """A form body from (name, value) and (name, filename, content) parts."""
+    body = b""
+    for part in parts:
+        if len(part) == 2:
+            name, value = part
+            body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode() + value + b"\r\n"
+        else:
+            name, filename, content = part
+            body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     "Content-Type: application/octet-stream\r\n\r\n").encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+@pytest.fixture
+def staging(tmp_path):
+    return tmp_path / "staging"
+
+@pytest.fixture
+def post(staging, tmp_path):
+    async def handle(request: Request):
+        form = await ingest.read_multipart(request, {
+            "script": ingest.FileField(10, staging),
+            "data": ingest.FileField(100, staging),
+        })
+        script = form.file("script")
+        script.commit(tmp_path / "committed" / "script.py")
+        form.discard()
+        return {
+            "name": form.field("name"),
+            "tags": form.field_list("tag"),
+            "script": [script.filename, script.size, script.sha256],
+            "data": form.file("data", required=False) is not None,
+        }
+
+    def send(body: bytes, content_type: str = f"multipart/form-data; boundary={BOUNDARY}", declare_length: bool = True):
+        """(status, result or detail) for the body, delivered the way a server streams it in: 7 bytes at a time."""
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+        async def receive():
+            chunk = chunks.pop(0) if chunks else b""
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+        headers = [(b"content-type", content_type.encode())]
+        if declare_length:
+            headers.append((b"content-length", str(len(body)).encode()))
+        request = Request({"type": "http", "method": "POST", "path": "/upload", "headers": headers}, receive)
+        try:
+            return 200, asyncio.run(handle(request))
+        except HTTPException as e:
+            return e.status_code, e.detail
+    return send
+
+def staged(staging):
+    return list(staging.iterdir()) if staging.exists() else []
+
+def test_fields_and_files(post, staging, tmp_path):
+    status, result = post(multipart(("name", b"amy"), ("tag", b"a"), ("tag", b"b"), ("script", "s.py", b"print(1)"), ("data", "", b"")))
+    assert status == 200
+    assert result == {
+        "name": "amy",
+        "tags": ["a", "b"],
+        "script": ["s.py", 8, hashlib.sha256(b"print(1)").hexdigest()],
+        "data": False,
+    }
+    assert (tmp_path / "committed" / "script.py").read_bytes() == b"print(1)"
+    assert staged(staging) == []
+
+def test_body_without_declared_length(post):
+    status, result = post(multipart(("name", b"amy"), ("script", "s.py", b"print(1)")), declare_length=False)
+    assert status == 200
+    assert result["script"][2] == hashlib.sha256(b"print(1)").hexdigest()
+
+@pytest.mark.parametrize("declared", [True, False])
+def test_file_over_its_limit(post, staging, declared):
+    status, result = post(multipart(("name", b"amy"), ("data", "d.txt", b"ok"), ("script", "s.py", b"x" * 11)), declare_length=declared)
+    assert status == 413
+    assert result == "script exceeds the limit of 10 bytes"
+    # The file being written and the ones finished before it are removed
+    assert staged(staging) == []
+
+def test_file_at_its_limit(post, staging):
+    assert post(multipart(("name", b"amy"), ("script", "s.py", b"x" * 10)))[0] == 200
+    assert staged(staging) == []
+
+def test_form_field_over_its_limit(post, staging, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_FORM_FIELD_BYTES", 4)
+    status, result = post(multipart(("script", "s.py", b"x"), ("name", b"abcde")))
+    assert status == 413
+    assert result == "name exceeds the limit of 4 bytes"
+    assert staged(staging) == []
+
+def test_declared_length_over_the_upload_limit(post, staging, monkeypatch):
+    body = multipart(("name", b"amy"), ("script", "s.py", b"x"))
+    monkeypatch.setattr(ingest, "MAX_UPLOAD_BYTES", len(body) - 1)
+    status, result = post(body)
+    assert status == 413
+    assert result == f"Upload exceeds the limit of {len(body) - 1} bytes"
+    assert staged(staging) == []
+
+def test_streamed_body_over_the_upload_limit(post, staging, monkeypatch):
+    body = multipart(("name", b"amy"), ("data", "d.txt", b"y" * 50), ("script", "s.py", b"x"))
+    monkeypatch.setattr(ingest, "MAX_UPLOAD_BYTES", len(body) - 20)
+    status, result = post(body, declare_length=False)
+    assert status == 413
+    assert staged(staging) == []
+
+def test_unexpected_file_field(post, staging):
+    status, result = post(multipart(("script", "s.py", b"x"), ("other", "o.txt", b"y")))
+    assert status == 400
+    assert staged(staging) == []
+
+def test_missing_fields(post, staging):
+    status, result = post(multipart(("script", "s.py", b"x")))
+    assert status == 422
+    assert result == "Missing form field: name"
+
+def test_not_multipart(post, staging):
+    assert post(b"{}", content_type="application/json") == (415, "Expected multipart/form-data")
+    assert post(b"", content_type="multipart/form-data") == (415, "Expected multipart/form-data")
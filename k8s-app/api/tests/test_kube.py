@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("kubernetes")
+
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import ProtocolError
+
+import kube
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that only moves when the code under test sleeps; the sleeps are recorded."""
+    now = SimpleNamespace(value=0.0, sleeps=[])
+    def sleep(seconds):
+        now.sleeps.append(seconds)
+        now.value += seconds
+    monkeypatch.setattr(kube, "time", SimpleNamespace(monotonic=lambda: now.value, sleep=sleep))
+    monkeypatch.setattr(kube.random, "uniform", lambda low, high: 1.0)
+    monkeypatch.setattr(kube, "K8S_RETRY_BASE_SECONDS", 0.5)
+    monkeypatch.setattr(kube, "K8S_MAX_RETRIES", 3)
+    return now
+
+@pytest.fixture
+def limiter(clock):
+    return kube.TokenBucket(1000, 1000)
+
+def api_error(status, retry_after=None):
+    e = ApiException(status=status)
+    e.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return e
+
+def test_retries_throttling_with_exponential_backoff(clock, limiter):
+    func = mock.Mock(side_effect=[api_error(429), api_error(503), ProtocolError("reset"), "ok"])
+    assert kube.call_with_retry(limiter, func, "a", namespace="n") == "ok"
+    assert func.call_count == 4
+    func.assert_called_with("a", namespace="n")
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+
+def test_retry_after_overrides_backoff(clock, limiter):
+    func = mock.Mock(side_effect=[api_error(429, "3"), api_error(429, "soon"), "ok"])
+    assert kube.call_with_retry(limiter, func) == "ok"
+    # An unparseable Retry-After falls back to the backoff
+    assert clock.sleeps == [3.0, 1.0]
+
+def test_gives_up_after_the_retry_limit(clock, limiter):
+    func = mock.Mock(side_effect=api_error(500))
+    with pytest.raises(ApiException):
+        kube.call_with_retry(limiter, func)
+    assert func.call_count == kube.K8S_MAX_RETRIES + 1
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+
+@pytest.mark.parametrize("status", [400, 403, 404, 409, 422])
+def test_client_errors_are_not_retried(clock, limiter, status):
+    func = mock.Mock(side_effect=api_error(status, "1"))
+    with pytest.raises(ApiException):
+        kube.call_with_retry(limiter, func)
+    assert func.call_count == 1
+    assert clock.sleeps == []
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "2"}, 2.0),
+    ({"Retry-After": "0.5"}, 0.5),
+    ({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}, None),
+    ({}, None),
+    (None, None),
+])
+def test_retry_after(headers, expected):
+    e = ApiException(status=429)
+    e.headers = headers
+    assert kube._retry_after(e) == expected
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = kube.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+    clock.value += 10
+    # Idle time refills the bucket only up to the burst
+    for _ in range(3):
+        bucket.acquire()
+    assert len(clock.sleeps) == 2
+    bucket.acquire()
+    assert len(clock.sleeps) == 3
+
+def test_rate_limited_api_wraps_methods_only(clock, limiter):
+    api = mock.Mock()
+    api.api_client = "client"
+    api.read_namespaced_pod.side_effect = [api_error(502), "pod"]
+    wrapped = kube.RateLimitedApi(api, limiter)
+    assert wrapped.read_namespaced_pod(name="p", namespace="n") == "pod"
+    assert api.read_namespaced_pod.call_count == 2
+    assert wrapped.api_client == "client"
@@ -0,0 +1,77 @@
+import pytest
+
+import seeding
+
+RANGES = ((1, 100), (0, 10**9), (-5, 5))
+
+def test_parse_spec_skips_other_lines_and_empty_ranges():
+    assert seeding.parse_spec("1-10\n\n  3-3 \nx\n5-2\n1-2-3\n") == ((1, 10), (3, 3))
+
+def test_student_policy_shares_values_across_attempts():
+    first = seeding.seed_for(1, 2, 3, "student")
+    assert first == seeding.seed_for(1, 2, 4, "student")
+    assert first != seeding.seed_for(1, 5, 3, "student")
+    assert first != seeding.seed_for(6, 2, 3, "student")
+    assert seeding.draw(RANGES, first) == seeding.draw(RANGES, seeding.seed_for(1, 2, 4, "student"))
+
+def test_attempt_policy_gives_each_attempt_its_own_values():
+    first = seeding.seed_for(1, 2, 3, "attempt")
+    assert first == seeding.seed_for(1, 2, 3, "attempt")
+    assert first != seeding.seed_for(1, 2, 4, "attempt")
+    assert first != seeding.seed_for(1, 2, 3, "student")
+    assert seeding.draw(RANGES, first) != seeding.draw(RANGES, seeding.seed_for(1, 2, 4, "attempt"))
+
+def test_random_policy_is_unseeded():
+    assert seeding.seed_for(1, 2, 3, "random") is None
+    draws = {tuple(seeding.draw(RANGES, None)) for _ in range(5)}
+    assert len(draws) > 1
+
+def test_seed_key_changes_seeds(monkeypatch):
+    plain = seeding.seed_for(1, 2, 3, "student")
+    monkeypatch.setattr(seeding, "VARS_SEED_KEY", "secret")
+    assert seeding.seed_for(1, 2, 3, "student") != plain
+
+def test_draw_stays_within_ranges():
+    for student_id in range(50):
+        values = seeding.draw(RANGES, seeding.seed_for(1, student_id, 0, "student"))
+        assert all(start <= value <= end for value, (start, end) in zip(values, RANGES))
+
+def test_vars_text():
+    assert seeding.vars_text([3, -1, 40]) == "3\n-1\n40"
+    assert seeding.vars_text([]) == ""
+
+def test_teacher_cache_key_depends_on_script_and_values():
+    key = seeding.teacher_cache_key("abc", [1, 2])
+    assert key == seeding.teacher_cache_key("abc", [1, 2])
+    assert key != seeding.teacher_cache_key("abd", [1, 2])
+    assert key != seeding.teacher_cache_key("abc", [2, 1])
+    assert key != seeding.teacher_cache_key("abc", [12])
+    assert len(key) == 64
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(seeding, "_inputs", type(seeding._inputs)())
+    vars_path = tmp_path / "vars.txt"
+    script_path = tmp_path / "teacher.py"
+    vars_path.write_text("1-10\n")
+    script_path.write_text("print(1)\n")
+    return vars_path, script_path
+
+def test_task_inputs_are_read_once_per_version(inputs):
+    vars_path, script_path = inputs
+    first = seeding.task_inputs(1, 1, vars_path, script_path)
+    assert first.ranges == ((1, 10),)
+    assert first.teacher_script_hash is not None
+    vars_path.write_text("5-6\n")
+    assert seeding.task_inputs(1, 1, vars_path, script_path) is first
+    assert seeding.task_inputs(1, 2, vars_path, script_path).ranges == ((5, 6),)
+
+def test_task_inputs_without_files(inputs, tmp_path):
+    assert seeding.task_inputs(1, 1, tmp_path / "none.txt", tmp_path / "none.py") == seeding.TaskInputs((), None)
+
+def test_task_inputs_cache_is_bounded(inputs, monkeypatch):
+    vars_path, script_path = inputs
+    monkeypatch.setattr(seeding, "TASK_INPUTS_CACHE_SIZE", 2)
+    for version in range(4):
+        seeding.task_inputs(1, version, vars_path, script_path)
+    assert list(seeding._inputs) == [(1, 2), (1, 3)]
@@ -0,0 +1,138 @@
+import pytest
+
+import similarity
+
+ORIGINAL = """
+def mean(values):
+    total = 0
+    for value in values:
+        total += value
+    return total / len(values)
+
+numbers = [int(x) for x in input().split()]
+print(mean(numbers))
+print(max(numbers) - min(numbers))
+"""
+
+# The same program with names, literals, comments and blank lines changed
+RENAMED = """
+def average(xs):
+    # add them up
+    s = 0
+
+    for x in xs:
+        s += x
+    return s / len(xs)
+
+nums = [int(v) for v in input().split()]
+print(average(nums))
+print(max(nums) - min(nums))
+"""
+
+UNRELATED = """
+import sys
+
+class Stack:
+    def __init__(self):
+        self.items = []
+
+    def push(self, item):
+        self.items.append(item)
+
+for line in sys.stdin:
+    if line.strip() == "quit":
+        break
+    Stack().push(line)
+"""
+
+def signature(source):
+    return similarity.minhash(similarity.shingles(source))
+
+def candidates(signatures):
+    """Pairs sharing a band bucket, the way the index finds them."""
+    buckets = {}
+    for name, sig in signatures.items():
+        for band, bucket in enumerate(similarity.band_hashes(sig)):
+            buckets.setdefault((band, bucket), set()).add(name)
+    return {tuple(sorted((a, b))) for names in buckets.values() for a in names for b in names if a < b}
+
+def test_normalized_tokens_erase_names_and_literals():
+    assert similarity.normalized_tokens("x = len('a') + 1  # note\n") == ["ID", "=", "len", "(", "STR", ")", "+", "NUM", "NEWLINE"]
+    assert similarity.normalized_tokens(ORIGINAL) == similarity.normalized_tokens(RENAMED)
+
+def test_normalized_tokens_keep_what_precedes_an_error():
+    assert similarity.normalized_tokens("x = 1\ny = (")[:4] == ["ID", "=", "NUM", "NEWLINE"]
+
+def test_ast_paths():
+    assert similarity.ast_paths("x = 1") == ["Module", "Module>Assign", "Module>Assign>Name", "Assign>Name>Store", "Module>Assign>Constant"]
+    assert similarity.ast_paths("def (") == []
+
+def test_renamed_copy_is_near_identical():
+    assert similarity.estimate_similarity(signature(ORIGINAL), signature(RENAMED)) == 1.0
+    assert similarity.estimate_similarity(signature(ORIGINAL), signature(UNRELATED)) < 0.3
+
+def test_signatures_are_stable():
+    assert signature(ORIGINAL) == signature(ORIGINAL)
+    assert len(signature(ORIGINAL)) == similarity.NUM_PERMUTATIONS
+    assert similarity.minhash(set()) == [(1 << 32) - 1] * similarity.NUM_PERMUTATIONS
+
+def test_encoding_round_trips():
+    sig = signature(ORIGINAL)
+    assert similarity.decode_signature(similarity.encode_signature(sig)) == sig
+    assert len(similarity.encode_signature(sig)) == 4 * similarity.NUM_PERMUTATIONS
+
+def test_band_hashes_fit_a_bigint():
+    keys = similarity.band_hashes(signature(ORIGINAL))
+    assert len(keys) == similarity.BANDS
+    assert all(-(1 << 63) <= key < (1 << 63) for key in keys)
+
+def test_candidate_pairs_come_from_shared_buckets():
+    edited = ORIGINAL + "print(len(numbers))\n"
+    pairs = candidates({"a": signature(ORIGINAL), "b": signature(RENAMED), "c": signature(edited), "d": signature(UNRELATED)})
+    assert {("a", "b"), ("a", "c"), ("b", "c")} <= pairs
+    assert not any("d" in pair for pair in pairs)
+
+def test_cluster_pairs_joins_connected_submissions():
+    clusters = similarity.cluster_pairs([(1, 2, 0.9), (3, 4, 0.8), (2, 5, 0.85), (5, 1, 0.95)])
+    assert sorted(sorted(c["members"]) for c in clusters) == [[1, 2, 5], [3, 4]]
+    big = next(c for c in clusters if 1 in c["members"])
+    assert sorted(big["pairs"]) == [(1, 2, 0.9), (2, 5, 0.85), (5, 1, 0.95)]
+    assert similarity.cluster_pairs([]) == []
+
+@pytest.fixture
+def indexed(main, db, tmp_path):
+    """A task with four submissions indexed: two renamed copies, a near copy and an unrelated script."""
+    teacher = main.Teacher(name="max", password="x")
+    db.add(teacher)
+    db.flush()
+    task = main.Task(name="mean", description="d", teacher_id=teacher.id)
+    db.add(task)
+    db.flush()
+    scripts = {"amy": ORIGINAL, "bob": RENAMED, "cat": ORIGINAL + "print(len(numbers))\n", "dan": UNRELATED}
+    for attempt_id, (name, source) in enumerate(scripts.items(), 1):
+        student = main.Student(name=name, password="x")
+        db.add(student)
+        db.flush()
+        path = tmp_path / f"{name}.py"
+        path.write_text(source)
+        main.index_submission(task.id, student.id, attempt_id, path, db)
+    return task
+
+def test_find_similar_submissions(main, db, indexed):
+    clusters = main.find_similar_submissions(indexed.id, 0.8, db)
+    assert len(clusters) == 1
+    assert clusters[0]["students"] == ["amy", "bob", "cat"]
+    assert clusters[0]["max_similarity"] == 1.0
+    assert clusters[0]["pairs"][0]["similarity"] == 1.0
+    assert main.find_similar_submissions(indexed.id, 1.0, db)[0]["students"] == ["amy", "bob"]
+
+def test_reindexing_replaces_the_previous_submission(main, db, indexed, tmp_path):
+    dan = db.query(main.Student).filter_by(name="dan").one()
+    path = tmp_path / "dan.py"
+    path.write_text(RENAMED)
+    # An older attempt does not overwrite the newer one's signature
+    main.index_submission(indexed.id, dan.id, 1, path, db)
+    assert "dan" not in main.find_similar_submissions(indexed.id, 0.8, db)[0]["students"]
+    main.index_submission(indexed.id, dan.id, 5, path, db)
+    assert main.find_similar_submissions(indexed.id, 0.8, db)[0]["students"] == ["amy", "bob", "cat", "dan"]
+    assert db.query(main.SimilarityBucket).filter_by(student_id=dan.id).count() == similarity.BANDS
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+
+@pytest.fixture
+def task(main, db, tmp_path, monkeypatch):
+    """Task "sum" with one file, assigned to bob's group."""
+    monkeypatch.setattr(main, "TASKS_DIR", tmp_path / "tasks")
+    main._task_metadata_cache.clear()
+    (tmp_path / "tasks" / "sum").mkdir(parents=True)
+    (tmp_path / "tasks" / "sum" / "teacher.py").write_text("print(1)\n")
+    teacher = main.Teacher(name="max", password="x")
+    student = main.Student(name="bob", password="x")
+    db.add_all([teacher, student])
+    db.flush()
+    task = main.Task(name="sum", description="Add numbers", teacher_id=teacher.id, updated_at=datetime(2026, 1, 1))
+    group = main.Group(name="g1", teacher_id=teacher.id)
+    db.add_all([task, group])
+    db.flush()
+    db.add_all([main.TaskGroup(task_id=task.id, group_id=group.id), main.StudentGroup(student_id=student.id, group_id=group.id)])
+    db.commit()
+    return task
+
+@pytest.fixture(params=["/student/task/sum?name=bob", "/teacher/task/sum"])
+def url(request):
+    return request.param
+
+def test_etag_and_cache_control(client, task, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json()["description"] == "Add numbers"
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == "private, max-age=0, must-revalidate"
+    # The same representation gets the same tag
+    assert client.get(url).headers["etag"] == response.headers["etag"]
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_tag_gets_304(client, task, url, if_none_match):
+    etag = client.get(url).headers["etag"]
+    response = client.get(url, headers={"If-None-Match": if_none_match.format(etag=etag)})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+def test_stale_tag_gets_the_body(client, task, url):
+    response = client.get(url, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json()["name"] == "sum"
+
+def test_task_change_changes_the_tag(main, db, client, task, url):
+    etag = client.get(url).headers["etag"]
+    task.description = "Add two numbers"
+    task.updated_at = datetime(2026, 1, 2)
+    db.commit()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["description"] == "Add two numbers"
+    assert response.headers["etag"] != etag
+
+def test_student_status_changes_the_tag(main, db, client, task):
+    url = "/student/task/sum?name=bob"
+    etag = client.get(url).headers["etag"]
+    bob = db.query(main.Student).filter_by(name="bob").one()
+    attempt = main.TaskResult(task_id=task.id, student_id=bob.id, status="STARTED")
+    db.add(attempt)
+    db.flush()
+    main.set_latest_attempt(attempt, db)
+    db.commit()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "STARTED"
+
+def test_result_count_is_cached_until_invalidated(main, db, client, task):
+    assert client.get("/teacher/task/sum").json()["result_count"] == 0
+    bob = db.query(main.Student).filter_by(name="bob").one()
+    attempt = main.TaskResult(task_id=task.id, student_id=bob.id, status="STARTED")
+    db.add(attempt)
+    db.flush()
+    main.set_latest_attempt(attempt, db)
+    db.commit()
+    # The count may lag by the TTL; a submission through this worker drops the entry
+    assert client.get("/teacher/task/sum").json()["result_count"] == 0
+    main.invalidate_task_metadata("sum")
+    assert client.get("/teacher/task/sum").json()["result_count"] == 1
+
+def test_expired_entry_is_reloaded(main, db, client, task, monkeypatch):
+    monkeypatch.setattr(main, "TASK_METADATA_TTL_SECONDS", 0)
+    assert client.get("/teacher/task/sum").json()["result_count"] == 0
+    bob = db.query(main.Student).filter_by(name="bob").one()
+    attempt = main.TaskResult(task_id=task.id, student_id=bob.id, status="STARTED")
+    db.add(attempt)
+    db.flush()
+    main.set_latest_attempt(attempt, db)
+    db.commit()
+    assert client.get("/teacher/task/sum").json()["result_count"] == 1
+
+def test_deleted_task_is_not_served_from_cache(main, db, client, task, url):
+    assert client.get(url).status_code == 200
+    db.query(main.TaskGroup).delete()
+    db.delete(task)
+    db.commit()
+    assert client.get(url).status_code == 404